@@ -1,10 +1,17 @@
-from .fields import SQLAlchemyConnectionField, SQLAlchemyFilteredConnectionField
+from .fields import (
+    SQLAlchemyConnectionField,
+    SQLAlchemyFilteredConnectionField,
+    SQLAlchemyKeysetConnectionField,
+    SQLAlchemyNodesField,
+)
+from .instrumentation import QueryBudgetExceeded, QueryStatsMiddleware, add_query_stats, track_query_stats
 from .types import (
     SQLAlchemyObjectType,
     SQLAlchemyInputObjectType,
     SQLAlchemyInterface,
     SQLAlchemyMutation,
     SQLAlchemyAutoSchemaFactory,
+    SQLAlchemyAutoMutationFactory,
 )
 from .utils import get_query, get_session
 
@@ -15,10 +22,17 @@ __all__ = [
     "SQLAlchemyObjectType",
     "SQLAlchemyConnectionField",
     "SQLAlchemyFilteredConnectionField",
+    "SQLAlchemyKeysetConnectionField",
+    "SQLAlchemyNodesField",
     "SQLAlchemyInputObjectType",
     "SQLAlchemyInterface",
     "SQLAlchemyMutation",
     "SQLAlchemyAutoSchemaFactory",
+    "SQLAlchemyAutoMutationFactory",
+    "QueryBudgetExceeded",
+    "QueryStatsMiddleware",
+    "add_query_stats",
+    "track_query_stats",
     "get_query",
     "get_session",
 ]
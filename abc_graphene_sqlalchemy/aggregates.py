@@ -0,0 +1,173 @@
+import re
+from collections import OrderedDict
+
+from graphene import Argument, Enum, Field, Float, Int, List, NonNull, ObjectType
+from graphene.utils.str_converters import to_camel_case
+from graphql import GraphQLError
+from sqlalchemy import func, inspect, types
+
+from .converter import convert_sqlalchemy_type
+from .utils import get_query, iter_selected_fields
+
+AGGREGATE_FUNCTIONS = OrderedDict([
+    ("sum", func.sum),
+    ("avg", func.avg),
+    ("min", func.min),
+    ("max", func.max),
+])
+
+# connection classes extended with an ``aggregate`` field, by connection
+aggregate_connection_cache = {}
+
+
+def get_aggregate_columns(model):
+    """Return the columns of ``model`` usable in aggregates, by aggregate function.
+
+    ``sum`` and ``avg`` use the numeric columns that are not keys, ``min``
+    and ``max`` all numeric and temporal columns, and ``group`` every column
+    converted to a plain scalar type.
+    """
+    columns = OrderedDict((name, OrderedDict()) for name in list(AGGREGATE_FUNCTIONS) + ["group"])
+    for key, column in inspect(model).columns.items():
+        if not hasattr(column, "type"):
+            continue
+        graphene_type = convert_sqlalchemy_type(column.type, column)
+        if not isinstance(graphene_type, type):
+            # enums and lists are resolved lazily and cannot be aggregated
+            continue
+        numeric = isinstance(column.type, (types.Integer, types.Numeric))
+        temporal = isinstance(column.type, (types.Date, types.DateTime, types.Time))
+        if numeric and not column.primary_key and not column.foreign_keys:
+            columns["sum"][key] = (column, Float)
+            columns["avg"][key] = (column, Float)
+        if numeric or temporal:
+            columns["min"][key] = (column, graphene_type)
+            columns["max"][key] = (column, graphene_type)
+        columns["group"][key] = (column, graphene_type)
+    return columns
+
+
+def create_aggregate_type(node_type):
+    """Build the ``{Node}Aggregate`` type for the model of ``node_type``."""
+    model = node_type._meta.model
+    name = "{}Aggregate".format(node_type._meta.name)
+    fields = OrderedDict([("count", Int())])
+    for function_name, columns in get_aggregate_columns(model).items():
+        if not columns:
+            continue
+        field_type = type(
+            "{}{}".format(name, function_name.capitalize()),
+            (ObjectType,),
+            OrderedDict((key, Field(graphene_type)) for key, (_, graphene_type) in columns.items()),
+        )
+        fields[function_name] = Field(field_type)
+    return type(name, (ObjectType,), fields)
+
+
+def create_group_by_enum(node_type):
+    """Build the enum of the columns an aggregate can be grouped by."""
+    keys = get_aggregate_columns(node_type._meta.model)["group"]
+    return Enum(
+        "{}AggregateGroupBy".format(node_type._meta.name),
+        [(re.sub(r"(?<!^)(?=[A-Z])", "_", key).upper(), key) for key in keys],
+    )
+
+
+def get_aggregate_connection(connection):
+    """Return ``connection`` extended with an ``aggregate`` field.
+
+    The field takes an optional ``groupBy`` list of columns and returns one
+    row of aggregates per group, computed in SQL over every row matching the
+    ``where`` and ``search`` arguments of the connection field.
+    """
+    if connection in aggregate_connection_cache:
+        return aggregate_connection_cache[connection]
+    node_type = connection._meta.node
+    aggregate_type = create_aggregate_type(node_type)
+    group_by_enum = create_group_by_enum(node_type)
+    name = "{}AggregateConnection".format(re.sub("Connection$", "", connection.__name__))
+    aggregate_connection = type(name, (connection,), {
+        "Meta": type("Meta", (), {"node": node_type}),
+        "aggregate": Field(List(aggregate_type), group_by=Argument(List(NonNull(group_by_enum)))),
+        "resolve_aggregate": resolve_aggregate,
+    })
+    aggregate_connection_cache[connection] = aggregate_connection
+    return aggregate_connection
+
+
+def get_selected_aggregates(info, columns):
+    """Return the aggregate functions and column keys requested on the field."""
+    selected = OrderedDict()
+    for field_ast in info.field_asts:
+        for field in iter_selected_fields(info, field_ast.selection_set):
+            function_name = field.name.value
+            if function_name == "count":
+                selected.setdefault("count", [])
+            elif function_name in columns:
+                column_keys = {to_camel_case(key): key for key in columns[function_name]}
+                for sub_field in iter_selected_fields(info, field.selection_set):
+                    key = column_keys.get(sub_field.name.value)
+                    if key is not None and key not in selected.setdefault(function_name, []):
+                        selected[function_name].append(key)
+    return selected
+
+
+def resolve_aggregate(root, info, group_by=None):
+    """Compute the selected aggregates with one ``SELECT ... GROUP BY`` query.
+
+    The rows are filtered like the edges of the connection, by its ``where``
+    and ``search`` arguments. Only the columns of ``groupBy`` can be selected
+    under ``group``.
+    """
+    from .fields import compile_where_clause, get_search_clauses
+
+    model = root.model
+    columns = get_aggregate_columns(model)
+    group_by = list(group_by or [])
+    selected = get_selected_aggregates(info, columns)
+    ungrouped = [key for key in selected.pop("group", []) if key not in group_by]
+    if ungrouped:
+        raise GraphQLError("group selects {} which groupBy does not contain".format(
+            ", ".join(to_camel_case(key) for key in ungrouped)
+        ))
+    if group_by:
+        selected["group"] = group_by
+
+    entities = []
+    labels = []
+    for function_name, keys in selected.items():
+        if function_name == "count":
+            entities.append(func.count().label("count"))
+            labels.append(("count", None))
+            continue
+        for key in keys:
+            column = columns[function_name][key][0]
+            if function_name != "group":
+                column = AGGREGATE_FUNCTIONS[function_name](column)
+            entities.append(column.label("{}_{}".format(function_name, len(labels))))
+            labels.append((function_name, key))
+    if not entities:
+        entities.append(func.count().label("count"))
+        labels.append(("count", None))
+
+    query = get_query(model, info.context).with_entities(*entities).select_from(model)
+    if root.where:
+        clause, params = compile_where_clause(model, root.where)
+        query = query.filter(clause).params(**params)
+    if getattr(root, "search", None):
+        match, _ = get_search_clauses(model, root.search)
+        query = query.filter(match)
+    if group_by:
+        group_columns = [columns["group"][key][0] for key in group_by]
+        query = query.group_by(*group_columns).order_by(*group_columns)
+
+    rows = []
+    for values in query:
+        row = {}
+        for (function_name, key), value in zip(labels, values):
+            if key is None:
+                row[function_name] = value
+            else:
+                row.setdefault(function_name, {})[key] = value
+        rows.append(row)
+    return rows
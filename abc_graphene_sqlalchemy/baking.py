@@ -0,0 +1,79 @@
+from sqlalchemy import bindparam
+from sqlalchemy.ext import baked
+
+from .planner import build_loader_options
+
+# process wide LRU cache of the compiled query skeletons
+bakery = baked.bakery()
+
+
+def get_plan_key(plan):
+    """Return a hashable key identifying the loader options of a ``LoadPlan``."""
+    columns = None if plan.columns is None else frozenset(plan.columns)
+    return columns, tuple(
+        (key, strategy, target_type, get_plan_key(child_plan))
+        for key, (strategy, target_type, child_plan) in plan.relationships.items()
+    )
+
+
+class BakedConnectionQuery(object):
+    """A baked query bound to a session and the parameters of one request.
+
+    The query skeleton is built and compiled once per process for every
+    cache key passed to ``add_criteria``; only the parameters change between
+    requests.
+    """
+
+    def __init__(self, model, session, params=None):
+        self.model = model
+        self.session = session
+        self.params = dict(params or {})
+        self.baked_query = bakery(lambda session: session.query(model), model)
+
+    def add_criteria(self, fn, *args, **params):
+        """Add a step to the query skeleton.
+
+        ``args`` must identify the step: steps built from the same code with
+        the same ``args`` share the cached statement. ``params`` are bound
+        when the query is executed.
+        """
+        self.baked_query.add_criteria(fn, *args)
+        self.params.update(params)
+        return self
+
+    def add_load_plan(self, plan, extra_columns=()):
+        """Add the loader options of a plan from ``plan_loads``."""
+        model = self.model
+        extra_columns = tuple(extra_columns)
+        return self.add_criteria(
+            lambda query: query.options(*build_loader_options(model, plan, extra_columns=extra_columns)),
+            get_plan_key(plan),
+            extra_columns,
+        )
+
+    def result(self, baked_query=None, **params):
+        return (baked_query or self.baked_query).for_session(self.session).params(**dict(self.params, **params))
+
+    def count(self):
+        return self.result().count()
+
+    def all(self):
+        return self.result().all()
+
+    def get(self, ident):
+        return self.result().get(ident)
+
+    def window(self, start, end=None):
+        """Return the rows between the offsets ``start`` and ``end``."""
+        baked_query = self.baked_query + (lambda query: query.offset(bindparam("_offset")))
+        if end is None:
+            return self.result(baked_query, _offset=start).all()
+        baked_query += lambda query: query.limit(bindparam("_limit"))
+        return self.result(baked_query, _offset=start, _limit=end - start).all()
+
+    def to_query(self):
+        """Return the equivalent ``Query``, e.g. to derive other statements."""
+        return self.baked_query.to_query(self.session).params(**self.params)
+
+    def __iter__(self):
+        return iter(self.result())
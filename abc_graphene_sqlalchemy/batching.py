@@ -0,0 +1,299 @@
+from collections.abc import MutableMapping
+from decimal import Decimal
+from uuid import UUID
+
+from promise import Promise
+from promise.dataloader import DataLoader
+from sqlalchemy import and_, event, func, or_, tuple_
+from sqlalchemy.inspection import inspect as sqlalchemyinspect
+from sqlalchemy.orm import Session, aliased
+from sqlalchemy.orm.attributes import set_committed_value
+
+from .utils import get_session
+
+LOADERS_CONTEXT_KEY = "sqlalchemy_loaders"
+MEMO_CONTEXT_KEY = "sqlalchemy_memo"
+FLUSH_COUNT_KEY = "graphene_sqlalchemy_flush_count"
+
+
+def count_flush(session):
+    """Drop the results memoized for ``session``, e.g. after bulk statements."""
+    session.info[FLUSH_COUNT_KEY] = session.info.get(FLUSH_COUNT_KEY, 0) + 1
+
+
+@event.listens_for(Session, "after_flush")
+def _count_flush(session, flush_context):
+    count_flush(session)
+
+
+@event.listens_for(Session, "after_bulk_update")
+@event.listens_for(Session, "after_bulk_delete")
+def _count_bulk_statement(context):
+    count_flush(context.session)
+
+
+def get_flush_count(session):
+    """Return how many times ``session`` has been flushed."""
+    return 0 if session is None else session.info.get(FLUSH_COUNT_KEY, 0)
+
+
+def get_request_loader(context, key, factory):
+    """Return the DataLoader registered under ``key`` for the current request.
+
+    Loaders live in the GraphQL context, so batching and memoization never
+    leak across requests. ``factory`` creates the loader on first use.
+    """
+    loaders = context.get(LOADERS_CONTEXT_KEY)
+    if loaders is None:
+        loaders = context[LOADERS_CONTEXT_KEY] = {}
+    loader = loaders.get(key)
+    if loader is None:
+        loader = loaders[key] = factory()
+    return loader
+
+
+def memoize(context, key, compute):
+    """Return the result memoized under ``key`` for the current request.
+
+    ``compute`` is called on the first use of ``key`` in the request. Results
+    (including Promises) live in the GraphQL context and are dropped whenever
+    the session of the request is flushed, so mutations never observe stale
+    results. Unhashable keys are not memoized, nor is anything when the
+    context is not a mapping, e.g. a request object.
+    """
+    if not isinstance(context, MutableMapping):
+        return compute()
+    try:
+        hash(key)
+    except TypeError:
+        return compute()
+    generation = get_flush_count(get_session(context))
+    memo = context.get(MEMO_CONTEXT_KEY)
+    if memo is None or memo[0] != generation:
+        memo = context[MEMO_CONTEXT_KEY] = (generation, {})
+    results = memo[1]
+    if key not in results:
+        results[key] = compute()
+    return results[key]
+
+
+def _is_equi_join(join_condition, pairs):
+    return join_condition.compare(and_(*(left == right for left, right in pairs)))
+
+
+def is_batchable_relationship(relationship_prop):
+    """Check whether ``relationship_prop`` joins on plain column equalities.
+
+    Only such relationships can be loaded for many parents with one ``IN``
+    query; custom join conditions are left to the regular lazy loader.
+    """
+    if relationship_prop.secondary is not None:
+        return _is_equi_join(
+            relationship_prop.primaryjoin, relationship_prop.synchronize_pairs
+        ) and _is_equi_join(
+            relationship_prop.secondaryjoin, relationship_prop.secondary_synchronize_pairs
+        )
+    return _is_equi_join(relationship_prop.primaryjoin, relationship_prop.local_remote_pairs)
+
+
+def in_clause(columns, keys):
+    """Build ``columns IN keys`` for single or composite ``keys`` tuples."""
+    if len(columns) == 1:
+        return columns[0].in_([key[0] for key in keys])
+    return tuple_(*columns).in_(keys)
+
+
+class InstanceLoader(DataLoader):
+    """Load instances of ``model`` by the values of ``columns``.
+
+    Keys are tuples of column values, values are the first instance matching
+    them (or None). All keys requested in a tick are fetched with one ``IN``
+    query.
+    """
+
+    def __init__(self, model, session, columns):
+        super(InstanceLoader, self).__init__()
+        self.model = model
+        self.session = session
+        self.columns = list(columns)
+
+    def batch_load_fn(self, keys):
+        mapper = sqlalchemyinspect(self.model)
+        attribute_keys = [mapper.get_property_by_column(column).key for column in self.columns]
+        instances = {}
+        query = self.session.query(self.model).filter(in_clause(self.columns, keys))
+        for instance in query:
+            instances.setdefault(tuple(getattr(instance, key) for key in attribute_keys), instance)
+        return Promise.resolve([instances.get(tuple(key)) for key in keys])
+
+
+class RelationshipConnectionLoader(DataLoader):
+    """Load a window of a collection relationship for many parents at once.
+
+    The children of all parents are fetched in one query, numbered per parent
+    with ``ROW_NUMBER() OVER (PARTITION BY <parent key> ORDER BY ...)`` and
+    filtered to the requested window, so nested paginated connections cost a
+    single query per level. Keys are tuples of the parent's join column
+    values, values are ``(rows, total)`` pairs where ``total`` is None unless
+    ``with_count`` is set.
+
+    With ``with_count``, the windows are outer joined to the number of
+    children of every parent (``COUNT(*) ... GROUP BY <parent key>``), so
+    parents whose window is empty still get their total.
+
+    :param int start: number of leading rows to skip for every parent
+    :param int end: offset of the last row to fetch, None for no upper bound
+    :param int last: keep only the trailing ``last`` rows of the window
+        clamped to the number of children (needs ``with_count``)
+    """
+
+    def __init__(self, relationship_prop, session, start=0, end=None, last=None, with_count=False):
+        super(RelationshipConnectionLoader, self).__init__()
+        self.relationship_prop = relationship_prop
+        self.session = session
+        self.start = start
+        self.end = end
+        self.last = last
+        self.with_count = with_count or last is not None
+
+    def get_children_query(self, keys, *columns):
+        relationship_prop = self.relationship_prop
+        query = self.session.query(*columns).select_from(relationship_prop.mapper.entity)
+        if relationship_prop.secondary is not None:
+            query = query.join(relationship_prop.secondary, relationship_prop.secondaryjoin)
+        partition_columns = [remote for _, remote in relationship_prop.synchronize_pairs]
+        return query.filter(in_clause(partition_columns, keys))
+
+    def batch_load_fn(self, keys):
+        relationship_prop = self.relationship_prop
+        entity = relationship_prop.mapper.entity
+        partition_columns = [remote for _, remote in relationship_prop.synchronize_pairs]
+        order_by = relationship_prop.order_by or list(relationship_prop.mapper.primary_key)
+        labels = ["_parent_{}".format(i) for i in range(len(partition_columns))]
+        columns = [column.label(label) for column, label in zip(partition_columns, labels)]
+        columns.append(func.row_number().over(partition_by=partition_columns, order_by=order_by).label("_rn"))
+        inner = self.get_children_query(keys, entity, *columns).subquery()
+        children = aliased(entity, inner)
+
+        window = [inner.c._rn > self.start]
+        if self.end is not None:
+            window.append(inner.c._rn <= self.end)
+        if not self.with_count:
+            parent_columns = [inner.c[label] for label in labels]
+            query = self.session.query(children, *parent_columns).filter(*window)
+        else:
+            counts = self.get_children_query(
+                keys, *(columns[:len(labels)] + [func.count().label("_total")])
+            ).group_by(*partition_columns).subquery()
+            if self.last is not None:
+                # _rn > min(end, _total) - last
+                bounds = [counts.c._total] + ([] if self.end is None else [self.end])
+                window.append(or_(*(inner.c._rn > bound - self.last for bound in bounds)))
+            parent_columns = [counts.c[label] for label in labels]
+            query = self.session.query(children, *parent_columns).add_columns(counts.c._total)
+            query = query.select_from(counts).outerjoin(
+                children, and_(*([inner.c[label] == counts.c[label] for label in labels] + window))
+            )
+        query = query.order_by(*(parent_columns + [inner.c._rn]))
+
+        rows = {tuple(key): [] for key in keys}
+        totals = {}
+        for row in query:
+            key = tuple(row[1:len(parent_columns) + 1])
+            if row[0] is not None:
+                rows[key].append(row[0])
+            if self.with_count:
+                totals[key] = row[-1]
+        default_total = 0 if self.with_count else None
+        return Promise.resolve([(rows[tuple(key)], totals.get(tuple(key), default_total)) for key in keys])
+
+
+def get_parent_key(root, relationship_prop):
+    """Return the values of the columns joining ``root`` to the relationship."""
+    mapper = sqlalchemyinspect(root).mapper
+    return tuple(
+        getattr(root, mapper.get_property_by_column(local).key)
+        for local, _ in relationship_prop.synchronize_pairs
+    )
+
+
+def get_batch_resolver(relationship_prop):
+    """Return a resolver batching the loads of a scalar relationship.
+
+    All parents resolved in the same tick of a request are collected and the
+    related rows are fetched with a single ``IN`` query per relationship.
+    """
+    local_columns = [local for local, _ in relationship_prop.local_remote_pairs]
+
+    def resolve(root, info, **args):
+        state = sqlalchemyinspect(root)
+        if relationship_prop.key in state.dict:
+            return state.dict[relationship_prop.key]
+        key = tuple(
+            getattr(root, state.mapper.get_property_by_column(column).key)
+            for column in local_columns
+        )
+        if None in key:
+            return None
+        session = Session.object_session(root) or get_session(info.context)
+        loader = get_request_loader(
+            info.context,
+            (relationship_prop, session),
+            lambda: InstanceLoader(
+                relationship_prop.mapper.entity,
+                session,
+                [remote for _, remote in relationship_prop.local_remote_pairs],
+            ),
+        )
+
+        def assign(target):
+            set_committed_value(root, relationship_prop.key, target)
+            return target
+
+        return loader.load(key).then(assign)
+
+    return resolve
+
+
+def coerce_value(column_type, value):
+    """Convert ``value`` (e.g. an id parsed from a global id) to ``column_type``.
+
+    Returns None if the value cannot be converted.
+    """
+    try:
+        python_type = column_type.python_type
+    except NotImplementedError:
+        return value
+    if isinstance(value, python_type) or python_type not in (int, float, Decimal, UUID):
+        return value
+    try:
+        return python_type(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def coerce_column_value(column, value):
+    """Convert ``value`` to the type of ``column``, see ``coerce_value``."""
+    return coerce_value(column.type, value)
+
+
+def load_instance(context, session, model, columns, key):
+    """Load the instance of ``model`` whose ``columns`` equal ``key`` in a batch.
+
+    Primary key lookups are answered from the session's identity map when
+    possible. Returns a Promise of the instance (or None).
+    """
+    mapper = sqlalchemyinspect(model)
+    key = tuple(coerce_column_value(column, value) for column, value in zip(columns, key))
+    if None in key:
+        return Promise.resolve(None)
+    if list(columns) == list(mapper.primary_key):
+        instance = session.identity_map.get(mapper.identity_key_from_primary_key(list(key)))
+        if instance is not None:
+            return Promise.resolve(instance)
+    loader = get_request_loader(
+        context,
+        (model, session, tuple(columns)),
+        lambda: InstanceLoader(model, session, columns),
+    )
+    return loader.load(key)
@@ -0,0 +1,582 @@
+from collections import OrderedDict
+from operator import attrgetter
+
+from sqlalchemy import UniqueConstraint, bindparam, tuple_
+from sqlalchemy.inspection import inspect as sqlalchemyinspect
+from sqlalchemy.orm import make_transient_to_detached
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.orm.interfaces import MANYTOONE
+
+from .batching import coerce_column_value, count_flush
+from .caching import invalidate_tables
+from .expressions import Upsert, in_values
+
+
+def get_reference_key(model, attrs):
+    """Return the primary key of the ``model`` row referenced by a nested input.
+
+    Returns None when ``attrs`` does not set every primary key column.
+    """
+    mapper = sqlalchemyinspect(model)
+    key = []
+    for column in mapper.primary_key:
+        value = attrs.get(mapper.get_property_by_column(column).key)
+        if value is None:
+            return None
+        key.append(coerce_column_value(column, value))
+    return tuple(key)
+
+
+def _collect_references(model, attrs, keys):
+    relationships = sqlalchemyinspect(model).relationships
+    for name, value in attrs.items():
+        if name not in relationships or value is None:
+            continue
+        target = relationships[name].mapper.class_
+        for item in value if isinstance(value, (list, tuple)) else [value]:
+            key = get_reference_key(target, item)
+            if key is not None:
+                keys.setdefault(target, OrderedDict())[key] = None
+            _collect_references(target, item, keys)
+
+
+def load_references(session, model, rows):
+    """Load the rows referenced by key in the nested inputs of ``rows``.
+
+    Nested relationship inputs setting the primary key of their target
+    reference an existing row. The references of all ``rows`` are loaded
+    with one ``IN`` query per related model (rows already in the session
+    are not queried). Returns a mapping of ``(model, key)`` to instance and
+    raises ``ValueError`` for keys without a row.
+    """
+    keys = OrderedDict()
+    for row in rows:
+        _collect_references(model, row, keys)
+    references = {}
+    for target, target_keys in keys.items():
+        mapper = sqlalchemyinspect(target)
+        missing = []
+        for key in target_keys:
+            instance = session.identity_map.get(mapper.identity_key_from_primary_key(list(key)))
+            if instance is None:
+                missing.append(key)
+            else:
+                references[target, key] = instance
+        if missing:
+            instances = load_rows(session, target, missing, list(mapper.primary_key))
+            for key, instance in zip(missing, instances):
+                if instance is None:
+                    raise ValueError("{} {} does not exist".format(
+                        mapper.class_.__name__, ", ".join(str(value) for value in key)
+                    ))
+                references[target, key] = instance
+    return references
+
+
+def _get_related(target, value, references, current=None):
+    key = get_reference_key(target, value) if references is not None else None
+    if key is not None:
+        related = references[target, key]
+        mapper = sqlalchemyinspect(target)
+        primary_key = {mapper.get_property_by_column(column).key for column in mapper.primary_key}
+        value = {name: item for name, item in value.items() if name not in primary_key}
+    elif current is not None:
+        related = current
+    else:
+        # instantiate class of the same type as the relationship target
+        related = target()
+    set_model_attributes(related, value, references)
+    return related
+
+
+def set_model_attributes(instance, attrs, references=None):
+    """Set ``attrs`` on ``instance``, resolving nested relationship inputs.
+
+    A nested input setting the primary key of its target is assigned the
+    row from ``references`` (see ``load_references``); others update the
+    related instance, created if there is none. List inputs replace the
+    collection.
+    """
+    relationships = instance.__mapper__.relationships
+    for key, value in attrs.items():
+        if key in relationships and value is not None:
+            target = relationships[key].mapper.class_
+            if isinstance(value, (list, tuple)):
+                setattr(instance, key, [_get_related(target, item, references) for item in value])
+            else:
+                setattr(instance, key, _get_related(target, value, references, getattr(instance, key)))
+        else:
+            setattr(instance, key, value)
+
+
+def get_primary_key(model):
+    """Return the primary key column of ``model`` and the key of its attribute."""
+    mapper = sqlalchemyinspect(model)
+    if len(mapper.primary_key) != 1:
+        raise ValueError(
+            "Bulk mutations require a single column primary key, {} has {}".format(
+                mapper.class_.__name__, len(mapper.primary_key)
+            )
+        )
+    column = mapper.primary_key[0]
+    return column, mapper.get_property_by_column(column).key
+
+
+def group_rows(model, rows):
+    """Split ``rows`` by the columns they set.
+
+    Returns the groups of ``(index, row)`` pairs setting only columns, by
+    their sorted keys, and the pairs of the rows setting relationships.
+    """
+    relationships = sqlalchemyinspect(model).relationships
+    groups = OrderedDict()
+    nested = []
+    for index, row in enumerate(rows):
+        if any(key in relationships for key in row):
+            nested.append((index, row))
+        else:
+            groups.setdefault(tuple(sorted(row)), []).append((index, row))
+    return groups, nested
+
+
+def split_orm_groups(grouped, is_direct):
+    """Move the groups of ``group_rows`` failing ``is_direct(keys)`` to the ORM rows.
+
+    Returns the remaining groups and the ``(index, row)`` pairs to write
+    through the ORM, in input order.
+    """
+    groups, nested = grouped
+    direct = OrderedDict()
+    for keys, group in groups.items():
+        if is_direct(keys):
+            direct[keys] = group
+        else:
+            nested.extend(group)
+    return direct, sorted(nested, key=lambda item: item[0])
+
+
+def load_rows(session, model, ids, columns=None):
+    """Load the instances of ``model`` for the primary keys ``ids`` with one query.
+
+    With ``columns``, ``ids`` are tuples of the values of those columns
+    instead. Instances are returned in the order of ``ids``, None for missing
+    rows, and reflect the database even if they were already in the session.
+    """
+    if columns is None:
+        column, key = get_primary_key(model)
+        wanted = [value for value in ids if value is not None]
+        clause = in_values(column, wanted)
+        get_key = attrgetter(key)
+    else:
+        mapper = sqlalchemyinspect(model)
+        wanted = [value for value in ids if value is not None]
+        clause = tuple_(*columns).in_(wanted)
+        get_key = attrgetter(*(mapper.get_property_by_column(column).key for column in columns))
+        if len(columns) == 1:
+            wanted = [value[0] for value in wanted]
+            clause = in_values(columns[0], wanted)
+            ids = [None if value is None else value[0] for value in ids]
+    if not wanted:
+        return [None] * len(ids)
+    query = session.query(model).filter(clause).populate_existing()
+    instances = {get_key(instance): instance for instance in query}
+    return [instances.get(value) for value in ids]
+
+
+def mark_changed(session, model):
+    """Invalidate what bulk statements on the tables of ``model`` made stale.
+
+    Bulk mappings and statements executed directly bypass the flush, so
+    neither the request memo nor the result cache sees them otherwise.
+    """
+    invalidate_tables(session, [table.fullname for table in sqlalchemyinspect(model).tables])
+    count_flush(session)
+
+
+def _column_values(mapper, mapping):
+    return {mapper.get_property(key).columns[0].key: value for key, value in mapping.items()}
+
+
+def _insert_returning(session, model, column, mappings):
+    mapper = sqlalchemyinspect(model)
+    values = [_column_values(mapper, mapping) for mapping in mappings]
+    statement = mapper.local_table.insert().values(values).returning(column)
+    return [row[0] for row in session.execute(statement, mapper=model)]
+
+
+def _update_many(session, model, column, rows):
+    mapper = sqlalchemyinspect(model)
+    columns = {key: mapper.get_property(key).columns[0] for key in rows[0][1]}
+    statement = mapper.local_table.update().where(column == bindparam("_pk")).values({
+        target: bindparam("_{}".format(key)) for key, target in columns.items()
+    })
+    session.execute(statement, [
+        dict({"_{}".format(key): value for key, value in row.items()}, _pk=value) for value, row in rows
+    ], mapper=model)
+
+
+def _has_listeners(dispatch, *names):
+    return any(getattr(dispatch, name) for name in names)
+
+
+def _has_attribute_hooks(mapper, keys):
+    """Check whether setting ``keys`` runs ``@validates`` methods or ``set`` listeners."""
+    for key in keys:
+        if key in mapper.validators:
+            return True
+        if key in mapper.class_manager and _has_listeners(mapper.class_manager[key].dispatch, "set"):
+            return True
+    return False
+
+
+def can_insert_directly(model, values):
+    """Check whether rows of ``model`` setting ``values`` can skip the unit of work.
+
+    That is not the case for models with a version counter, for rows setting
+    relationships, nor when the ORM would run Python code for the insert:
+    ``@validates`` methods and attribute ``set`` listeners of the inserted
+    columns, and mapper insert events.
+    """
+    mapper = sqlalchemyinspect(model)
+    if mapper.version_id_col is not None or any(key in mapper.relationships for key in values):
+        return False
+    if _has_listeners(mapper.dispatch, "before_insert", "after_insert"):
+        return False
+    return not _has_attribute_hooks(mapper, values)
+
+
+def can_write_directly(model, values=None):
+    """Check whether a row of ``model`` can be changed with a single statement.
+
+    That is not the case for models mapped to several tables or with a
+    version counter, for updates (``values``) setting relationships, and
+    for deletes (``values`` None) of models whose one-to-many or many-to-many
+    relationships the ORM would cascade to or nullify. Nor is it when the ORM
+    would run Python code for the change: ``@validates`` methods and
+    attribute ``set`` listeners of updated columns, and mapper events of
+    the update or delete.
+    """
+    mapper = sqlalchemyinspect(model)
+    if len(mapper.tables) != 1 or len(mapper.primary_key) != 1 or mapper.version_id_col is not None:
+        return False
+    if values is None:
+        if _has_listeners(mapper.dispatch, "before_delete", "after_delete"):
+            return False
+        return all(relationship.direction is MANYTOONE for relationship in mapper.relationships)
+    if _has_listeners(mapper.dispatch, "before_update", "after_update"):
+        return False
+    if any(key in mapper.relationships for key in values):
+        return False
+    return not _has_attribute_hooks(mapper, values)
+
+
+def attach_row(session, model, values, persistent=True):
+    """Return the instance of ``model`` for the column ``values`` of a row.
+
+    The instance is taken from the identity map or built without a query,
+    and is left detached unless ``persistent``. Columns missing from
+    ``values`` are loaded on access.
+    """
+    mapper = sqlalchemyinspect(model)
+    column, pk_key = get_primary_key(model)
+    instance = session.identity_map.get(mapper.identity_key_from_primary_key([values[pk_key]]))
+    if instance is None:
+        instance = mapper.class_manager.new_instance()
+        for key, value in values.items():
+            set_committed_value(instance, key, value)
+        make_transient_to_detached(instance)
+        if persistent:
+            session.add(instance)
+        return instance
+    if persistent:
+        # other columns may have changed with the row, e.g. through onupdate
+        session.expire(instance)
+    for key, value in values.items():
+        set_committed_value(instance, key, value)
+    if not persistent:
+        session.expunge(instance)
+    return instance
+
+
+def _get_returning(session, model, columns):
+    mapper = sqlalchemyinspect(model)
+    if not session.get_bind(mapper).dialect.implicit_returning:
+        return None
+    primary_key = mapper.primary_key[0]
+    return [
+        prop for prop in mapper.column_attrs
+        if prop.columns[0].table is mapper.local_table
+        and (columns is None or prop.key in columns or prop.columns[0] is primary_key)
+    ]
+
+
+def _execute_returning(session, model, statement, returning):
+    row = session.execute(statement.returning(*(prop.columns[0] for prop in returning)), mapper=model).first()
+    return None if row is None else {prop.key: value for prop, value in zip(returning, row)}
+
+
+def update_row(session, model, id, values, columns=None):
+    """Update the row of ``model`` with the primary key ``id`` with one ``UPDATE``.
+
+    ``columns`` are the attribute keys the caller needs (all when None).
+    Where the dialect supports ``RETURNING`` they are returned by the
+    statement; elsewhere the row is only loaded after the update when they
+    are not all set by ``values``. Returns the instance, or None if the row
+    does not exist.
+    """
+    mapper = sqlalchemyinspect(model)
+    column, pk_key = get_primary_key(model)
+    id = coerce_column_value(column, id)
+    if id is None:
+        return None
+    session.flush()
+    statement = mapper.local_table.update().where(column == id).values(_column_values(mapper, values))
+    returning = _get_returning(session, model, columns)
+    if returning is not None:
+        row = _execute_returning(session, model, statement, returning)
+    elif session.execute(statement, mapper=model).rowcount:
+        row = dict(values, **{pk_key: id})
+    else:
+        row = None
+    if row is None:
+        return None
+    mark_changed(session, model)
+    if returning is None and (columns is None or not set(columns) <= set(row)):
+        return load_rows(session, model, [id])[0]
+    return attach_row(session, model, row)
+
+
+def delete_row(session, model, id, columns=None):
+    """Delete the row of ``model`` with the primary key ``id`` with one ``DELETE``.
+
+    ``columns`` are the attribute keys the caller needs (all when None).
+    Where the dialect supports ``RETURNING`` they are returned by the
+    statement; elsewhere the row is loaded first unless only its primary key
+    is needed. Returns the detached instance, or None if the row does not
+    exist.
+    """
+    mapper = sqlalchemyinspect(model)
+    column, pk_key = get_primary_key(model)
+    id = coerce_column_value(column, id)
+    if id is None:
+        return None
+    session.flush()
+    statement = mapper.local_table.delete().where(column == id)
+    returning = _get_returning(session, model, columns)
+    instance = None
+    if returning is not None:
+        row = _execute_returning(session, model, statement, returning)
+        if row is None:
+            return None
+    else:
+        if columns is None or not set(columns) <= {pk_key}:
+            instance = load_rows(session, model, [id])[0]
+            if instance is None:
+                return None
+        if not session.execute(statement, mapper=model).rowcount:
+            return None
+        row = {pk_key: id}
+    mark_changed(session, model)
+    if instance is not None:
+        session.expunge(instance)
+        return instance
+    return attach_row(session, model, row, persistent=False)
+
+
+def bulk_create(session, model, rows):
+    """Insert ``rows`` of ``model`` and return the instances in input order.
+
+    Rows setting only columns are grouped by the columns they set. A group
+    is inserted with one multi-row ``INSERT ... RETURNING`` where the dialect
+    supports it, otherwise with ``bulk_insert_mappings`` (an executemany
+    when the rows carry their primary key). Rows setting relationships are
+    added through the ORM, like the groups the ORM must run Python code for
+    (see ``can_insert_directly``). The session is flushed once.
+    """
+    column, pk_key = get_primary_key(model)
+    mapper = sqlalchemyinspect(model)
+    dialect = session.get_bind(mapper).dialect
+    returning = dialect.implicit_returning and dialect.supports_multivalues_insert and len(mapper.tables) == 1
+
+    session.flush()
+    groups, nested = split_orm_groups(group_rows(model, rows), lambda keys: can_insert_directly(model, keys))
+    ids = [None] * len(rows)
+    for keys, group in groups.items():
+        mappings = [dict(row) for _, row in group]
+        if pk_key in keys:
+            for mapping in mappings:
+                mapping[pk_key] = coerce_column_value(column, mapping[pk_key])
+            session.bulk_insert_mappings(model, mappings)
+        elif returning and keys:
+            for mapping, value in zip(mappings, _insert_returning(session, model, column, mappings)):
+                mapping[pk_key] = value
+        else:
+            session.bulk_insert_mappings(model, mappings, return_defaults=True)
+        for (index, _), mapping in zip(group, mappings):
+            ids[index] = mapping[pk_key]
+
+    instances = [None] * len(rows)
+    references = load_references(session, model, [row for _, row in nested])
+    for index, row in nested:
+        instance = instances[index] = model()
+        set_model_attributes(instance, row, references)
+        session.add(instance)
+    session.flush()
+    if groups:
+        mark_changed(session, model)
+        loaded = iter(load_rows(session, model, [value for value in ids if value is not None]))
+        instances = [instance if value is None else next(loaded) for instance, value in zip(instances, ids)]
+    return instances
+
+
+def bulk_update(session, model, updates):
+    """Apply ``(id, values)`` updates to ``model`` and return the instances in input order.
+
+    Rows setting only columns are grouped by the columns they set. A group
+    whose rows all set the same values becomes one ``UPDATE ... WHERE id IN``,
+    any other group an executemany ``UPDATE ... WHERE id = :id``.
+    Rows setting relationships are updated through the ORM, like the groups
+    that cannot skip it (see ``can_write_directly``). The session is
+    flushed once; missing rows are returned as None.
+    """
+    column, _ = get_primary_key(model)
+    ids = [coerce_column_value(column, value) for value, _ in updates]
+
+    session.flush()
+    groups, nested = split_orm_groups(
+        group_rows(model, [values for _, values in updates]), lambda keys: can_write_directly(model, keys)
+    )
+    for keys, group in groups.items():
+        if not keys:
+            continue
+        rows = [row for _, row in group]
+        group_ids = [ids[index] for index, _ in group if ids[index] is not None]
+        if all(row == rows[0] for row in rows):
+            session.query(model).filter(in_values(column, group_ids)).update(
+                dict(rows[0]), synchronize_session=False
+            )
+        else:
+            _update_many(session, model, column, [(ids[index], row) for index, row in group if ids[index] is not None])
+    if groups:
+        mark_changed(session, model)
+
+    instances = load_rows(session, model, ids)
+    references = load_references(session, model, [row for _, row in nested])
+    for index, row in nested:
+        if instances[index] is not None:
+            set_model_attributes(instances[index], row, references)
+    session.flush()
+    return instances
+
+
+def expire_instances(session, model):
+    """Expire the instances of ``model`` in ``session`` after set-based statements."""
+    for instance in list(session.identity_map.values()):
+        if isinstance(instance, model):
+            session.expire(instance)
+
+
+def update_where(session, model, clause, values, params=None):
+    """Set ``values`` on the rows of ``model`` matching ``clause`` with one ``UPDATE``.
+
+    ``params`` are bound to ``clause``. Returns the number of matched rows.
+    """
+    mapper = sqlalchemyinspect(model)
+    if any(key in mapper.relationships for key in values):
+        raise ValueError("Set-based updates of {} cannot set relationships".format(mapper.class_.__name__))
+    if not values:
+        return session.query(model).filter(clause).params(**(params or {})).count()
+    count = session.query(model).filter(clause).params(**(params or {})).update(
+        dict(values), synchronize_session=False
+    )
+    expire_instances(session, model)
+    return count
+
+
+def delete_where(session, model, clause, params=None):
+    """Delete the rows of ``model`` matching ``clause`` with one ``DELETE``.
+
+    ``params`` are bound to ``clause``. Unlike ``bulk_delete`` no cascades
+    are applied. Returns the number of deleted rows.
+    """
+    count = session.query(model).filter(clause).params(**(params or {})).delete(synchronize_session=False)
+    expire_instances(session, model)
+    return count
+
+
+def get_unique_columns(model, names=None):
+    """Return the columns of ``model`` an upsert is keyed on.
+
+    ``names`` are the attribute keys of the columns of a primary key or
+    unique constraint; the primary key is used by default.
+    """
+    mapper = sqlalchemyinspect(model)
+    if not names:
+        return list(mapper.primary_key)
+    columns = [mapper.get_property(name).columns[0] for name in names]
+    table = mapper.local_table
+    keys = [set(table.primary_key.columns)] + [
+        set(constraint.columns) for constraint in table.constraints if isinstance(constraint, UniqueConstraint)
+    ] + [set(index.columns) for index in table.indexes if index.unique]
+    # a single column may also be declared unique on the column itself
+    if set(columns) not in keys and not (len(columns) == 1 and columns[0].unique):
+        raise ValueError(
+            "{} has no primary key or unique constraint on {}".format(mapper.class_.__name__, ", ".join(names))
+        )
+    return columns
+
+
+def bulk_upsert(session, model, rows, key=None):
+    """Insert ``rows`` of ``model``, updating the rows they conflict with.
+
+    Conflicts are detected on the primary key, or on the unique columns
+    named by ``key`` (see ``get_unique_columns``), which every row must set.
+    Rows are grouped by the columns they set and each group is sent as one
+    multi-row ``Upsert``. The instances are returned in input order.
+    """
+    mapper = sqlalchemyinspect(model)
+    columns = get_unique_columns(model, key)
+    keys = [mapper.get_property_by_column(column).key for column in columns]
+    relationships = mapper.relationships
+    if len(mapper.tables) != 1:
+        raise ValueError("Upserts of {} would span several tables".format(mapper.class_.__name__))
+
+    session.flush()
+    groups = OrderedDict()
+    coerced = []
+    for index, row in enumerate(rows):
+        if any(name in relationships for name in row):
+            raise ValueError("Upserts of {} cannot set relationships".format(mapper.class_.__name__))
+        if any(row.get(name) is None for name in keys):
+            raise ValueError("Upserts of {} must set {}".format(mapper.class_.__name__, ", ".join(keys)))
+        row = {name: coerce_column_value(mapper.get_property(name).columns[0], value) for name, value in row.items()}
+        coerced.append(row)
+        groups.setdefault(tuple(sorted(row)), []).append((index, row))
+
+    for names, group in groups.items():
+        session.execute(Upsert(
+            mapper.local_table,
+            [_column_values(mapper, row) for _, row in group],
+            index_elements=[column.name for column in columns],
+            update_columns=[mapper.get_property(name).columns[0].name for name in names if name not in keys],
+        ), mapper=model)
+    if groups:
+        mark_changed(session, model)
+    return load_rows(session, model, [tuple(row[name] for name in keys) for row in coerced], columns)
+
+
+def bulk_delete(session, model, ids):
+    """Delete the rows of ``model`` with the primary keys ``ids``.
+
+    The rows are loaded with one query and deleted through the ORM, so
+    cascades still apply; the flush sends the ``DELETE`` as an executemany.
+    Returns the deleted instances in input order, None for missing rows.
+    """
+    column, _ = get_primary_key(model)
+    session.flush()
+    instances = load_rows(session, model, [coerce_column_value(column, value) for value in ids])
+    for instance in instances:
+        if instance is not None:
+            session.delete(instance)
+    session.flush()
+    return instances
@@ -0,0 +1,229 @@
+import hashlib
+import json
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import event
+from sqlalchemy.inspection import inspect as sqlalchemyinspect
+from sqlalchemy.orm import Session, attributes, make_transient_to_detached
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.sql.util import find_tables
+
+PENDING_TABLES_KEY = "graphene_sqlalchemy_pending_tables"
+
+
+class MemoryCacheBackend(object):
+    """In-process cache backend with LRU eviction and per-entry TTL.
+
+    A backend stores cache entries (``get``/``set``) and the per-table
+    generation counters used for invalidation (``get_counters``/``incr``).
+    Counters are never evicted. Other backends, e.g. for a shared cache
+    server, implement the same four methods.
+    """
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.counters = {}
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            item = self.entries.get(key)
+            if item is None:
+                return None
+            value, expires = item
+            if expires is not None and expires <= time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        with self.lock:
+            expires = None if ttl is None else time.monotonic() + ttl
+            self.entries[key] = (value, expires)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def get_counters(self, names):
+        with self.lock:
+            return tuple(self.counters.get(name, 0) for name in names)
+
+    def incr(self, name):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + 1
+
+
+class PickleCacheBackend(MemoryCacheBackend):
+    """Local stand-in for a shared cache backend.
+
+    Values are pickled on ``set`` and unpickled on ``get``, like they would
+    be on their way to and from a cache server, so anything cached through it
+    is known to survive that round trip.
+    """
+
+    def get(self, key):
+        value = super(PickleCacheBackend, self).get(key)
+        return None if value is None else pickle.loads(value)
+
+    def set(self, key, value, ttl=None):
+        super(PickleCacheBackend, self).set(key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL), ttl)
+
+
+def to_canonical(value):
+    """Convert a cache key to JSON values that do not depend on hash ordering.
+
+    Sets and dicts are sorted and classes replaced by their qualified name,
+    so every process computes the same key for the same query.
+    """
+    if isinstance(value, type):
+        return "{}.{}".format(value.__module__, value.__qualname__)
+    if isinstance(value, dict):
+        return sorted(([to_canonical(key), to_canonical(item)] for key, item in value.items()), key=json.dumps)
+    if isinstance(value, (set, frozenset)):
+        return sorted((to_canonical(item) for item in value), key=json.dumps)
+    if isinstance(value, (list, tuple)):
+        return [to_canonical(item) for item in value]
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    return repr(value)
+
+
+def dump_instance(instance):
+    """Return the class and loaded column values of a model instance."""
+    state = sqlalchemyinspect(instance)
+    values = {
+        prop.key: state.dict[prop.key]
+        for prop in state.mapper.column_attrs
+        if prop.key in state.dict
+    }
+    return state.mapper.class_, values
+
+
+def restore_instance(session, model, values):
+    """Return the instance of ``session`` for values from ``dump_instance``.
+
+    Instances already in the session are returned as they are, so pending
+    changes are never overwritten; others are merged without a query.
+    """
+    mapper = sqlalchemyinspect(model)
+    primary_key = [values.get(mapper.get_property_by_column(column).key) for column in mapper.primary_key]
+    instance = session.identity_map.get(mapper.identity_key_from_primary_key(primary_key))
+    if instance is not None:
+        return instance
+    instance = mapper.class_manager.new_instance()
+    for key, value in values.items():
+        set_committed_value(instance, key, value)
+    make_transient_to_detached(instance)
+    return session.merge(instance, load=False)
+
+
+class ResultCache(object):
+    """Cache of connection windows shared across requests.
+
+    Entries remember the generation of every table their statement reads
+    from. Flushes, commits and rollbacks of any session bump the generation
+    of the tables they touched, which invalidates the entries at once.
+    """
+
+    def __init__(self, backend=None):
+        self.backend = backend if backend is not None else MemoryCacheBackend()
+
+    @staticmethod
+    def make_key(key):
+        payload = json.dumps(to_canonical(key), separators=(",", ":"))
+        return "graphene_sqlalchemy:" + hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+    def invalidate(self, table_names):
+        for name in table_names:
+            self.backend.incr(name)
+
+    def fetch(self, key, session, statement, ttl, compute):
+        """Return the ``(list_slice, slice_start, length)`` cached under ``key``.
+
+        ``compute`` produces the value on a miss; the instances of its list
+        slice are stored detached and merged into ``session`` on hits. While
+        ``session`` has flushed changes to the tables of ``statement`` that
+        are not committed yet, the cache is bypassed: other requests must
+        not see them, and this one must not miss them.
+        """
+        cache_key = self.make_key(key)
+        table_names = sorted({table.fullname for table in find_tables(statement, check_columns=True)})
+        if session.info.get(PENDING_TABLES_KEY, set()) & set(table_names):
+            return compute()
+        generations = self.backend.get_counters(table_names)
+        entry = self.backend.get(cache_key)
+        if entry is not None and entry["generations"] == generations and entry["tables"] == table_names:
+            list_slice = [restore_instance(session, model, values) for model, values in entry["rows"]]
+            return list_slice, entry["slice_start"], entry["length"]
+
+        list_slice, slice_start, length = compute()
+        if session.info.get(PENDING_TABLES_KEY, set()) & set(table_names):
+            # ``compute`` flushed changes of the session first
+            return list_slice, slice_start, length
+        self.backend.set(cache_key, {
+            "tables": table_names,
+            "generations": generations,
+            "rows": [dump_instance(instance) for instance in list_slice],
+            "slice_start": slice_start,
+            "length": length,
+        }, ttl)
+        return list_slice, slice_start, length
+
+
+_result_cache = ResultCache()
+
+
+def get_result_cache():
+    return _result_cache
+
+
+def set_result_cache(cache):
+    """Replace the process wide ``ResultCache``, e.g. to use another backend."""
+    global _result_cache
+    _result_cache = cache
+
+
+def _get_changed_tables(session):
+    tables = set()
+    for instance in list(session.new) + list(session.dirty) + list(session.deleted):
+        mapper = sqlalchemyinspect(instance).mapper
+        tables.update(table.fullname for table in mapper.tables)
+        for relationship in mapper.relationships:
+            if relationship.secondary is not None and \
+                    attributes.get_history(instance, relationship.key).has_changes():
+                tables.add(relationship.secondary.fullname)
+    return tables
+
+
+def invalidate_tables(session, table_names):
+    """Invalidate the entries reading from ``table_names``, changed by ``session``.
+
+    Called for statements no session event reports, e.g. bulk mappings.
+    """
+    session.info.setdefault(PENDING_TABLES_KEY, set()).update(table_names)
+    get_result_cache().invalidate(table_names)
+
+
+@event.listens_for(Session, "after_flush")
+def _invalidate_flushed_tables(session, flush_context):
+    invalidate_tables(session, _get_changed_tables(session))
+
+
+@event.listens_for(Session, "after_bulk_update")
+@event.listens_for(Session, "after_bulk_delete")
+def _invalidate_bulk_tables(context):
+    invalidate_tables(context.session, [context.primary_table.fullname])
+
+
+@event.listens_for(Session, "after_commit")
+@event.listens_for(Session, "after_rollback")
+def _invalidate_transaction_tables(session):
+    # entries cached while the transaction was open may hold its own changes
+    tables = session.info.pop(PENDING_TABLES_KEY, None)
+    if tables:
+        get_result_cache().invalidate(tables)
@@ -5,6 +5,7 @@ from sqlalchemy import types
 from sqlalchemy.dialects import postgresql
 from sqlalchemy.orm import interfaces
 
+from .batching import get_batch_resolver, is_batchable_relationship
 from .enums import enum_for_sa_enum
 from .registry import get_global_registry
 
@@ -26,7 +27,8 @@ def is_column_nullable(column):
     return bool(getattr(column, "nullable", True))
 
 
-def convert_sqlalchemy_relationship(relationship_prop, registry, connection_field_factory, **field_kwargs):
+def convert_sqlalchemy_relationship(relationship_prop, registry, connection_field_factory, batching=False,
+                                    **field_kwargs):
     direction = relationship_prop.direction
     model = relationship_prop.mapper.entity
 
@@ -36,15 +38,28 @@ def convert_sqlalchemy_relationship(relationship_prop, registry, connection_fiel
         if not _type:
             return None
         if direction == interfaces.MANYTOONE or not relationship_prop.uselist:
+            if batching and relationship_prop.secondary is None and is_batchable_relationship(relationship_prop):
+                resolver = get_batch_resolver(relationship_prop)
+            else:
+                resolver = _get_attr_resolver(relationship_prop.key)
             return Field(
                 _type,
-                resolver=_get_attr_resolver(relationship_prop.key),
+                resolver=resolver,
                 **field_kwargs
             )
         elif direction in (interfaces.ONETOMANY, interfaces.MANYTOMANY):
             if _type._meta.connection:
+                from .fields import BatchSQLAlchemyConnectionField, default_connection_field_factory
+
                 # TODO Add a way to override connection_field_factory
-                return connection_field_factory(relationship_prop, registry, **field_kwargs)
+                factory = connection_field_factory
+                if (
+                    batching
+                    and connection_field_factory is default_connection_field_factory
+                    and is_batchable_relationship(relationship_prop)
+                ):
+                    factory = BatchSQLAlchemyConnectionField.from_relationship
+                return factory(relationship_prop, registry, **field_kwargs)
             return Field(
                 List(_type),
                 **field_kwargs
@@ -118,6 +133,11 @@ def convert_sqlalchemy_type(type, column, registry=None):
     )
 
 
+@convert_sqlalchemy_type.register(types.Variant)
+def convert_variant_to_impl(type, column, registry=None):
+    return convert_sqlalchemy_type(type.impl, column, registry)
+
+
 @convert_sqlalchemy_type.register(types.Date)
 @convert_sqlalchemy_type.register(types.Time)
 @convert_sqlalchemy_type.register(types.String)
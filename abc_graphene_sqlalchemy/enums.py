@@ -1,5 +1,6 @@
 from graphene import Argument, Enum, List
 from sqlalchemy.orm import ColumnProperty
+from sqlalchemy.sql.elements import _anonymous_label
 from sqlalchemy.types import Enum as SQLAlchemyEnumType
 
 from .utils import EnumValue, to_enum_value_name, to_type_name
@@ -141,7 +142,10 @@ def sort_enum_for_object_type(
             if not isinstance(orm_field, ColumnProperty):
                 continue
             column = orm_field.columns[0]
-            if only_indexed and not (column.primary_key or column.index):
+            if isinstance(getattr(column, "name", None), (type(None), _anonymous_label)):
+                # unlabeled expressions of ``column_property`` have no usable name
+                continue
+            if only_indexed and not (getattr(column, "primary_key", False) or getattr(column, "index", False)):
                 continue
             asc_name = get_name(column.name, True)
             asc_value = EnumValue(asc_name, column.asc())
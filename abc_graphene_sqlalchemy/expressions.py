@@ -0,0 +1,317 @@
+import datetime
+import json
+from decimal import Decimal
+from uuid import UUID
+
+from sqlalchemy import bindparam, types
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.exc import CompileError
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.dml import Insert
+from sqlalchemy.sql.elements import BindParameter, ColumnElement, _clone
+
+from .batching import coerce_value
+
+try:
+    from sqlalchemy_utils import TSVectorType
+except ImportError:
+    TSVectorType = None
+
+
+def _dump_json_value(value):
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, (Decimal, UUID)):
+        return str(value)
+    return value
+
+
+class ValueListType(types.TypeDecorator):
+    """Bind a list of values as a single parameter.
+
+    The list is bound as an array on PostgreSQL and as a JSON document on
+    SQLite, with its items converted to the type of the column. Other
+    dialects bind every value separately as an ``ItemType``, see
+    ``InValues``.
+    """
+
+    impl = types.String
+
+    def __init__(self, item_type):
+        super(ValueListType, self).__init__()
+        self.item_type = item_type
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == "postgresql":
+            return dialect.type_descriptor(postgresql.ARRAY(self.item_type))
+        if dialect.name == "sqlite":
+            return dialect.type_descriptor(types.String())
+        return dialect.type_descriptor(self.item_type)
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        # filter values such as ``ID`` inputs arrive as strings
+        value = [coerce_value(self.item_type, item) for item in value]
+        if dialect.name == "sqlite":
+            return json.dumps([_dump_json_value(item) for item in value])
+        return value
+
+
+class ItemType(types.TypeDecorator):
+    """Bind one item of a ``ValueListType`` list as ``item_type``."""
+
+    impl = types.String
+
+    def __init__(self, item_type):
+        super(ItemType, self).__init__()
+        self.item_type = item_type
+
+    def load_dialect_impl(self, dialect):
+        return dialect.type_descriptor(self.item_type)
+
+    def process_bind_param(self, value, dialect):
+        return None if value is None else coerce_value(self.item_type, value)
+
+
+class InValues(ColumnElement):
+    """``column IN values`` with the whole list bound as one parameter.
+
+    Compiles to ``column = ANY(:values)`` on PostgreSQL and to
+    ``column IN (SELECT value FROM json_each(:values))`` on SQLite, so the
+    statement stays the same size, and under the parameter limits, however
+    long the list is. Other dialects fall back to an expanding ``IN``.
+    """
+
+    type = types.Boolean()
+
+    def __init__(self, column, values):
+        self.column = column
+        self.values = values
+
+    @property
+    def _from_objects(self):
+        return self.column._from_objects
+
+    def get_children(self, **kwargs):
+        return self.column, self.values
+
+    def _copy_internals(self, clone=_clone, **kwargs):
+        self.column = clone(self.column, **kwargs)
+        self.values = clone(self.values, **kwargs)
+
+
+def in_values(column, values):
+    """Build an ``InValues`` clause for a list or a bind parameter of ``column``."""
+    if isinstance(values, BindParameter):
+        values = bindparam(values.key, type_=ValueListType(column.type))
+    else:
+        values = bindparam(None, list(values), type_=ValueListType(column.type))
+    return InValues(column, values)
+
+
+@compiles(InValues)
+def compile_in_values(element, compiler, **kwargs):
+    values = element.values
+    # the items of an expanding parameter are bound one by one
+    expanding = bindparam(
+        values.key, values.value, type_=ItemType(values.type.item_type), unique=values.unique, expanding=True
+    )
+    return compiler.process(element.column.in_(expanding), **kwargs)
+
+
+@compiles(InValues, "postgresql")
+def compile_in_values_postgresql(element, compiler, **kwargs):
+    return "{} = ANY ({})".format(
+        compiler.process(element.column, **kwargs), compiler.process(element.values, **kwargs)
+    )
+
+
+@compiles(InValues, "sqlite")
+def compile_in_values_sqlite(element, compiler, **kwargs):
+    return "{} IN (SELECT value FROM json_each({}))".format(
+        compiler.process(element.column, **kwargs), compiler.process(element.values, **kwargs)
+    )
+
+
+class Upsert(Insert):
+    """``INSERT`` updating the rows that conflict on ``index_elements``.
+
+    ``update_columns`` of a conflicting row are set to the inserted values.
+    Compiles to ``INSERT ... ON CONFLICT DO UPDATE`` on PostgreSQL and SQLite
+    (``INSERT OR REPLACE`` before SQLite 3.24, which replaces the whole row)
+    and to ``INSERT ... ON DUPLICATE KEY UPDATE`` on MySQL, where the conflict
+    may be on any unique key.
+    """
+
+    def __init__(self, table, values, index_elements, update_columns=(), **kwargs):
+        super(Upsert, self).__init__(table, values, **kwargs)
+        self.index_elements = list(index_elements)
+        # with nothing to update, a no-op update still returns the row
+        self.update_columns = list(update_columns) or self.index_elements[:1]
+
+
+def _compile_update_set(element, compiler, template):
+    return ", ".join(
+        template.format(compiler.preparer.quote(name)) for name in element.update_columns
+    )
+
+
+@compiles(Upsert)
+def compile_upsert(element, compiler, **kwargs):
+    raise CompileError("Upserts are only supported on PostgreSQL, SQLite and MySQL")
+
+
+@compiles(Upsert, "postgresql")
+def compile_upsert_postgresql(element, compiler, **kwargs):
+    statement = postgresql.insert(element.table).values(element.parameters)
+    if element._returning:
+        statement = statement.returning(*element._returning)
+    statement = statement.on_conflict_do_update(
+        index_elements=element.index_elements,
+        set_={name: statement.excluded[name] for name in element.update_columns},
+    )
+    return compiler.process(statement, **kwargs)
+
+
+@compiles(Upsert, "sqlite")
+def compile_upsert_sqlite(element, compiler, **kwargs):
+    insert = compiler.visit_insert(element, **kwargs)
+    dbapi = compiler.dialect.dbapi
+    if dbapi is not None and dbapi.sqlite_version_info < (3, 24):
+        return "INSERT OR REPLACE" + insert[len("INSERT"):]
+    return "{} ON CONFLICT ({}) DO UPDATE SET {}".format(
+        insert,
+        ", ".join(compiler.preparer.quote(name) for name in element.index_elements),
+        _compile_update_set(element, compiler, "{0} = excluded.{0}"),
+    )
+
+
+@compiles(Upsert, "mysql")
+def compile_upsert_mysql(element, compiler, **kwargs):
+    return "{} ON DUPLICATE KEY UPDATE {}".format(
+        compiler.visit_insert(element, **kwargs), _compile_update_set(element, compiler, "{0} = VALUES({0})")
+    )
+
+
+def get_search_type(column):
+    """Return the ``TSVectorType`` of ``column`` (or of its variant), if any."""
+    if TSVectorType is None:
+        return None
+    column_type = getattr(column, "type", None)
+    for candidate in (column_type, getattr(column_type, "impl", None)):
+        if isinstance(candidate, TSVectorType):
+            return candidate
+    return None
+
+
+def get_fts_table_name(column):
+    """Return the name of the SQLite FTS5 table standing in for ``column``."""
+    return column.info.get("fts_table", "{}_fts".format(column.table.name))
+
+
+class SearchTermType(types.TypeDecorator):
+    """Bind a plain search term.
+
+    On SQLite every word is quoted, so the term is matched like
+    ``plainto_tsquery`` would: all words, with FTS5 syntax taken literally.
+    """
+
+    impl = types.String
+
+    def process_bind_param(self, value, dialect):
+        if dialect.name == "sqlite" and value is not None:
+            return " ".join('"{}"'.format(word.replace('"', '""')) for word in value.split())
+        return value
+
+
+class SearchMatch(ColumnElement):
+    """Full-text match of a search term against a tsvector ``column``.
+
+    Compiles to ``column @@ plainto_tsquery(term)`` on PostgreSQL. On SQLite
+    the column is expected to be mirrored by an FTS5 table named
+    ``{table}_fts`` (or ``column.info["fts_table"]``) whose rowid is the
+    primary key of the table.
+    """
+
+    type = types.Boolean()
+
+    def __init__(self, column, term):
+        self.column = column
+        self.term = term
+
+    @property
+    def _from_objects(self):
+        return self.column._from_objects
+
+    def get_children(self, **kwargs):
+        return self.column, self.term
+
+    def _copy_internals(self, clone=_clone, **kwargs):
+        self.column = clone(self.column, **kwargs)
+        self.term = clone(self.term, **kwargs)
+
+
+class SearchRank(SearchMatch):
+    """Relevance of a full-text match, higher is better."""
+
+    type = types.Float()
+
+
+def search_term(term):
+    """Return a bind parameter for a search term, or wrap an existing one."""
+    if isinstance(term, BindParameter):
+        return bindparam(term.key, type_=SearchTermType())
+    return bindparam(None, term, type_=SearchTermType())
+
+
+def _compile_tsquery(element, compiler, **kwargs):
+    search_type = get_search_type(element.column)
+    regconfig = search_type.options.get("regconfig") if search_type is not None else None
+    term = compiler.process(element.term, **kwargs)
+    if regconfig:
+        return "plainto_tsquery('{}', {})".format(regconfig.replace("'", "''"), term)
+    return "plainto_tsquery({})".format(term)
+
+
+def _compile_fts_lookup(element, compiler, select, **kwargs):
+    fts_table = compiler.preparer.quote(get_fts_table_name(element.column))
+    [primary_key] = element.column.table.primary_key
+    return select.format(
+        fts=fts_table,
+        primary_key=compiler.process(primary_key, **kwargs),
+        term=compiler.process(element.term, **kwargs),
+    )
+
+
+@compiles(SearchMatch)
+def compile_search_match(element, compiler, **kwargs):
+    raise CompileError("Full-text search is only supported on PostgreSQL and SQLite")
+
+
+@compiles(SearchMatch, "postgresql")
+def compile_search_match_postgresql(element, compiler, **kwargs):
+    return "{} @@ {}".format(compiler.process(element.column, **kwargs), _compile_tsquery(element, compiler, **kwargs))
+
+
+@compiles(SearchMatch, "sqlite")
+def compile_search_match_sqlite(element, compiler, **kwargs):
+    return _compile_fts_lookup(
+        element, compiler, "{primary_key} IN (SELECT rowid FROM {fts} WHERE {fts} MATCH {term})", **kwargs
+    )
+
+
+@compiles(SearchRank, "postgresql")
+def compile_search_rank_postgresql(element, compiler, **kwargs):
+    return "ts_rank({}, {})".format(
+        compiler.process(element.column, **kwargs), _compile_tsquery(element, compiler, **kwargs)
+    )
+
+
+@compiles(SearchRank, "sqlite")
+def compile_search_rank_sqlite(element, compiler, **kwargs):
+    # the FTS5 rank is lower for better matches
+    return _compile_fts_lookup(
+        element, compiler, "-(SELECT rank FROM {fts} WHERE {fts}.rowid = {primary_key} AND {fts} MATCH {term})",
+        **kwargs
+    )
@@ -1,11 +1,16 @@
 from __future__ import annotations
 
 import copy
+import datetime
+import enum
+import itertools
+import json
 import logging
 import re
 from collections import OrderedDict
+from decimal import Decimal
 import warnings
-from functools import partial
+from functools import lru_cache, partial
 from typing import TYPE_CHECKING, Mapping
 from uuid import UUID
 
@@ -16,18 +21,32 @@ from .utils import EnumValue
 if TYPE_CHECKING:
     from typing import Union, Callable, Any
 
-from graphene import Argument, InputObjectType, Field, List
-from graphene.relay import Connection, ConnectionField
+from graphene import ID, Argument, Boolean, Date, InputObjectType, Field, List, NonNull, String, Time
+from graphene.relay import Connection, ConnectionField, Node
 from graphene.relay.connection import PageInfo
+from graphene.types.enum import EnumMeta
 from graphene.utils.str_converters import to_snake_case
-from graphql import ResolveInfo
-from graphql_relay.connection.arrayconnection import connection_from_list_slice
+from graphql import GraphQLError, ResolveInfo
+from graphql_relay.connection.arrayconnection import (
+    connection_from_list_slice,
+    get_offset_with_default,
+)
+from graphql_relay.utils import base64, unbase64
 from promise import Promise, is_thenable
-from sqlalchemy import inspect, func, or_, and_
+from sqlalchemy import inspect, func, or_, and_, bindparam, false, literal, true, tuple_, types
+from sqlalchemy.orm.exc import UnmappedColumnError
 from sqlalchemy.orm.query import Query
+from sqlalchemy.sql import operators
+from sqlalchemy.sql.elements import BindParameter
 
+from .aggregates import get_aggregate_connection
+from .baking import BakedConnectionQuery, get_plan_key
+from .batching import RelationshipConnectionLoader, get_parent_key, get_request_loader, memoize
+from .caching import get_result_cache
 from .converter import convert_sqlalchemy_type
-from .utils import get_query
+from .expressions import SearchMatch, SearchRank, get_search_type, in_values, search_term
+from .planner import get_load_options, get_node_selection_sets, get_node_type, is_default_resolver, plan_loads
+from .utils import get_query, get_selected_field_names, to_hashable
 
 log = logging.getLogger()
 
@@ -40,6 +59,9 @@ COMPILED_NAME_PATTERN = re.compile(NAME_PATTERN)
 
 # noinspection PyMethodOverriding
 class UnsortedSQLAlchemyConnectionField(ConnectionField):
+    # connection fields whose resolution needs ``connection.length``
+    total_count_fields = frozenset(["totalCount"])
+
     @property
     def type(self, assert_type: bool = True):
         from .types import SQLAlchemyObjectType, SQLAlchemyInputObjectType
@@ -76,31 +98,170 @@ class UnsortedSQLAlchemyConnectionField(ConnectionField):
     @classmethod
     def get_query(cls, model, info, sort=None, **args):
         query = get_query(model, info.context)
+        node_type = get_node_type(info)
+        if node_type is not None and node_type._meta.model is model:
+            query = query.options(
+                *get_load_options(
+                    node_type,
+                    info,
+                    get_node_selection_sets(info, info.field_asts),
+                    extra_columns=get_sort_column_keys(model, sort),
+                )
+            )
         if sort is not None:
-            if isinstance(sort, EnumValue):
-                query = query.order_by(sort.value)
-            else:
-                query = query.order_by(*(col.value for col in sort))
+            query = query.order_by(*get_sort_order_by(sort))
+        return query
+
+    @classmethod
+    def get_baked_query(cls, model, info, sort=None, **args):
+        """Build the query of ``get_query`` as a ``BakedConnectionQuery``.
+
+        Used instead of ``get_query`` when the node type sets
+        ``baked_queries``; subclasses overriding ``get_query`` must override
+        this method as well for their queries to be baked.
+        """
+        session = get_query(model, info.context).session
+        query = BakedConnectionQuery(model, session)
+        node_type = get_node_type(info)
+        if node_type is not None and node_type._meta.model is model:
+            query.add_load_plan(
+                plan_loads(node_type, info, get_node_selection_sets(info, info.field_asts)),
+                extra_columns=get_sort_column_keys(model, sort),
+            )
+        if sort is not None:
+            sort = [sort] if isinstance(sort, EnumValue) else list(sort)
+            query.add_criteria(
+                lambda q: q.order_by(*(col.value for col in sort)),
+                tuple(str(col) for col in sort),
+            )
         return query
 
+    @classmethod
+    def uses_baked_queries(cls, info):
+        """Check whether the connection query is built by ``get_baked_query``."""
+        node_type = get_node_type(info)
+        if not getattr(getattr(node_type, "_meta", None), "baked_queries", False):
+            return False
+        # only bake when the class overriding get_query last also bakes it
+        owner = next(klass for klass in cls.__mro__ if "get_query" in vars(klass))
+        return "get_baked_query" in vars(owner)
+
+    @classmethod
+    def needs_count(cls, info, args):
+        """Check whether the total number of rows is required to build the page.
+
+        That is the case when one of the ``total_count_fields`` is selected on
+        the connection, or when paginating backwards: the end of the window is
+        only known once clamped to the number of rows, ``before`` may point
+        past it. ``hasNextPage`` of an empty ``after``/``before`` range also
+        depends on whether ``before`` is past the last row.
+        """
+        if isinstance(args.get("last"), int):
+            return True
+        if isinstance(args.get("first"), int) and args.get("after") and args.get("before"):
+            after = get_offset_with_default(args["after"], -1)
+            # an invalid ``before`` cursor is ignored
+            before = get_offset_with_default(args["before"], None)
+            if before is not None and before <= after + 1:
+                return True
+        return info is None or bool(cls.total_count_fields & get_selected_field_names(info))
+
+    @classmethod
+    def get_connection_query(cls, model, info, args):
+        if info is not None and cls.uses_baked_queries(info):
+            return cls.get_baked_query(model, info, **args)
+        return cls.get_query(model, info, **args)
+
+    @classmethod
+    def get_load_plan_key(cls, model, info):
+        """Return the key of the loader options ``get_query`` adds for the selection."""
+        node_type = get_node_type(info)
+        if node_type is None or node_type._meta.model is not model:
+            return None
+        return get_plan_key(plan_loads(node_type, info, get_node_selection_sets(info, info.field_asts)))
+
     @classmethod
     def resolve_connection(cls, connection_type, model, info, args, resolved):
+        if resolved is None and info is not None:
+            # identical connections of the same request share one result, as
+            # long as they load the same columns and relationships
+            key = (
+                "connection", cls, connection_type, model, to_hashable(args), cls.needs_count(info, args),
+                cls.get_load_plan_key(model, info),
+            )
+            return memoize(info.context, key, lambda: cls.resolve_query_connection(connection_type, model, info, args))
         if resolved is None:
-            resolved = cls.get_query(model, info, **args)
-        if isinstance(resolved, Query):
-            _len = resolved.count()
+            resolved = cls.get_connection_query(model, info, args)
+        list_slice, slice_start, _len = cls.fetch_slice(resolved, info, args)
+        return cls.build_connection(connection_type, args, resolved, list_slice, slice_start, _len)
+
+    @classmethod
+    def resolve_query_connection(cls, connection_type, model, info, args):
+        """Resolve the connection of ``get_query``.
+
+        The window goes through the cross-request ``ResultCache`` when the
+        node type sets ``cache_ttl``. Entries are keyed by the field, the
+        arguments, the columns selected on the nodes and the SQL of the
+        query with its parameters, so queries that ``get_query`` scopes to
+        the context, e.g. to the current user, never share entries.
+        """
+        query = cls.get_connection_query(model, info, args)
+        node_type = get_node_type(info)
+        ttl = getattr(getattr(node_type, "_meta", None), "cache_ttl", None)
+        if not ttl or node_type._meta.model is not model:
+            return cls.resolve_connection(connection_type, model, info, args, query)
+        statement = (query.to_query() if isinstance(query, BakedConnectionQuery) else query).statement
+        compiled = statement.compile(bind=query.session.get_bind(mapper=model))
+        key = (
+            cls.__module__, cls.__name__, connection_type.__name__, model.__name__,
+            to_hashable(args), cls.needs_count(info, args), cls.get_load_plan_key(model, info),
+            str(compiled), compiled.params,
+        )
+        list_slice, slice_start, _len = get_result_cache().fetch(
+            key, query.session, statement, ttl, partial(cls.fetch_slice, query, info, args)
+        )
+        return cls.build_connection(connection_type, args, query, list_slice, slice_start, _len)
+
+    @classmethod
+    def fetch_slice(cls, resolved, info, args):
+        """Return the ``(list_slice, slice_start, length)`` window of ``resolved``.
+
+        ``length`` is None when the total number of rows is not needed.
+        """
+        if isinstance(resolved, Query) and is_sliced_query(resolved):
+            # the resolver already applied its own LIMIT/OFFSET, so the
+            # window can only be cut in Python
+            list_slice = resolved.all()
+            _len = len(list_slice)
+            slice_start = 0
+        elif isinstance(resolved, (Query, BakedConnectionQuery)):
+            _len = resolved.count() if cls.needs_count(info, args) else None
+            slice_start, slice_end = get_slice_bounds(args, _len)
+            if _len is None and isinstance(args.get("first"), int):
+                # over-fetch one row so hasNextPage is known without a count
+                slice_end += 1
+            if slice_end is not None and slice_end <= slice_start:
+                list_slice = []
+            elif isinstance(resolved, BakedConnectionQuery):
+                list_slice = resolved.window(slice_start, slice_end)
+            elif slice_end is None:
+                list_slice = resolved.offset(slice_start).all()
+            else:
+                list_slice = resolved.offset(slice_start).limit(slice_end - slice_start).all()
         else:
             _len = len(resolved)
+            slice_start = 0
+            list_slice = list(resolved) if isinstance(resolved, set) else resolved
+        return list_slice, slice_start, _len
 
-        if isinstance(resolved, set):
-            resolved = list(resolved)
-
+    @classmethod
+    def build_connection(cls, connection_type, args, resolved, list_slice, slice_start, _len):
         connection = connection_from_list_slice(
-            resolved,
+            list_slice,
             args,
-            slice_start=0,
-            list_length=_len,
-            list_slice_length=_len,
+            slice_start=slice_start,
+            list_length=slice_start + len(list_slice) if _len is None else _len,
+            list_slice_length=len(list_slice),
             connection_type=connection_type,
             pageinfo_type=PageInfo,
             edge_type=connection_type.Edge,
@@ -123,6 +284,37 @@ class UnsortedSQLAlchemyConnectionField(ConnectionField):
         return partial(self.connection_resolver, parent_resolver, self.type, self.model)
 
 
+def get_slice_bounds(args, list_length=None):
+    """Return the ``(start, end)`` offsets selected by the relay ``args``.
+
+    This mirrors the offset arithmetic of ``connection_from_list_slice`` so
+    that only the requested window has to be fetched from the database.
+    When ``list_length`` is unknown, ``end`` is None for an open-ended window.
+    """
+    before = args.get("before")
+    after = args.get("after")
+    first = args.get("first")
+    last = args.get("last")
+
+    start = max(get_offset_with_default(after, -1) + 1, 0)
+    end = get_offset_with_default(before, list_length)
+    if list_length is not None:
+        end = min(end, list_length)
+    if isinstance(first, int):
+        end = start + first if end is None else min(end, start + first)
+    if isinstance(last, int) and end is not None:
+        start = max(start, end - last)
+    return start, None if end is None else max(start, end)
+
+
+def is_sliced_query(query):
+    """Check whether LIMIT or OFFSET has already been applied to ``query``."""
+    for attr in ("_limit", "_offset", "_limit_clause", "_offset_clause"):
+        if getattr(query, attr, None) is not None:
+            return True
+    return False
+
+
 class SQLAlchemyConnectionField(UnsortedSQLAlchemyConnectionField):
     def __init__(self, type, *args, **kwargs):
         if "sort" not in kwargs and issubclass(type, Connection):
@@ -141,6 +333,322 @@ class SQLAlchemyConnectionField(UnsortedSQLAlchemyConnectionField):
         super(SQLAlchemyConnectionField, self).__init__(type, *args, **kwargs)
 
 
+def get_sort_column_keys(model, sort):
+    """Return the attribute keys of the ``model`` columns used by ``sort``."""
+    mapper = inspect(model)
+    keys = []
+    for column, _ in get_keyset_columns(model, sort):
+        try:
+            keys.append(mapper.get_property_by_column(column).key)
+        except UnmappedColumnError:
+            pass
+    return keys
+
+
+KEYSET_CURSOR_PREFIX = "keyset:"
+
+
+def get_keyset_columns(model, sort=None):
+    """Return ``(column, descending)`` pairs that uniquely order ``model``.
+
+    The columns come from the sort enum values; the primary key is appended
+    as a tiebreaker unless the sort already contains it. The tiebreaker follows
+    the direction of the last sort column so the ordering can be served by a
+    single index scan.
+    """
+    if sort is None:
+        sort = []
+    elif isinstance(sort, EnumValue):
+        sort = [sort]
+    columns = []
+    for value in sort:
+        expression = value.value
+        descending = getattr(expression, "modifier", None) is operators.desc_op
+        columns.append((getattr(expression, "element", expression), descending))
+    tiebreaker_descending = columns[-1][1] if columns else False
+    for pk in inspect(model).primary_key:
+        if not any(column is pk for column, _ in columns):
+            columns.append((pk, tiebreaker_descending))
+    return columns
+
+
+def get_sort_order_by(sort=None):
+    """Return the order by expressions of sort enum values."""
+    if sort is None:
+        return []
+    if isinstance(sort, EnumValue):
+        return [sort.value]
+    return [col.value for col in sort]
+
+
+def get_tiebreaker_order_by(model, sort=None):
+    """Return the primary key ordering that makes ``sort`` deterministic."""
+    sort_length = 0 if sort is None else 1 if isinstance(sort, EnumValue) else len(sort)
+    return [
+        column.desc() if descending else column.asc()
+        for column, descending in get_keyset_columns(model, sort)[sort_length:]
+    ]
+
+
+def _dump_keyset_value(value):
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, (Decimal, UUID)):
+        return str(value)
+    if isinstance(value, enum.Enum):
+        return value.name
+    return value
+
+
+def _load_keyset_value(column, value):
+    if value is None:
+        return None
+    try:
+        python_type = column.type.python_type
+    except NotImplementedError:
+        return value
+    if python_type in (datetime.datetime, datetime.date, datetime.time):
+        return python_type.fromisoformat(value)
+    if python_type in (Decimal, UUID):
+        return python_type(value)
+    return value
+
+
+def keyset_to_cursor(model, columns, row):
+    """Create an opaque cursor from the keyset ``columns`` values of ``row``."""
+    mapper = inspect(model)
+    values = [
+        _dump_keyset_value(getattr(row, mapper.get_property_by_column(column).key))
+        for column, _ in columns
+    ]
+    return base64(KEYSET_CURSOR_PREFIX + json.dumps(values))
+
+
+def cursor_to_keyset(columns, cursor):
+    """Decode a cursor created by ``keyset_to_cursor`` into column values."""
+    try:
+        payload = unbase64(cursor)
+        if not payload.startswith(KEYSET_CURSOR_PREFIX):
+            raise ValueError(payload)
+        values = json.loads(payload[len(KEYSET_CURSOR_PREFIX):])
+        if len(values) != len(columns):
+            raise ValueError(values)
+        return [_load_keyset_value(column, value) for (column, _), value in zip(columns, values)]
+    except Exception:
+        raise GraphQLError("Invalid cursor: {}".format(cursor))
+
+
+def is_nullable(column):
+    """Check whether ``column`` may hold NULL, which keyset pagination must order explicitly."""
+    return getattr(column, "nullable", True)
+
+
+def keyset_order_by(column, descending):
+    """Order by ``column`` with NULL sorting after every value, as on PostgreSQL."""
+    if not is_nullable(column):
+        return column.desc() if descending else column.asc()
+    return column.desc().nullsfirst() if descending else column.asc().nullslast()
+
+
+def keyset_predicate(columns, values, reverse=False):
+    """Build the predicate selecting rows after (or before) the given keyset.
+
+    NULL sorts after every value (see ``keyset_order_by``), so nullable
+    columns compare with ``IS NULL`` branches. Without them, uniform sort
+    directions compile to a row value comparison such as
+    ``(a, b) > (:a, :b)``, anything else to the equivalent ``OR`` chain.
+    """
+    terms = []
+    for (column, descending), value in zip(columns, values):
+        smaller = descending != reverse
+        if value is None:
+            # only non-NULL values sort before NULL
+            terms.append((column.is_(None), column.isnot(None) if smaller else None, True))
+            continue
+        value = literal(value, column.type)
+        bound = column < value if smaller else column > value
+        null_branch = not smaller and is_nullable(column)
+        terms.append((column == value, or_(bound, column.is_(None)) if null_branch else bound, null_branch))
+
+    directions = {descending for _, descending in columns}
+    if len(directions) == 1 and not any(null_branch for _, _, null_branch in terms):
+        left = tuple_(*(column for column, _ in columns))
+        right = tuple_(*(literal(value, column.type) for (column, _), value in zip(columns, values)))
+        return left < right if directions.pop() != reverse else left > right
+    clauses = []
+    for i, (_, bound, _) in enumerate(terms):
+        if bound is not None:
+            clauses.append(and_(*([equal for equal, _, _ in terms[:i]] + [bound])))
+    # nothing sorts after a keyset of NULLs in ascending order
+    return or_(*clauses) if clauses else false()
+
+
+class SQLAlchemyKeysetConnectionField(SQLAlchemyConnectionField):
+    """Connection field paginating with keyset (seek) cursors.
+
+    Cursors encode the values of the active ``sort`` columns (with the primary
+    key as tiebreaker), and ``after``/``before`` become ``WHERE`` predicates
+    on those columns, so deep pages cost the same as the first page when the
+    sort columns are indexed.
+    """
+
+    @classmethod
+    def resolve_connection(cls, connection_type, model, info, args, resolved):
+        if resolved is None:
+            resolved = cls.get_query(model, info, **args)
+        if not isinstance(resolved, Query) or is_sliced_query(resolved):
+            return super(SQLAlchemyKeysetConnectionField, cls).resolve_connection(
+                connection_type, model, info, args, resolved
+            )
+
+        first = args.get("first")
+        last = args.get("last")
+        columns = get_keyset_columns(model, args.get("sort"))
+        # paging backwards never needs the total here, the ordering is reversed instead
+        _len = resolved.count() if cls.total_count_fields & get_selected_field_names(info) else None
+
+        query = resolved
+        if args.get("after"):
+            query = query.filter(keyset_predicate(columns, cursor_to_keyset(columns, args["after"])))
+        if args.get("before"):
+            query = query.filter(
+                keyset_predicate(columns, cursor_to_keyset(columns, args["before"]), reverse=True)
+            )
+        # paginating backwards reverses the ordering and flips the page afterwards
+        reverse = isinstance(last, int) and not isinstance(first, int)
+        query = query.order_by(None).order_by(
+            *(keyset_order_by(column, descending != reverse) for column, descending in columns)
+        )
+
+        limit = last if reverse else first
+        if isinstance(limit, int):
+            rows = query.limit(limit + 1).all()
+            has_more = len(rows) > limit
+            rows = rows[:limit]
+        else:
+            rows = query.all()
+            has_more = False
+        if reverse:
+            rows.reverse()
+        has_previous_page = reverse and has_more
+        if isinstance(first, int) and isinstance(last, int) and len(rows) > last:
+            rows = rows[len(rows) - last:]
+            has_previous_page = True
+
+        edges = [
+            connection_type.Edge(node=row, cursor=keyset_to_cursor(model, columns, row))
+            for row in rows
+        ]
+        connection = connection_type(
+            edges=edges,
+            page_info=PageInfo(
+                start_cursor=edges[0].cursor if edges else None,
+                end_cursor=edges[-1].cursor if edges else None,
+                has_previous_page=has_previous_page,
+                has_next_page=not reverse and has_more,
+            ),
+        )
+        connection.iterable = resolved
+        connection.length = _len
+        return connection
+
+
+class BatchSQLAlchemyConnectionField(UnsortedSQLAlchemyConnectionField):
+    """Connection field for collection relationships loaded in batches.
+
+    The requested window of children is fetched for all parents resolved in
+    the same request tick with a single query; see
+    ``batching.RelationshipConnectionLoader``.
+    """
+
+    def __init__(self, type, *args, **kwargs):
+        self.relationship_prop = kwargs.pop("relationship_prop", None)
+        super(BatchSQLAlchemyConnectionField, self).__init__(type, *args, **kwargs)
+
+    @classmethod
+    def from_relationship(cls, relationship, registry, **field_kwargs):
+        model = relationship.mapper.entity
+        model_type = registry.get_type_for_model(model)
+        return cls(model_type, relationship_prop=relationship, **field_kwargs)
+
+    @classmethod
+    def batch_connection_resolver(cls, relationship_prop, connection_type, model, root, info, **args):
+        state = inspect(root)
+        if relationship_prop.key in state.dict or state.session is None:
+            # already loaded (or nothing to batch against), slice in memory
+            return cls.resolve_connection(
+                connection_type, model, info, args, getattr(root, relationship_prop.key)
+            )
+        parent_key = get_parent_key(root, relationship_prop)
+        if None in parent_key:
+            return cls.resolve_connection(connection_type, model, info, args, [])
+
+        with_count = cls.needs_count(info, args)
+        # ``last`` depends on the number of children of every parent, the loader applies it
+        start, end = get_slice_bounds({key: value for key, value in args.items() if key != "last"}, None)
+        last = args.get("last") if isinstance(args.get("last"), int) else None
+        if not with_count and isinstance(args.get("first"), int):
+            # over-fetch one row per parent so hasNextPage is known
+            end += 1
+        loader_key = (relationship_prop, state.session, start, end, last, with_count)
+        loader = get_request_loader(
+            info.context,
+            loader_key,
+            lambda: RelationshipConnectionLoader(
+                relationship_prop, state.session, start=start, end=end, last=last, with_count=with_count
+            ),
+        )
+
+        def build_connection(page):
+            rows, total = page
+            slice_start = start if total is None else get_slice_bounds(args, total)[0]
+            connection = connection_from_list_slice(
+                rows,
+                args,
+                slice_start=slice_start,
+                list_length=slice_start + len(rows) if total is None else total,
+                list_slice_length=len(rows),
+                connection_type=connection_type,
+                pageinfo_type=PageInfo,
+                edge_type=connection_type.Edge,
+            )
+            connection.iterable = rows
+            connection.length = total
+            return connection
+
+        return loader.load(parent_key).then(build_connection)
+
+    def get_resolver(self, parent_resolver):
+        # a ``resolve_<relationship>`` method of the type takes precedence
+        if self.relationship_prop is None or not is_default_resolver(parent_resolver):
+            return super(BatchSQLAlchemyConnectionField, self).get_resolver(parent_resolver)
+        return partial(self.batch_connection_resolver, self.relationship_prop, self.type, self.model)
+
+
+class SQLAlchemyNodesField(Field):
+    """Root field resolving a list of relay global ids, e.g. ``nodes(ids: [...])``.
+
+    Every id goes through ``get_node_from_global_id`` of the node interface,
+    so types with ``batching`` enabled are loaded with one ``IN`` query per
+    model. The result preserves the order of ``ids``, with null for ids that
+    do not resolve to a node.
+    """
+
+    def __init__(self, node=Node, **kwargs):
+        kwargs.setdefault("ids", List(NonNull(ID), required=True, description="The IDs of the objects"))
+        super(SQLAlchemyNodesField, self).__init__(List(node), **kwargs)
+        self.node_type = node
+
+    @classmethod
+    def nodes_resolver(cls, node_type, root, info, ids):
+        return Promise.all(
+            [Promise.resolve(node_type.get_node_from_global_id(info, global_id)) for global_id in ids]
+        )
+
+    def get_resolver(self, parent_resolver):
+        return partial(self.nodes_resolver, self.node_type)
+
+
 class FilterArgument:
     pass
 
@@ -162,6 +670,10 @@ def create_filter_argument(cls):
         ]
         if field and COMPILED_NAME_PATTERN.match(column.name)
     )
+    for relationship in inspect(cls).relationships:
+        if relationship.key not in fields and COMPILED_NAME_PATTERN.match(relationship.key):
+            # resolved lazily, relationships may form cycles between models
+            fields[relationship.key] = Field(partial(get_filter_argument_type, relationship.mapper.class_))
     argument_class: InputObjectType = type(name, (FilterArgument, InputObjectType), {})
     argument_class._meta.fields.update(fields)
 
@@ -175,31 +687,13 @@ def create_filter_argument(cls):
     return Argument(argument_class)
 
 
-def filter_query(query, model, field, value):
-    if isinstance(value, Mapping):
-        [(operator, value)] = value.items()
-        # does not work on UUID columns
-        if operator == "equal":
-            query = query.filter(getattr(model, field) == value)
-        elif operator == "notEqual":
-            query = query.filter(getattr(model, field) != value)
-        elif operator == "lessThan":
-            query = query.filter(getattr(model, field) < value)
-        elif operator == "greaterThan":
-            query = query.filter(getattr(model, field) > value)
-        elif operator == "like":
-            query = query.filter(
-                func.lower(getattr(model, field)).like(func.lower(f"%{value}%"))
-            )
-        elif operator == "in":
-            query = query.filter(getattr(model, field).in_(value))
-    elif isinstance(value, (str, int, UUID)):
-        query = query.filter(getattr(model, field) == value)
-    else:
-        raise NotImplementedError(
-            f"Filter for value type {type(value)} for {field} of model {model} is not implemented"
-        )
-    return query
+def get_filter_argument_type(cls):
+    return create_filter_argument(cls).type
+
+
+def get_filter_relationship(model, name):
+    """Return the relationship of ``model`` filtered by the ``name`` input, if any."""
+    return inspect(model).relationships.get(name)
 
 
 def create_filter_field(column):
@@ -207,15 +701,30 @@ def create_filter_field(column):
     if graphene_type.__class__ == Field or graphene_type.__class__ == List:
         return None
 
-    name = "{}Filter".format(str(graphene_type.__class__))
+    if isinstance(graphene_type, EnumMeta):
+        # enum columns convert lazily to the enum type itself
+        field_type = graphene_type
+        name = "{}Filter".format(graphene_type._meta.name)
+        operators = ["equal", "notEqual"]
+    else:
+        field_type = graphene_type.__class__
+        if isinstance(column.type, (types.Date, types.Time)) and not isinstance(column.type, types.DateTime):
+            # the output type is a string, filter values must be parsed to bind them
+            field_type = Date if isinstance(column.type, types.Date) else Time
+        name = "{}Filter".format(str(field_type))
+        operators = ["equal", "notEqual", "lessThan", "greaterThan", "like"]
+        if field_type is not Boolean:
+            operators += ["lessThanOrEqual", "greaterThanOrEqual"]
+        if field_type is String:
+            operators += ["startsWith", "iEqual", "ilike"]
     if name in field_cache:
         return Field(field_cache[name])
 
-    fields = OrderedDict(
-        (key, Field(graphene_type.__class__))
-        for key in ["equal", "notEqual", "lessThan", "greaterThan", "like"]
-    )
-    fields["in"] = Field(List(graphene_type.__class__))
+    fields = OrderedDict((key, Field(field_type)) for key in operators)
+    fields["in"] = Field(List(field_type))
+    if "lessThanOrEqual" in fields:
+        fields["between"] = Field(List(NonNull(field_type)))
+    fields["isNull"] = Field(Boolean)
     field_class: InputObjectType = type(name, (FilterField, InputObjectType), {})
     field_class._meta.fields.update(fields)
 
@@ -223,26 +732,121 @@ def create_filter_field(column):
     return Field(field_class)
 
 
+LIKE_ESCAPE_CHAR = "/"
+# collation names that compare case-insensitively (SQLite, MySQL, SQL Server)
+CASE_INSENSITIVE_COLLATION_PATTERN = re.compile(r"nocase|_ci(_|$)", re.IGNORECASE)
+
+
+def escape_like(value, escape=LIKE_ESCAPE_CHAR):
+    """Escape the LIKE wildcards in ``value``."""
+    return value.replace(escape, escape * 2).replace("%", escape + "%").replace("_", escape + "_")
+
+
+def has_case_insensitive_collation(column):
+    """Check whether comparisons on ``column`` already ignore case.
+
+    Set ``info={"case_insensitive": True}`` on a column to declare it when the
+    collation name does not tell, e.g. PostgreSQL nondeterministic collations
+    or ``citext`` columns.
+    """
+    column = getattr(column, "expression", column)
+    info = getattr(column, "info", {})
+    if "case_insensitive" in info:
+        return bool(info["case_insensitive"])
+    collation = getattr(getattr(column, "type", None), "collation", None)
+    return bool(collation and CASE_INSENSITIVE_COLLATION_PATTERN.search(collation))
+
+
+def ignore_case(compare):
+    """Wrap ``compare`` to apply it to ``lower()`` of both sides.
+
+    ``lower()`` is skipped for case-insensitive columns, where it would only
+    prevent the use of a plain index.
+    """
+    def operator(column, value):
+        if has_case_insensitive_collation(column):
+            return compare(column, value)
+        return compare(func.lower(column), func.lower(value))
+
+    return operator
+
+
+def ignore_null(compare):
+    """Wrap ``compare`` to not filter when the value is null."""
+    def operator(column, value):
+        return true() if value is None else compare(column, value)
+
+    return operator
+
+
+FILTER_OPERATORS = {
+    "equal": lambda column, value: column == value,
+    "notEqual": lambda column, value: column != value,
+    # range comparisons do not filter on null
+    "lessThan": ignore_null(lambda column, value: column < value),
+    "greaterThan": ignore_null(lambda column, value: column > value),
+    "like": ignore_case(lambda column, value: column.like(value)),
+    # ``startsWith``, ``iEqual`` and ``ilike`` do not filter on null either
+    "startsWith": ignore_null(lambda column, value: column.like(value, escape=LIKE_ESCAPE_CHAR)),
+    "iEqual": ignore_null(ignore_case(lambda column, value: column == value)),
+    "ilike": ignore_null(lambda column, value: column.ilike(value)),
+    "in": lambda column, value: column.in_(value),
+    "largeIn": in_values,
+    "lessThanOrEqual": ignore_null(lambda column, value: column <= value),
+    "greaterThanOrEqual": ignore_null(lambda column, value: column >= value),
+    # ``between: null`` does not filter
+    "between": ignore_null(lambda column, value: column.between(*value)),
+    # ``isNull: null`` does not filter
+    "isNull": lambda column, value: true() if value is None else column.is_(None) if value else column.isnot(None),
+}
+
+# operators whose value is part of the filter shape instead of a bind parameter
+FILTER_SHAPE_OPERATORS = frozenset(["isNull"])
+
+# ``in`` lists longer than this are bound as a single parameter (``largeIn``)
+LARGE_IN_THRESHOLD = 1000
+
+
+def get_filter_operator(operator, value):
+    """Return the operator used to compile ``operator`` for ``value``."""
+    if operator == "in" and value is not None and len(value) > LARGE_IN_THRESHOLD:
+        return "largeIn"
+    return operator
+
+
+def get_range_bounds(value):
+    """Validate the ``[start, end]`` value of a ``between`` filter."""
+    if len(value) != 2:
+        raise GraphQLError("between expects a list of two values, got {}".format(len(value)))
+    return value
+
+
+# conversions applied to filter input values before they are bound
+FILTER_VALUE_TRANSFORMS = {
+    "like": lambda value: f"%{value}%",
+    "startsWith": lambda value: escape_like(value) + "%",
+    "between": get_range_bounds,
+}
+
+
 def create_filter_clause(model, field, value):
     clause = ()
-    if isinstance(value, Mapping):
+    relationship = get_filter_relationship(model, field)
+    if relationship is not None and isinstance(value, Mapping):
+        # correlated EXISTS over the related rows
+        related_clause = where_clause(relationship.mapper.class_, value)
+        comparator = getattr(model, field)
+        clause = lambda: comparator.any(related_clause) if relationship.uselist else comparator.has(related_clause)
+    elif isinstance(value, Mapping):
         [(operator, value)] = value.items()
+        if not isinstance(value, BindParameter):
+            operator = get_filter_operator(operator, value)
         # does not work on UUID columns
-        if operator == "equal":
-            clause = lambda: getattr(model, field) == value
-        elif operator == "notEqual":
-            clause = lambda: getattr(model, field) != value
-        elif operator == "lessThan":
-            clause = lambda: getattr(model, field) < value
-        elif operator == "greaterThan":
-            clause = lambda: getattr(model, field) > value
-        elif operator == "like":
-            clause = lambda: func.lower(getattr(model, field)).like(
-                func.lower(f"%{value}%")
-            )
-        elif operator == "in":
-            clause = lambda: getattr(model, field).in_(value)
-    elif isinstance(value, (str, int, UUID)):
+        if operator in FILTER_OPERATORS:
+            if value is not None and not isinstance(value, BindParameter) and operator in FILTER_VALUE_TRANSFORMS:
+                value = FILTER_VALUE_TRANSFORMS[operator](value)
+            clause = lambda: FILTER_OPERATORS[operator](getattr(model, field), value)
+    elif isinstance(value, (str, int, UUID, BindParameter)):
         clause = lambda: getattr(model, field) == value
     else:
         raise NotImplementedError(
@@ -263,15 +867,146 @@ def where_clause(model: DeclarativeMeta, filter: Mapping[str, Union[Mapping, str
     return clauses.self_group()
 
 
-class SQLAlchemyFilteredConnectionField(UnsortedSQLAlchemyConnectionField):
+def get_filter_shape(model: DeclarativeMeta, filter: Mapping) -> tuple:
+    """Return a hashable description of the structure of a ``where`` input.
+
+    The shape keeps field names, operators and nesting but not the values,
+    so requests that only differ in their values share the same shape.
+    """
+    shape = []
+    for filter_name, filter_value in filter.items():
+        relationship = get_filter_relationship(model, filter_name)
+        if filter_name in ("or", "and") and isinstance(filter_value, Mapping):
+            shape.append((filter_name, get_filter_shape(model, filter_value)))
+        elif relationship is not None and isinstance(filter_value, Mapping):
+            shape.append((filter_name, get_filter_shape(relationship.mapper.class_, filter_value)))
+        elif isinstance(filter_value, Mapping):
+            [(operator, value)] = filter_value.items()
+            if operator in FILTER_SHAPE_OPERATORS:
+                shape.append((filter_name, (operator, None if value is None else bool(value))))
+            elif value is None:
+                # compiles to IS NULL / IS NOT NULL, a NULL parameter matches nothing
+                shape.append((filter_name, (operator, None)))
+            else:
+                shape.append((filter_name, get_filter_operator(operator, value)))
+        else:
+            shape.append((filter_name, None))
+    return tuple(shape)
+
+
+def get_filter_values(model: DeclarativeMeta, filter: Mapping, values=None) -> list:
+    """Return the values of a ``where`` input in the order of its shape."""
+    if values is None:
+        values = []
+    for filter_name, filter_value in filter.items():
+        relationship = get_filter_relationship(model, filter_name)
+        if filter_name in ("or", "and") and isinstance(filter_value, Mapping):
+            get_filter_values(model, filter_value, values)
+        elif relationship is not None and isinstance(filter_value, Mapping):
+            get_filter_values(relationship.mapper.class_, filter_value, values)
+        elif isinstance(filter_value, Mapping):
+            [(operator, value)] = filter_value.items()
+            if operator in FILTER_SHAPE_OPERATORS or value is None:
+                continue
+            value = FILTER_VALUE_TRANSFORMS.get(operator, lambda v: v)(value)
+            if operator == "between":
+                values.extend(value)
+            else:
+                values.append(value)
+        else:
+            values.append(filter_value)
+    return values
+
+
+@lru_cache(maxsize=256)
+def get_filter_plan(model: DeclarativeMeta, shape: tuple):
+    """Build the where clause for a filter ``shape`` once per model.
+
+    Every value is replaced by a bind parameter named ``where_<n>`` after its
+    position in ``get_filter_values``, so the expression tree can be reused
+    for any input of the same shape.
+    """
+    positions = itertools.count()
+
+    def build(model, shape, operator):
+        clauses = operator()
+        for filter_name, filter_shape in shape:
+            if filter_name in ("or", "and") and isinstance(filter_shape, tuple):
+                clauses = operator(clauses, build(model, filter_shape, or_ if filter_name == "or" else and_))
+                continue
+            relationship = get_filter_relationship(model, filter_name)
+            if relationship is not None and isinstance(filter_shape, tuple):
+                related_clause = build(relationship.mapper.class_, filter_shape, and_)
+                comparator = getattr(model, filter_name)
+                clauses = operator(
+                    clauses,
+                    comparator.any(related_clause) if relationship.uselist else comparator.has(related_clause),
+                )
+                continue
+            if isinstance(filter_shape, tuple):
+                # the operator and its value are both part of the shape
+                value = dict([filter_shape])
+            elif filter_shape == "between":
+                value = {filter_shape: [bindparam("where_{}".format(next(positions))) for _ in range(2)]}
+            else:
+                param = bindparam("where_{}".format(next(positions)), expanding=filter_shape == "in")
+                value = param if filter_shape is None else {filter_shape: param}
+            clauses = operator(clauses, create_filter_clause(model, filter_name, value)())
+        return clauses.self_group()
+
+    return build(model, shape, and_)
+
+
+def compile_where_clause(model: DeclarativeMeta, filter: Mapping):
+    """Return the cached where clause for ``filter`` and its bind parameter values."""
+    clause = get_filter_plan(model, get_filter_shape(model, filter))
+    params = {"where_{}".format(i): value for i, value in enumerate(get_filter_values(model, filter))}
+    return clause, params
+
+
+def get_search_columns(model):
+    """Return the ``TSVectorType`` columns of ``model``."""
+    return [column for column in inspect(model).columns if get_search_type(column) is not None]
+
+
+def get_search_clauses(model, term):
+    """Return the full-text match and rank expressions of ``model`` for ``term``.
+
+    ``term`` is a search term or a bind parameter, see ``search_term``.
+    """
+    term = search_term(term)
+    columns = get_search_columns(model)
+    match = or_(*(SearchMatch(column, term) for column in columns))
+    rank = sum((SearchRank(column, term) for column in columns[1:]), SearchRank(columns[0], term))
+    return match, rank
+
+
+class SQLAlchemyFilteredConnectionField(SQLAlchemyConnectionField):
+    # connection fields that can be resolved without fetching a page
+    aggregate_fields = frozenset(["aggregate", "__typename"])
+
     def __init__(self, type_, *args, **kwargs):
         model = type_._meta.model
+        # the connection type gets an ``aggregate`` field, and is renamed ``{Node}AggregateConnection``
+        self.aggregates = kwargs.pop("aggregates", False)
         kwargs.setdefault("where", create_filter_argument(model))
+        if get_search_columns(model):
+            kwargs.setdefault("search", Argument(String))
+            kwargs.setdefault("search_rank", Argument(Boolean, default_value=False))
+        if "sort" not in kwargs and hasattr(type_, "sort_argument"):
+            kwargs["sort"] = type_.sort_argument()
         super(SQLAlchemyFilteredConnectionField, self).__init__(type_, *args, **kwargs)
 
+    @property
+    def type(self):
+        _type = super(SQLAlchemyFilteredConnectionField, self).type
+        return get_aggregate_connection(_type) if self.aggregates else _type
+
     @classmethod
-    def get_query(cls, model, info: ResolveInfo, where=None, sort=None, group_by=None, order_by=None, **kwargs):
-        query = super().get_query(model, info, sort=None, **kwargs)
+    def get_query(cls, model, info: ResolveInfo, where=None, sort=None, group_by=None, order_by=None,
+                  search=None, search_rank=False, **kwargs):
+        query = super().get_query(model, info, sort=sort, **kwargs)
+        query = query.order_by(*get_tiebreaker_order_by(model, sort))
         # columns = inspect(model).columns.values()
         from .types import SQLAlchemyInputObjectType
 
@@ -285,11 +1020,34 @@ class SQLAlchemyFilteredConnectionField(UnsortedSQLAlchemyConnectionField):
                 # noinspection PyArgumentList
                 query.filter(model_filter_column == q.filter_by(**filter_value).one())
         if where:
-            clause = where_clause(model=model, filter=where)
-            query = query.filter(clause)
+            clause, params = compile_where_clause(model, where)
+            query = query.filter(clause).params(**params)
+        if search:
+            match, rank = get_search_clauses(model, search)
+            query = query.filter(match)
+            if search_rank:
+                order_by = [rank.desc()] + get_sort_order_by(sort) + get_tiebreaker_order_by(model, sort)
+                query = query.order_by(None).order_by(*order_by)
 
         return query
 
+    @classmethod
+    def get_baked_query(cls, model, info, where=None, sort=None, group_by=None, order_by=None,
+                        search=None, search_rank=False, **kwargs):
+        query = super().get_baked_query(model, info, sort=sort, **kwargs)
+        tiebreaker = get_tiebreaker_order_by(model, sort)
+        query.add_criteria(lambda q: q.order_by(*tiebreaker))
+        if where:
+            clause, params = compile_where_clause(model, where)
+            query.add_criteria(lambda q: q.filter(clause), get_filter_shape(model, where), **params)
+        if search:
+            match, rank = get_search_clauses(model, bindparam("search"))
+            query.add_criteria(lambda q: q.filter(match), search=search)
+            if search_rank:
+                order_by = [rank.desc()] + get_sort_order_by(sort) + get_tiebreaker_order_by(model, sort)
+                query.add_criteria(lambda q: q.order_by(None).order_by(*order_by))
+        return query
+
     @classmethod
     def resolve_connection(cls, connection_type, model, info, args, resolved):
         filters = args.get("filter", {})
@@ -302,9 +1060,16 @@ class SQLAlchemyFilteredConnectionField(UnsortedSQLAlchemyConnectionField):
                 if missing_filters:
                     raise Exception(missing_filters)
 
-        return super(SQLAlchemyFilteredConnectionField, cls).resolve_connection(
+        if resolved is None and get_selected_field_names(info) <= cls.aggregate_fields:
+            # only aggregates are requested, they run their own query
+            resolved = []
+        connection = super(SQLAlchemyFilteredConnectionField, cls).resolve_connection(
             connection_type, model, info, args, resolved
         )
+        connection.model = model
+        connection.where = args.get("where")
+        connection.search = args.get("search")
+        return connection
 
 
 def default_connection_field_factory(relationship, registry, **field_kwargs):
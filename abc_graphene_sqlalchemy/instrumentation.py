@@ -0,0 +1,142 @@
+import time
+import weakref
+from contextlib import contextmanager
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from .utils import get_session
+
+QUERY_STATS_KEY = "sqlalchemy_query_stats"
+START_TIME_KEY = "graphene_sqlalchemy_start_time"
+
+# connections in a session transaction, to (a weak reference to) that session
+_connection_sessions = weakref.WeakKeyDictionary()
+
+
+class QueryBudgetExceeded(Exception):
+    """Raised instead of executing a statement past the budget of a request."""
+
+
+class QueryStats(object):
+    """SQL statements executed for one GraphQL request.
+
+    ``rows`` adds up the rows affected by writes, as reported by the DBAPI.
+    Rows returned by SELECTs are not counted, drivers like ``sqlite3`` do not
+    report them. ``duration`` is the wall time spent executing, in seconds. Once ``budget`` statements
+    were executed, further statements raise ``QueryBudgetExceeded``.
+    """
+
+    def __init__(self, budget=None):
+        self.budget = budget
+        self.statements = 0
+        self.rows = 0
+        self.duration = 0.0
+
+    def as_dict(self):
+        return {"statements": self.statements, "rows": self.rows, "duration": self.duration}
+
+
+def track_queries(context, budget=None):
+    """Attribute the statements of the session in ``context`` to the request.
+
+    Returns the ``QueryStats`` stored in ``context``, created on first use.
+    Tracking lasts until ``stop_tracking`` is called.
+    """
+    stats = context.get(QUERY_STATS_KEY)
+    if stats is None:
+        stats = context[QUERY_STATS_KEY] = QueryStats(budget)
+    session = get_session(context)
+    if session is not None and session.info.get(QUERY_STATS_KEY) is not stats:
+        session.info[QUERY_STATS_KEY] = stats
+    return stats
+
+
+def stop_tracking(context):
+    """Stop attributing statements to the request and return its ``QueryStats``."""
+    stats = context.get(QUERY_STATS_KEY)
+    session = get_session(context)
+    if session is not None and session.info.get(QUERY_STATS_KEY) is stats:
+        del session.info[QUERY_STATS_KEY]
+    return stats
+
+
+def add_query_stats(result, context):
+    """Stop tracking the request and report its statements in ``result.extensions``."""
+    stats = stop_tracking(context)
+    if stats is not None:
+        result.extensions = dict(result.extensions or {}, sqlalchemy=stats.as_dict())
+    return result
+
+
+@contextmanager
+def track_query_stats(context, budget=None):
+    """Track the statements of the session in ``context`` for the ``with`` block.
+
+    Wrap ``schema.execute`` in it to make sure the session stops tracking
+    the request once it is executed, even if it fails before
+    ``add_query_stats`` is called.
+    """
+    stats = track_queries(context, budget)
+    try:
+        yield stats
+    finally:
+        stop_tracking(context)
+
+
+class QueryStatsMiddleware(object):
+    """Middleware tracking the SQL statements of every request.
+
+    Pass it to ``schema.execute(..., middleware=[...])`` and the context to
+    ``add_query_stats`` afterwards to expose the totals in the response.
+    With a ``budget``, statements past that number raise
+    ``QueryBudgetExceeded`` and fail the fields that issue them.
+
+    The session tracks the request from its first resolver until
+    ``add_query_stats`` is called, so statements of lazy queries returned by
+    resolvers, which only run once the field is completed, are counted too.
+    Use ``track_query_stats`` around ``schema.execute`` to stop tracking
+    even when ``add_query_stats`` is not reached.
+    """
+
+    def __init__(self, budget=None):
+        self.budget = budget
+
+    def resolve(self, next, root, info, **args):
+        track_queries(info.context, self.budget)
+        return next(root, info, **args)
+
+
+@event.listens_for(Session, "after_begin")
+def _track_transaction(session, transaction, connection):
+    _connection_sessions[connection] = weakref.ref(session)
+
+
+def _get_connection_stats(conn):
+    session_ref = _connection_sessions.get(conn)
+    session = session_ref and session_ref()
+    return None if session is None else session.info.get(QUERY_STATS_KEY)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _get_connection_stats(conn)
+    if stats is None:
+        return
+    if stats.budget is not None and stats.statements >= stats.budget:
+        raise QueryBudgetExceeded("The query budget of {} SQL statements was exceeded".format(stats.budget))
+    stats.statements += 1
+    conn.info[START_TIME_KEY] = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _get_connection_stats(conn)
+    start = conn.info.pop(START_TIME_KEY, None)
+    if stats is None or start is None:
+        return
+    stats.duration += time.perf_counter() - start
+    if cursor.description is None:
+        # no result rows: a write, whose rowcount is the number of affected rows
+        stats.rows += max(cursor.rowcount, 0)
@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 import logging
-from typing import TYPE_CHECKING, Tuple, Union, Optional
+from typing import TYPE_CHECKING, Mapping, Tuple, Union, Optional
 from uuid import UUID
 
 import graphene
@@ -21,6 +21,7 @@ if TYPE_CHECKING:
 from graphene import Field
 from graphene.relay import Connection, Node
 from graphene.types.utils import yank_fields_from_attrs
+from .batching import load_instance, memoize
 from .fields import default_connection_field_factory, UnsortedSQLAlchemyConnectionField
 from .registry import get_global_registry
 
@@ -32,6 +33,8 @@ class SQLAlchemyInterfaceOptions(InterfaceOptions):
     registry: Registry = None
     connection: Connection = None
     id: Union[str, int, UUID] = None
+    batching: bool = False
+    eager_loading: Union[str, Mapping[str, str], None] = "auto"
 
 
 def exclude_autogenerated_sqla_columns(model: DeclarativeMeta) -> Tuple[str]:
@@ -57,6 +60,8 @@ class SQLAlchemyInterface(Node):
             exclude_fields: Tuple[str] = (),
             connection_field_factory: UnsortedSQLAlchemyConnectionField = default_connection_field_factory,
             skip_registry: Optional[bool] = False,
+            batching: bool = False,
+            eager_loading: Union[str, Mapping[str, str], None] = "auto",
             **options,
     ):
         _meta = SQLAlchemyInterfaceOptions(cls)
@@ -86,6 +91,7 @@ class SQLAlchemyInterface(Node):
                 only_fields=only_fields,
                 exclude_fields=exclude_fields,
                 connection_field_factory=connection_field_factory,
+                batching=batching,
             ),
             _as=Field,
         )
@@ -93,6 +99,8 @@ class SQLAlchemyInterface(Node):
             _meta = SQLAlchemyInterfaceOptions(cls)
         _meta.model = model
         _meta.registry = registry
+        _meta.batching = batching
+        _meta.eager_loading = eager_loading
         connection = Connection.create_type(
             "{}Connection".format(cls.__name__), node=cls
         )
@@ -120,22 +128,27 @@ class SQLAlchemyInterface(Node):
 
     @classmethod
     def get_node_from_global_id(cls, info, global_id, only_type: Optional[Union[bool, SubclassWithMeta_Meta]] = None):
+        if isinstance(only_type, SubclassWithMeta_Meta):
+            model = only_type._meta.model
+        else:
+            model = cls._meta.model
         try:
-            if isinstance(only_type, SubclassWithMeta_Meta):
-                query = info.context.get("session").query(only_type._meta.model)
-            else:
-                query = info.context.get("session").query(cls._meta.model)
+            query = info.context.get("session").query(model)
             try:
-                global_id = UUID(global_id)
-                node: DeclarativeMeta = query.filter_by(id=global_id).one_or_none()
+                key, value = "id", UUID(global_id)
             except ValueError:
-                visible_id = int(global_id)
-                node: DeclarativeMeta = query.filter_by(
-                    visible_id=visible_id
-                ).one_or_none()
+                key, value = "visible_id", int(global_id)
+            if cls._meta.batching:
+                column = sqlalchemy.inspect(model).get_property(key).columns[0]
+                return load_instance(info.context, query.session, model, [column], (value,))
+            node: DeclarativeMeta = memoize(
+                info.context,
+                ("node", model, key, value),
+                lambda: query.filter_by(**{key: value}).one_or_none(),
+            )
         except Exception:
             raise GraphQLError(
-                f"{only_type._meta.model.__name__}.get_node_from_global_id: unable to determine node from {global_id} for {only_type._meta.model}"
+                f"{model.__name__}.get_node_from_global_id: unable to determine node from {global_id} for {model}"
             )
         return node
 
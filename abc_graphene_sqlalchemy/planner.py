@@ -0,0 +1,232 @@
+from collections import OrderedDict, namedtuple
+from functools import partial
+
+from graphene.types.resolver import attr_resolver, dict_or_attr_resolver, dict_resolver, get_default_resolver
+from graphene.utils.str_converters import to_camel_case
+from graphql.type.definition import get_named_type
+from sqlalchemy.inspection import inspect as sqlalchemyinspect
+from sqlalchemy.orm import (ColumnProperty, CompositeProperty, Load,
+                            RelationshipProperty, defaultload, joinedload,
+                            selectinload, subqueryload)
+from sqlalchemy.orm.exc import UnmappedColumnError
+
+from .utils import iter_selected_fields
+
+EAGER_LOADERS = {
+    "joined": joinedload,
+    "selectin": selectinload,
+    "subquery": subqueryload,
+}
+
+
+def get_type_names(obj_type):
+    """Return the GraphQL type names a fragment may use to select ``obj_type``."""
+    names = {obj_type._meta.name}
+    names.update(interface._meta.name for interface in getattr(obj_type._meta, "interfaces", ()))
+    return names
+
+
+def get_node_selection_sets(info, field_asts):
+    """Return the selection sets of the nodes of a connection or list field."""
+    selection_sets = []
+    for field_ast in field_asts:
+        edges = [field for field in iter_selected_fields(info, field_ast.selection_set)
+                 if field.name.value == "edges"]
+        if not edges:
+            selection_sets.append(field_ast.selection_set)
+            continue
+        for edge in edges:
+            selection_sets.extend(
+                field.selection_set
+                for field in iter_selected_fields(info, edge.selection_set)
+                if field.name.value == "node"
+            )
+    return [selection_set for selection_set in selection_sets if selection_set is not None]
+
+
+def get_selected_orm_fields(obj_type, info, selection_sets):
+    """Map the fields selected on ``obj_type`` to their ORM attributes.
+
+    Returns an ordered mapping of graphene field name to
+    ``(orm_field, [field nodes])``; the ORM attribute is None for fields that
+    are not backed by a model attribute.
+    """
+    registry = obj_type._meta.registry
+    field_names = {}
+    for name, field in obj_type._meta.fields.items():
+        field_names[getattr(field, "name", None) or to_camel_case(name)] = name
+        field_names.setdefault(name, name)
+    type_names = get_type_names(obj_type)
+
+    selected = OrderedDict()
+    for selection_set in selection_sets:
+        for field in iter_selected_fields(info, selection_set, type_names):
+            name = field_names.get(field.name.value)
+            if name is None:
+                continue
+            orm_field = registry.get_orm_field_for_graphene_field(obj_type, name)
+            selected.setdefault(name, (orm_field, []))[1].append(field)
+    return selected
+
+
+def get_eager_load_strategy(obj_type, field_name, relationship_prop):
+    """Return the loader strategy name for a relationship field, or None.
+
+    The ``eager_loading`` option of the type decides: ``"auto"`` joins scalar
+    relationships and uses ``selectin`` for collections, a strategy name
+    applies to every relationship of the type, a mapping selects the strategy
+    per field name and a falsy value disables eager loading.
+    """
+    policy = getattr(obj_type._meta, "eager_loading", None)
+    if isinstance(policy, dict):
+        policy = policy.get(field_name, None)
+    if not policy:
+        return None
+    if getattr(obj_type._meta, "batching", False):
+        # batched relationships are loaded by their DataLoaders instead
+        return None
+    if policy == "auto":
+        return "selectin" if relationship_prop.uselist else "joined"
+    if policy not in EAGER_LOADERS:
+        raise ValueError("Unknown eager loading strategy: {!r}".format(policy))
+    return policy
+
+
+def is_default_resolver(resolver):
+    """Check whether ``resolver`` is a default resolver reading the attribute of the field."""
+    return isinstance(resolver, partial) and resolver.func in (
+        attr_resolver, dict_resolver, dict_or_attr_resolver, get_default_resolver()
+    )
+
+
+def get_parent_resolver(obj_type, name):
+    """Return the resolver graphene passes to the field ``name`` of ``obj_type``.
+
+    That is the ``resolve_<name>`` method of the type or of one of its
+    interfaces, or else the default resolver of the type.
+    """
+    resolver = getattr(obj_type, "resolve_{}".format(name), None)
+    for interface in getattr(obj_type._meta, "interfaces", ()):
+        if resolver:
+            break
+        if name in interface._meta.fields:
+            resolver = getattr(interface, "resolve_{}".format(name), None)
+    if resolver:
+        return resolver
+    default_resolver = getattr(obj_type._meta, "default_resolver", None) or get_default_resolver()
+    return partial(default_resolver, name, None)
+
+
+LoadPlan = namedtuple("LoadPlan", ["columns", "relationships"])
+
+
+def get_required_columns(obj_type, selected):
+    """Return the column attribute keys needed to resolve ``selected`` fields.
+
+    Primary keys, the polymorphic discriminator and the local columns of
+    selected relationships are always kept. Returns None when a selected
+    field is not backed by a plain model attribute (hybrid properties) or
+    has a ``resolve_<name>`` method, in which case no column can safely be
+    left out.
+    """
+    mapper = sqlalchemyinspect(obj_type._meta.model)
+    column_keys = set()
+
+    def add_columns(columns):
+        for column in columns:
+            try:
+                column_keys.add(mapper.get_property_by_column(column).key)
+            except UnmappedColumnError:
+                pass
+
+    add_columns(mapper.primary_key)
+    if mapper.polymorphic_on is not None:
+        add_columns([mapper.polymorphic_on])
+    from .types import SQLAlchemyObjectType
+
+    for name, (orm_field, _) in selected.items():
+        resolver = get_parent_resolver(obj_type, name)
+        if name == "id" and resolver is SQLAlchemyObjectType.resolve_id:
+            # the id is resolved from the primary key
+            continue
+        if not is_default_resolver(resolver):
+            # a custom resolver may read any attribute of the row
+            return None
+        if isinstance(orm_field, ColumnProperty):
+            column_keys.add(orm_field.key)
+        elif isinstance(orm_field, CompositeProperty):
+            column_keys.update(prop.key for prop in orm_field.props)
+        elif isinstance(orm_field, RelationshipProperty):
+            add_columns(orm_field.local_columns)
+        else:
+            return None
+    return column_keys
+
+
+def plan_loads(obj_type, info, selection_sets):
+    """Return the columns and relationships that the selection will use.
+
+    ``relationships`` maps relationship keys to
+    ``(strategy, target_type, child_plan)``; a None strategy keeps the
+    configured loader and only prunes the columns of the related rows.
+    """
+    selected = get_selected_orm_fields(obj_type, info, selection_sets)
+    relationships = OrderedDict()
+    for name, (orm_field, field_asts) in selected.items():
+        if not isinstance(orm_field, RelationshipProperty) or orm_field.key in relationships:
+            continue
+        target_type = obj_type._meta.registry.get_type_for_model(orm_field.mapper.entity)
+        if target_type is None:
+            continue
+        strategy = get_eager_load_strategy(obj_type, name, orm_field)
+        child_plan = plan_loads(target_type, info, get_node_selection_sets(info, field_asts))
+        relationships[orm_field.key] = (strategy, target_type, child_plan)
+    return LoadPlan(get_required_columns(obj_type, selected), relationships)
+
+
+def build_loader_options(model, plan, parent=None, extra_columns=()):
+    """Turn a plan from ``plan_loads`` into query loader options."""
+    options = []
+    if plan.columns is not None:
+        columns = sorted(plan.columns.union(extra_columns))
+        options.append((parent or Load(model)).load_only(*columns))
+    for key, (strategy, target_type, child_plan) in plan.relationships.items():
+        loader = EAGER_LOADERS.get(strategy, defaultload)
+        attribute = getattr(model, key)
+        option = loader(attribute) if parent is None else getattr(parent, loader.__name__)(attribute)
+        child_options = build_loader_options(target_type._meta.model, child_plan, option)
+        if strategy is not None or child_options:
+            options.extend(child_options or [option])
+    return options
+
+
+def get_node_type(info):
+    """Return the object type of the nodes returned by a connection field."""
+    graphene_type = getattr(get_named_type(info.return_type), "graphene_type", None)
+    connection_meta = getattr(graphene_type, "_meta", None)
+    node = getattr(connection_meta, "node", None)
+    if node is None or not hasattr(node._meta, "registry"):
+        return None
+    return node
+
+
+def is_selected_type(obj_type, info):
+    """Check whether the selection of ``info`` is made on ``obj_type``.
+
+    That is the case when the field returns ``obj_type`` or an interface it
+    implements, e.g. ``Node``; not when a resolver of another type fetches it.
+    """
+    graphene_type = getattr(get_named_type(info.return_type), "graphene_type", None)
+    return graphene_type is obj_type or graphene_type in getattr(obj_type._meta, "interfaces", ())
+
+
+def get_load_options(obj_type, info, selection_sets, extra_columns=()):
+    """Return the loader options needed to resolve the selection on ``obj_type``.
+
+    ``extra_columns`` are attribute keys of the root model to load in addition
+    to the selected ones, e.g. the columns a connection is sorted by.
+    """
+    if obj_type is None or info is None:
+        return []
+    plan = plan_loads(obj_type, info, selection_sets)
+    return build_loader_options(obj_type._meta.model, plan, extra_columns=extra_columns)
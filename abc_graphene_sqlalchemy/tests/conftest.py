@@ -2,7 +2,9 @@ import pytest
 from sqlalchemy import create_engine
 from sqlalchemy.orm import scoped_session, sessionmaker
 
+from ..caching import ResultCache, set_result_cache
 from ..converter import convert_sqlalchemy_composite
+from ..fields import argument_cache, field_cache
 from ..registry import reset_global_registry
 from .models import Base, CompositeFullName
 
@@ -12,6 +14,10 @@ test_db_url = 'sqlite://'  # use in-memory database for tests
 @pytest.fixture(autouse=True)
 def reset_registry():
     reset_global_registry()
+    # filter inputs reference enum types of the previous registry
+    argument_cache.clear()
+    field_cache.clear()
+    set_result_cache(ResultCache())
 
     # Prevent tests that implicitly depend on Reporter from raising
     # Tests that explicitly depend on this behavior should re-register a converter
@@ -0,0 +1,474 @@
+import itertools
+
+import graphene
+from graphene.relay import Connection, Node
+from graphql_relay import to_global_id
+from graphql_relay.utils import base64
+from sqlalchemy import event
+
+from .models import Article, HairKind, Pet, Reporter
+from ..batching import memoize
+from ..fields import SQLAlchemyConnectionField, SQLAlchemyNodesField
+from ..registry import reset_global_registry
+from ..types import ORMField, SQLAlchemyObjectType
+
+
+def to_std_dicts(value):
+    """Convert nested ordered dicts to normal dicts for better comparison."""
+    if isinstance(value, dict):
+        return {k: to_std_dicts(v) for k, v in value.items()}
+    elif isinstance(value, list):
+        return [to_std_dicts(v) for v in value]
+    else:
+        return value
+
+
+def add_test_data(session):
+    for i in range(3):
+        reporter = Reporter(first_name="Reporter_{}".format(i))
+        session.add(reporter)
+        for j in range(2):
+            article = Article(headline="Article_{}_{}".format(i, j))
+            article.reporter = reporter
+            session.add(article)
+        pet = Pet(name="Pet_{}".format(i), pet_kind="cat", hair_kind=HairKind.SHORT)
+        pet.reporters.append(reporter)
+        session.add(pet)
+    session.commit()
+    session.expunge_all()
+
+
+def capture_selects(session):
+    statements = []
+
+    @event.listens_for(session.get_bind(), "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("SELECT"):
+            statements.append(statement)
+
+    return statements
+
+
+def get_schema(use_batching=True, use_eager_loading="auto"):
+    class ReporterType(SQLAlchemyObjectType):
+        class Meta:
+            model = Reporter
+            interfaces = (Node,)
+            exclude_fields = ("composite_prop",)
+            batching = use_batching
+            eager_loading = use_eager_loading
+
+    class ArticleType(SQLAlchemyObjectType):
+        class Meta:
+            model = Article
+            interfaces = (Node,)
+            batching = use_batching
+            eager_loading = use_eager_loading
+
+    class PetType(SQLAlchemyObjectType):
+        class Meta:
+            model = Pet
+            interfaces = (Node,)
+            batching = use_batching
+            eager_loading = use_eager_loading
+
+    class ArticleConnection(Connection):
+        class Meta:
+            node = ArticleType
+
+    class Query(graphene.ObjectType):
+        articles = SQLAlchemyConnectionField(ArticleConnection)
+        reporters = graphene.List(ReporterType)
+
+        def resolve_reporters(self, info):
+            return info.context["session"].query(Reporter).all()
+
+    return graphene.Schema(query=Query)
+
+
+def test_many_to_one_batching(session):
+    add_test_data(session)
+    schema = get_schema()
+    statements = capture_selects(session)
+    result = schema.execute(
+        "{ articles { edges { node { headline reporter { firstName } } } } }",
+        context_value={"session": session},
+    )
+    assert not result.errors
+    assert [edge["node"]["reporter"]["firstName"] for edge in result.data["articles"]["edges"]] == [
+        "Reporter_0", "Reporter_0", "Reporter_1", "Reporter_1", "Reporter_2", "Reporter_2",
+    ]
+    # one query for the articles, one for all of their reporters
+    assert len(statements) == 2
+    assert " IN (" in statements[1]
+
+
+def test_one_to_one_batching(session):
+    add_test_data(session)
+    schema = get_schema()
+    statements = capture_selects(session)
+    result = schema.execute(
+        "{ reporters { firstName favoriteArticle { headline } } }",
+        context_value={"session": session},
+    )
+    assert not result.errors
+    assert [r["favoriteArticle"]["headline"] for r in to_std_dicts(result.data)["reporters"]] == [
+        "Article_0_0", "Article_1_0", "Article_2_0",
+    ]
+    assert len(statements) == 2
+
+
+def test_batching_disabled_by_default(session):
+    add_test_data(session)
+    schema = get_schema(use_batching=False, use_eager_loading=None)
+    statements = capture_selects(session)
+    result = schema.execute(
+        "{ articles { edges { node { reporter { firstName } } } } }",
+        context_value={"session": session},
+    )
+    assert not result.errors
+    assert len(statements) == 4
+
+
+def test_orm_field_overrides_batching(session):
+    add_test_data(session)
+
+    class ReporterType(SQLAlchemyObjectType):
+        class Meta:
+            model = Reporter
+            exclude_fields = ("composite_prop",)
+
+    class ArticleType(SQLAlchemyObjectType):
+        class Meta:
+            model = Article
+
+        reporter = ORMField(batching=True)
+
+    class Query(graphene.ObjectType):
+        articles = graphene.List(ArticleType)
+
+        def resolve_articles(self, info):
+            return info.context["session"].query(Article).all()
+
+    schema = graphene.Schema(query=Query)
+    statements = capture_selects(session)
+    result = schema.execute("{ articles { reporter { firstName } } }", context_value={"session": session})
+    assert not result.errors
+    assert len(statements) == 2
+
+
+def get_connection_schema():
+    class ReporterType(SQLAlchemyObjectType):
+        class Meta:
+            model = Reporter
+            interfaces = (Node,)
+            exclude_fields = ("composite_prop",)
+            batching = True
+
+    class ArticleType(SQLAlchemyObjectType):
+        class Meta:
+            model = Article
+            interfaces = (Node,)
+
+    class PetType(SQLAlchemyObjectType):
+        class Meta:
+            model = Pet
+            interfaces = (Node,)
+
+    class Query(graphene.ObjectType):
+        reporters = graphene.List(ReporterType)
+
+        def resolve_reporters(self, info):
+            return info.context["session"].query(Reporter).all()
+
+    return graphene.Schema(query=Query)
+
+
+def test_one_to_many_connection_batching(session):
+    add_test_data(session)
+    schema = get_connection_schema()
+    statements = capture_selects(session)
+    result = schema.execute(
+        """
+        {
+          reporters {
+            articles(first: 1, after: "YXJyYXljb25uZWN0aW9uOjA=") {
+              edges { node { headline } }
+              pageInfo { hasNextPage }
+            }
+          }
+        }
+        """,
+        context_value={"session": session},
+    )
+    assert not result.errors
+    reporters = to_std_dicts(result.data)["reporters"]
+    assert [r["articles"]["edges"][0]["node"]["headline"] for r in reporters] == [
+        "Article_0_1", "Article_1_1", "Article_2_1",
+    ]
+    assert not any(r["articles"]["pageInfo"]["hasNextPage"] for r in reporters)
+    assert len(statements) == 2
+    assert "row_number() OVER (PARTITION BY" in statements[1]
+
+
+def test_many_to_many_connection_batching(session):
+    add_test_data(session)
+    schema = get_connection_schema()
+    statements = capture_selects(session)
+    result = schema.execute(
+        "{ reporters { pets(last: 1) { edges { node { name } } pageInfo { hasPreviousPage } } } }",
+        context_value={"session": session},
+    )
+    assert not result.errors
+    reporters = to_std_dicts(result.data)["reporters"]
+    assert [[e["node"]["name"] for e in r["pets"]["edges"]] for r in reporters] == [
+        ["Pet_0"], ["Pet_1"], ["Pet_2"],
+    ]
+    assert not any(r["pets"]["pageInfo"]["hasPreviousPage"] for r in reporters)
+    assert len(statements) == 2
+
+
+def test_custom_resolver_overrides_connection_batching(session):
+    add_test_data(session)
+
+    class ReporterType(SQLAlchemyObjectType):
+        class Meta:
+            model = Reporter
+            interfaces = (Node,)
+            exclude_fields = ("composite_prop",)
+            batching = True
+
+        def resolve_articles(self, info, **args):
+            return [article for article in self.articles if article.headline.endswith("_1")]
+
+    class ArticleType(SQLAlchemyObjectType):
+        class Meta:
+            model = Article
+            interfaces = (Node,)
+
+    class Query(graphene.ObjectType):
+        reporters = graphene.List(ReporterType)
+
+        def resolve_reporters(self, info):
+            return info.context["session"].query(Reporter).all()
+
+    schema = graphene.Schema(query=Query)
+    result = schema.execute(
+        "{ reporters { articles { edges { node { headline } } } } }", context_value={"session": session}
+    )
+    assert not result.errors
+    reporters = to_std_dicts(result.data)["reporters"]
+    assert [[e["node"]["headline"] for e in r["articles"]["edges"]] for r in reporters] == [
+        ["Article_0_1"], ["Article_1_1"], ["Article_2_1"],
+    ]
+
+
+def test_connection_batching_matches_unbatched(session):
+    for i in range(4):
+        reporter = Reporter(first_name="Reporter_{}".format(i))
+        session.add(reporter)
+        for j in range(i):
+            session.add(Article(headline="Article_{}_{}".format(i, j), reporter=reporter))
+    session.commit()
+    session.expunge_all()
+
+    class CountedConnection(Connection):
+        class Meta:
+            abstract = True
+
+        total_count = graphene.Int()
+
+        def resolve_total_count(self, info):
+            return self.length
+
+    def get_schema(use_batching):
+        reset_global_registry()
+
+        class ReporterType(SQLAlchemyObjectType):
+            class Meta:
+                model = Reporter
+                interfaces = (Node,)
+                exclude_fields = ("composite_prop",)
+                batching = use_batching
+
+        class ArticleType(SQLAlchemyObjectType):
+            class Meta:
+                model = Article
+                interfaces = (Node,)
+                connection_class = CountedConnection
+
+        class Query(graphene.ObjectType):
+            reporters = graphene.List(ReporterType)
+
+            def resolve_reporters(self, info):
+                return info.context["session"].query(Reporter).order_by(Reporter.id).all()
+
+        return graphene.Schema(query=Query)
+
+    query = """
+        query($first: Int, $last: Int, $after: String, $before: String) {
+          reporters {
+            articles(first: $first, last: $last, after: $after, before: $before) {
+              %s
+              edges { cursor node { headline } }
+              pageInfo { hasNextPage hasPreviousPage startCursor endCursor }
+            }
+          }
+        }
+    """
+    cursors = [None] + [base64("arrayconnection:{}".format(offset)) for offset in (0, 1, 5)]
+    schemas = [get_schema(True), get_schema(False)]
+    for selection, first, last, after, before in itertools.product(
+        ("totalCount", ""), (None, 1, 2), (None, 1, 2), cursors, cursors
+    ):
+        variables = {"first": first, "last": last, "after": after, "before": before}
+        results = []
+        for schema in schemas:
+            session.expunge_all()
+            result = schema.execute(query % selection, variables=variables, context_value={"session": session})
+            assert not result.errors
+            results.append(to_std_dicts(result.data))
+        assert results[0] == results[1], variables
+
+
+def test_node_batching(session):
+    add_test_data(session)
+
+    class ArticleType(SQLAlchemyObjectType):
+        class Meta:
+            model = Article
+            interfaces = (Node,)
+            batching = True
+
+    class Query(graphene.ObjectType):
+        node = Node.Field()
+        nodes = SQLAlchemyNodesField()
+
+    schema = graphene.Schema(query=Query, types=[ArticleType])
+    statements = capture_selects(session)
+    ids = [to_global_id("ArticleType", i) for i in (3, 1, 99, 2)]
+    result = schema.execute(
+        """
+        query($ids: [ID!]!) {
+          first: node(id: "QXJ0aWNsZVR5cGU6NQ==") { ... on ArticleType { headline } }
+          second: node(id: "QXJ0aWNsZVR5cGU6Ng==") { ... on ArticleType { headline } }
+          nodes(ids: $ids) { ... on ArticleType { headline } }
+        }
+        """,
+        variables={"ids": ids},
+        context_value={"session": session},
+    )
+    assert not result.errors
+    data = to_std_dicts(result.data)
+    assert data["first"] == {"headline": "Article_2_0"}
+    assert data["second"] == {"headline": "Article_2_1"}
+    assert data["nodes"] == [
+        {"headline": "Article_1_0"}, {"headline": "Article_0_0"}, None, {"headline": "Article_0_1"},
+    ]
+    assert len(statements) == 1
+    assert " IN (" in statements[0]
+
+
+def test_object_context_skips_memoization(session, monkeypatch):
+    add_test_data(session)
+    monkeypatch.setattr(Article, "query", session.query_property(), raising=False)
+
+    class ArticleType(SQLAlchemyObjectType):
+        class Meta:
+            model = Article
+            interfaces = (Node,)
+
+    class Query(graphene.ObjectType):
+        node = Node.Field()
+        articles = SQLAlchemyConnectionField(ArticleType._meta.connection)
+
+    class Request(object):
+        """A request object as the context, e.g. with Flask."""
+
+    schema = graphene.Schema(query=Query)
+    result = schema.execute(
+        """{
+          articles(first: 1) { edges { node { headline } } }
+          same: articles(first: 1) { edges { node { headline } } }
+          node(id: "QXJ0aWNsZVR5cGU6MQ==") { ... on ArticleType { headline } }
+        }""",
+        context_value=Request(),
+    )
+    assert not result.errors
+    data = to_std_dicts(result.data)
+    assert data["articles"] == data["same"] == {"edges": [{"node": {"headline": "Article_0_0"}}]}
+    assert data["node"] == {"headline": "Article_0_0"}
+
+
+def test_request_memoization(session):
+    add_test_data(session)
+
+    class ArticleType(SQLAlchemyObjectType):
+        class Meta:
+            model = Article
+            interfaces = (Node,)
+
+    class Query(graphene.ObjectType):
+        node = Node.Field()
+        articles = SQLAlchemyConnectionField(ArticleType._meta.connection)
+
+    schema = graphene.Schema(query=Query)
+    statements = capture_selects(session)
+    result = schema.execute(
+        """{
+          a: articles(first: 2) { edges { node { headline } } }
+          b: articles(first: 2) { edges { node { headline } } }
+          c: articles(first: 3) { edges { node { headline } } }
+          x: node(id: "%s") { id }
+          y: node(id: "%s") { id }
+        }""" % (to_global_id("ArticleType", 1000), to_global_id("ArticleType", 1000)),
+        context_value={"session": session},
+    )
+    assert not result.errors
+    assert result.data["a"] == result.data["b"]
+    assert len(result.data["c"]["edges"]) == 3
+    assert result.data["x"] is None and result.data["y"] is None
+    # one query per distinct connection window and one for the missing node
+    assert len(statements) == 3
+
+    context = {"session": session}
+    memoize(context, "key", lambda: 1)
+    assert memoize(context, "key", lambda: 2) == 1
+    session.add(Article(headline="new"))
+    session.flush()
+    assert memoize(context, "key", lambda: 3) == 3
+
+
+def test_request_memoization_keeps_load_plans_apart(session):
+    add_test_data(session)
+
+    class ReporterType(SQLAlchemyObjectType):
+        class Meta:
+            model = Reporter
+            interfaces = (Node,)
+            exclude_fields = ("composite_prop",)
+
+    class ArticleType(SQLAlchemyObjectType):
+        class Meta:
+            model = Article
+            interfaces = (Node,)
+
+    class Query(graphene.ObjectType):
+        articles = SQLAlchemyConnectionField(ArticleType._meta.connection)
+
+    schema = graphene.Schema(query=Query)
+    statements = capture_selects(session)
+    result = schema.execute(
+        """{
+          a: articles(first: 4) { edges { node { headline } } }
+          b: articles(first: 4) { edges { node { headline reporter { firstName } } } }
+        }""",
+        context_value={"session": session},
+    )
+    assert not result.errors
+    assert [edge["node"]["reporter"]["firstName"] for edge in result.data["b"]["edges"]] == [
+        "Reporter_0", "Reporter_0", "Reporter_1", "Reporter_1",
+    ]
+    # the second alias joins its reporters instead of reusing the first page
+    assert len(statements) == 2
+    assert "JOIN reporters" in statements[1]
@@ -62,6 +62,10 @@ def test_should_time_convert_string():
     assert get_field(types.Time()).type == graphene.String
 
 
+def test_should_variant_convert_impl():
+    assert get_field(types.Integer().with_variant(types.String(), "sqlite")).type == graphene.Int
+
+
 def test_should_string_convert_string():
     assert get_field(types.String()).type == graphene.String
 
@@ -1,15 +1,38 @@
+import datetime
 import logging
+import os
+import subprocess
+import sys
+import time
 
+import graphene
 import pytest
 from promise import Promise
 
 from graphene import InputObjectType
-from graphene.relay import Connection
-from sqlalchemy import inspect
+from graphene.relay import Connection, Node
+from sqlalchemy import Column, Integer, MetaData, String, Table, create_engine, event, inspect, select
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy_utils import TSVectorType
 
+from .models import Article as ArticleModel
 from .models import Editor as EditorModel
+from .models import HairKind
 from .models import Pet as PetModel
-from ..fields import SQLAlchemyConnectionField, SQLAlchemyFilteredConnectionField
+from .models import Reporter as ReporterModel
+from ..baking import bakery
+from ..caching import MemoryCacheBackend, PickleCacheBackend, ResultCache, set_result_cache
+from ..expressions import SearchMatch, SearchRank, search_term
+from ..fields import (
+    SQLAlchemyConnectionField,
+    SQLAlchemyFilteredConnectionField,
+    FILTER_OPERATORS,
+    LARGE_IN_THRESHOLD,
+    SQLAlchemyKeysetConnectionField,
+    compile_where_clause,
+    get_filter_plan,
+)
 from ..types import SQLAlchemyObjectType
 
 log = logging.getLogger(__name__)
@@ -45,6 +68,7 @@ def test_where_filter_added():
     filter_fields = field.args['where']._type._meta.fields
     log.info(filter_fields)
     filter_column_names = [column.name for column in inspect(Pet._meta.model).columns.values()] + ['and', 'or']
+    filter_column_names += [relationship.key for relationship in inspect(Pet._meta.model).relationships]
     for field_name, value in filter_fields.items():
         assert field_name in filter_column_names
 
@@ -73,3 +97,853 @@ def test_custom_sort():
 def test_init_raises():
     with pytest.raises(TypeError, match="Cannot create sort"):
         SQLAlchemyConnectionField(Connection)
+
+
+def add_pets(session, count=5):
+    for i in range(count):
+        session.add(PetModel(id=i + 1, name="pet{}".format(i + 1), pet_kind="cat", hair_kind=HairKind.SHORT))
+    session.commit()
+
+
+def capture_statements(session):
+    statements = []
+
+    @event.listens_for(session.get_bind(), "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    return statements
+
+
+def pet_names(result, field="allPets"):
+    return [edge["node"]["name"] for edge in result.data[field]["edges"]]
+
+
+def test_connection_pushes_window_into_sql(session):
+    add_pets(session)
+
+    class PetNode(SQLAlchemyObjectType):
+        class Meta:
+            model = PetModel
+            interfaces = (Node,)
+
+    class Query(graphene.ObjectType):
+        all_pets = SQLAlchemyConnectionField(PetNode._meta.connection)
+
+    schema = graphene.Schema(query=Query)
+    statements = capture_statements(session)
+    result = schema.execute(
+        "{ allPets(first: 2, after: \"YXJyYXljb25uZWN0aW9uOjA=\") { edges { node { name } } "
+        "pageInfo { hasNextPage } } }",
+        context_value={"session": session},
+    )
+    assert not result.errors
+    assert pet_names(result) == ["pet2", "pet3"]
+    assert result.data["allPets"]["pageInfo"]["hasNextPage"]
+    assert any("LIMIT" in statement for statement in statements)
+
+    result = schema.execute(
+        "{ allPets(last: 2) { edges { node { name } } pageInfo { hasPreviousPage } } }",
+        context_value={"session": session},
+    )
+    assert not result.errors
+    assert pet_names(result) == ["pet4", "pet5"]
+    assert result.data["allPets"]["pageInfo"]["hasPreviousPage"]
+
+
+def test_keyset_connection_pagination(session):
+    add_pets(session)
+    session.add(PetModel(id=6, name="pet3", pet_kind="dog", hair_kind=HairKind.LONG))
+    session.commit()
+
+    class PetNode(SQLAlchemyObjectType):
+        class Meta:
+            model = PetModel
+            interfaces = (Node,)
+
+    class Query(graphene.ObjectType):
+        all_pets = SQLAlchemyKeysetConnectionField(PetNode._meta.connection)
+
+    schema = graphene.Schema(query=Query)
+    query = """
+        query($after: String, $before: String, $first: Int, $last: Int) {
+          allPets(sort: NAME_DESC, after: $after, before: $before, first: $first, last: $last) {
+            edges { node { name } cursor }
+            pageInfo { hasNextPage hasPreviousPage endCursor startCursor }
+          }
+        }
+    """
+    variables = {"first": 3}
+    result = schema.execute(query, variables=variables, context_value={"session": session})
+    assert not result.errors
+    assert pet_names(result) == ["pet5", "pet4", "pet3"]
+    assert result.data["allPets"]["pageInfo"]["hasNextPage"]
+
+    statements = capture_statements(session)
+    variables = {"first": 3, "after": result.data["allPets"]["pageInfo"]["endCursor"]}
+    result = schema.execute(query, variables=variables, context_value={"session": session})
+    assert not result.errors
+    # the duplicate name is ordered by the primary key tiebreaker
+    assert pet_names(result) == ["pet3", "pet2", "pet1"]
+    assert not result.data["allPets"]["pageInfo"]["hasNextPage"]
+    assert any("(pets.name, pets.id) < (?, ?)" in statement for statement in statements)
+
+    variables = {"last": 2, "before": result.data["allPets"]["pageInfo"]["endCursor"]}
+    result = schema.execute(query, variables=variables, context_value={"session": session})
+    assert not result.errors
+    assert pet_names(result) == ["pet3", "pet2"]
+    assert result.data["allPets"]["pageInfo"]["hasPreviousPage"]
+
+    result = schema.execute(query, variables={"after": "bogus"}, context_value={"session": session})
+    assert result.errors
+
+
+def test_keyset_connection_null_sort_keys(session):
+    for i, name in enumerate(["a", None, "b", None, "c"]):
+        session.add(PetModel(id=i + 1, name=name, pet_kind="cat", hair_kind=HairKind.SHORT))
+    session.commit()
+
+    class PetNode(SQLAlchemyObjectType):
+        class Meta:
+            model = PetModel
+            interfaces = (Node,)
+
+    class Query(graphene.ObjectType):
+        all_pets = SQLAlchemyKeysetConnectionField(PetNode._meta.connection)
+
+    schema = graphene.Schema(query=Query)
+    query = """
+        query($sort: [PetNodeSortEnum], $after: String, $before: String, $first: Int, $last: Int) {
+          allPets(sort: $sort, after: $after, before: $before, first: $first, last: $last) {
+            edges { node { id } }
+            pageInfo { hasNextPage hasPreviousPage endCursor startCursor }
+          }
+        }
+    """
+
+    def page_ids(result):
+        return [edge["node"]["id"] for edge in result.data["allPets"]["edges"]]
+
+    # NULL sorts after every value
+    expected = {
+        "NAME_ASC": ["1", "3", "5", "2", "4"],
+        "NAME_DESC": ["4", "2", "5", "3", "1"],
+    }
+    for sort, ids in expected.items():
+        forward, variables = [], {"sort": [sort], "first": 2}
+        while True:
+            result = schema.execute(query, variables=variables, context_value={"session": session})
+            assert not result.errors
+            forward += page_ids(result)
+            if not result.data["allPets"]["pageInfo"]["hasNextPage"]:
+                break
+            variables["after"] = result.data["allPets"]["pageInfo"]["endCursor"]
+        assert [Node.from_global_id(id_)[1] for id_ in forward] == ids
+
+        backward, variables = [], {"sort": [sort], "last": 2}
+        while True:
+            result = schema.execute(query, variables=variables, context_value={"session": session})
+            assert not result.errors
+            backward = page_ids(result) + backward
+            if not result.data["allPets"]["pageInfo"]["hasPreviousPage"]:
+                break
+            variables["before"] = result.data["allPets"]["pageInfo"]["startCursor"]
+        assert backward == forward
+
+
+def test_connection_counts_only_when_needed(session):
+    add_pets(session)
+
+    class PetNode(SQLAlchemyObjectType):
+        class Meta:
+            model = PetModel
+            interfaces = (Node,)
+
+    class CountedPetConnection(Connection):
+        class Meta:
+            node = PetNode
+
+        total_count = graphene.Int()
+
+        def resolve_total_count(self, info):
+            return self.length
+
+    class Query(graphene.ObjectType):
+        all_pets = SQLAlchemyConnectionField(CountedPetConnection)
+
+    schema = graphene.Schema(query=Query)
+    statements = capture_statements(session)
+    result = schema.execute(
+        "{ allPets(first: 2) { edges { node { name } } pageInfo { hasNextPage } } }",
+        context_value={"session": session},
+    )
+    assert not result.errors
+    assert pet_names(result) == ["pet1", "pet2"]
+    assert result.data["allPets"]["pageInfo"]["hasNextPage"]
+    assert not any("count(*)" in statement for statement in statements)
+
+    result = schema.execute(
+        "{ allPets(first: 5) { pageInfo { hasNextPage } } }",
+        context_value={"session": session},
+    )
+    assert not result.errors
+    assert not result.data["allPets"]["pageInfo"]["hasNextPage"]
+    assert not any("count(*)" in statement for statement in statements)
+
+    result = schema.execute(
+        "{ allPets(first: 2) { ... on CountedPetConnection { totalCount } } }",
+        context_value={"session": session},
+    )
+    assert not result.errors
+    assert result.data["allPets"]["totalCount"] == 5
+    assert any("count(*)" in statement for statement in statements)
+
+
+def test_connection_last_before_out_of_range(session):
+    add_pets(session)
+
+    class PetNode(SQLAlchemyObjectType):
+        class Meta:
+            model = PetModel
+            interfaces = (Node,)
+
+    class Query(graphene.ObjectType):
+        all_pets = SQLAlchemyConnectionField(PetNode._meta.connection)
+
+    schema = graphene.Schema(query=Query)
+    # "arrayconnection:10", past the last of the 5 rows
+    result = schema.execute(
+        "{ allPets(last: 2, before: \"YXJyYXljb25uZWN0aW9uOjEw\") { edges { node { name } } "
+        "pageInfo { hasPreviousPage } } }",
+        context_value={"session": session},
+    )
+    assert not result.errors
+    assert pet_names(result) == ["pet4", "pet5"]
+    assert result.data["allPets"]["pageInfo"]["hasPreviousPage"]
+
+    # "arrayconnection:6" for both, an empty range past the last row
+    result = schema.execute(
+        "{ allPets(first: 1, after: \"YXJyYXljb25uZWN0aW9uOjY=\", before: \"YXJyYXljb25uZWN0aW9uOjY=\") { "
+        "edges { node { name } } pageInfo { hasNextPage } } }",
+        context_value={"session": session},
+    )
+    assert not result.errors
+    assert pet_names(result) == []
+    assert result.data["allPets"]["pageInfo"]["hasNextPage"]
+
+    # an invalid before cursor is ignored, "arrayconnection:1" for after
+    result = schema.execute(
+        "{ allPets(first: 2, after: \"YXJyYXljb25uZWN0aW9uOjE=\", before: \"invalid\") { "
+        "edges { node { name } } pageInfo { hasNextPage } } }",
+        context_value={"session": session},
+    )
+    assert not result.errors
+    assert pet_names(result) == ["pet3", "pet4"]
+    assert result.data["allPets"]["pageInfo"]["hasNextPage"]
+
+
+def add_editors(session, count=5):
+    for i in range(count):
+        session.add(EditorModel(editor_id=i + 1, name="editor{}".format(i + 1)))
+    session.commit()
+
+
+def test_filtered_connection_reuses_filter_plan(session):
+    add_editors(session)
+
+    class EditorNode(SQLAlchemyObjectType):
+        class Meta:
+            model = EditorModel
+            interfaces = (Node,)
+
+    class Query(graphene.ObjectType):
+        all_editors = SQLAlchemyFilteredConnectionField(EditorNode)
+
+    schema = graphene.Schema(query=Query)
+    query = """
+        query($name: String, $ids: [ID]) {
+          allEditors(where: {name: {like: $name}, or: {editorId: {in: $ids}}}) {
+            edges { node { name } }
+          }
+        }
+    """
+    get_filter_plan.cache_clear()
+    result = schema.execute(query, variables={"name": "EDITOR", "ids": [2, 4]}, context_value={"session": session})
+    assert not result.errors
+    assert pet_names(result, "allEditors") == ["editor2", "editor4"]
+
+    result = schema.execute(query, variables={"name": "5", "ids": [5]}, context_value={"session": session})
+    assert not result.errors
+    assert pet_names(result, "allEditors") == ["editor5"]
+    cache_info = get_filter_plan.cache_info()
+    assert (cache_info.hits, cache_info.misses) == (1, 1)
+
+    clause, params = compile_where_clause(EditorModel, {"name": {"like": "a"}, "or": {"editor_id": {"in": [1]}}})
+    assert clause is compile_where_clause(EditorModel, {"name": {"like": "b"}, "or": {"editor_id": {"in": [2]}}})[0]
+    assert params == {"where_0": "%a%", "where_1": [1]}
+
+
+def test_filtered_connection_null_comparisons(session):
+    add_editors(session, 3)
+    session.add(EditorModel(editor_id=4, name=None))
+    session.commit()
+
+    class EditorNode(SQLAlchemyObjectType):
+        class Meta:
+            model = EditorModel
+            interfaces = (Node,)
+
+    class Query(graphene.ObjectType):
+        all_editors = SQLAlchemyFilteredConnectionField(EditorNode)
+
+    schema = graphene.Schema(query=Query)
+    query = """
+        query($name: String) {
+          equal: allEditors(where: {name: {equal: $name}}) { edges { node { editorId } } }
+          notEqual: allEditors(where: {name: {notEqual: $name}}) { edges { node { editorId } } }
+        }
+    """
+
+    def editor_ids(result, field):
+        return [edge["node"]["editorId"] for edge in result.data[field]["edges"]]
+
+    result = schema.execute(query, variables={"name": None}, context_value={"session": session})
+    assert not result.errors
+    assert editor_ids(result, "equal") == ["4"]
+    assert editor_ids(result, "notEqual") == ["1", "2", "3"]
+
+    result = schema.execute(query, variables={"name": "editor2"}, context_value={"session": session})
+    assert not result.errors
+    assert editor_ids(result, "equal") == ["2"]
+    assert editor_ids(result, "notEqual") == ["1", "3"]
+
+    clause, params = compile_where_clause(EditorModel, {"name": {"equal": None}})
+    assert "IS NULL" in str(clause)
+    assert params == {}
+
+
+def test_baked_connection_and_node_queries(session):
+    add_editors(session)
+
+    class EditorNode(SQLAlchemyObjectType):
+        class Meta:
+            model = EditorModel
+            interfaces = (Node,)
+            baked_queries = True
+
+    class Query(graphene.ObjectType):
+        node = Node.Field()
+        all_editors = SQLAlchemyConnectionField(EditorNode._meta.connection)
+        filtered_editors = SQLAlchemyFilteredConnectionField(EditorNode)
+
+    schema = graphene.Schema(query=Query)
+    query = """
+        query($first: Int, $after: String, $name: String) {
+          allEditors(sort: NAME_DESC, first: $first, after: $after) {
+            edges { node { id name } }
+            pageInfo { hasNextPage }
+          }
+          filteredEditors(where: {name: {like: $name}}) { edges { node { name } } }
+        }
+    """
+    result = schema.execute(query, variables={"first": 2, "name": "1"}, context_value={"session": session})
+    assert not result.errors
+    assert pet_names(result, "allEditors") == ["editor5", "editor4"]
+    assert result.data["allEditors"]["pageInfo"]["hasNextPage"]
+    assert pet_names(result, "filteredEditors") == ["editor1"]
+    cached = len(bakery.cache)
+
+    variables = {"first": 2, "after": "YXJyYXljb25uZWN0aW9uOjI=", "name": "2"}
+    result = schema.execute(query, variables=variables, context_value={"session": session})
+    assert not result.errors
+    assert pet_names(result, "allEditors") == ["editor2", "editor1"]
+    assert not result.data["allEditors"]["pageInfo"]["hasNextPage"]
+    assert pet_names(result, "filteredEditors") == ["editor2"]
+    # only the bound values changed, so every statement came from the cache
+    assert len(bakery.cache) == cached
+
+    session.expunge_all()
+    result = schema.execute(
+        '{ node(id: "RWRpdG9yTm9kZToz") { ... on EditorNode { name } } }',
+        context_value={"session": session},
+    )
+    assert not result.errors
+    assert result.data["node"]["name"] == "editor3"
+
+
+def test_connection_result_cache(session):
+    add_editors(session)
+    set_result_cache(ResultCache(PickleCacheBackend()))
+
+    class EditorNode(SQLAlchemyObjectType):
+        class Meta:
+            model = EditorModel
+            interfaces = (Node,)
+            cache_ttl = 60
+
+    class Query(graphene.ObjectType):
+        all_editors = SQLAlchemyFilteredConnectionField(EditorNode)
+
+    schema = graphene.Schema(query=Query)
+    query = '{ allEditors(where: {name: {like: "editor"}}, first: 2) { edges { node { name } } pageInfo { hasNextPage } } }'
+    statements = capture_statements(session)
+    result = schema.execute(query, context_value={"session": session})
+    assert not result.errors
+    assert pet_names(result, "allEditors") == ["editor1", "editor2"]
+    assert len(statements) == 1
+
+    session.expunge_all()
+    result = schema.execute(query, context_value={"session": session})
+    assert not result.errors
+    assert pet_names(result, "allEditors") == ["editor1", "editor2"]
+    assert result.data["allEditors"]["pageInfo"]["hasNextPage"]
+    # served from the cache, the rows were merged into the session without a query
+    assert len(statements) == 1
+
+    session.query(EditorModel).get(1).name = "renamed"
+    session.commit()
+    del statements[:]
+    result = schema.execute(query, context_value={"session": session})
+    assert not result.errors
+    assert pet_names(result, "allEditors") == ["editor2", "editor3"]
+    assert len(statements) == 1
+
+
+def test_connection_result_cache_isolation(session):
+    add_editors(session)
+    backend = PickleCacheBackend()
+    set_result_cache(ResultCache(backend))
+
+    class EditorNode(SQLAlchemyObjectType):
+        class Meta:
+            model = EditorModel
+            interfaces = (Node,)
+            cache_ttl = 60
+
+    class OwnEditorsField(SQLAlchemyFilteredConnectionField):
+        @classmethod
+        def get_query(cls, model, info, **kwargs):
+            query = super(OwnEditorsField, cls).get_query(model, info, **kwargs)
+            return query.filter(EditorModel.editor_id <= info.context["max_id"])
+
+    class Query(graphene.ObjectType):
+        all_editors = OwnEditorsField(EditorNode)
+
+    schema = graphene.Schema(query=Query)
+    query = "{ allEditors { edges { node { name } } } }"
+    # queries scoped to the context do not share entries
+    result = schema.execute(query, context_value={"session": session, "max_id": 1})
+    assert pet_names(result, "allEditors") == ["editor1"]
+    result = schema.execute(query, context_value={"session": session, "max_id": 2})
+    assert pet_names(result, "allEditors") == ["editor1", "editor2"]
+
+    # changes flushed but not committed are not cached for other requests
+    backend.entries.clear()
+    session.query(EditorModel).get(1).name = "uncommitted"
+    session.flush()
+    result = schema.execute(query, context_value={"session": session, "max_id": 2})
+    assert pet_names(result, "allEditors") == ["uncommitted", "editor2"]
+    assert not backend.entries
+    session.commit()
+    result = schema.execute(query, context_value={"session": session, "max_id": 2})
+    assert pet_names(result, "allEditors") == ["uncommitted", "editor2"]
+    assert len(backend.entries) == 1
+
+
+def test_memory_cache_backend_eviction(monkeypatch):
+    backend = MemoryCacheBackend(maxsize=2)
+    backend.set("a", 1)
+    backend.set("b", 2)
+    assert backend.get("a") == 1
+    backend.set("c", 3)
+    # "b" was the least recently used entry
+    assert (backend.get("a"), backend.get("b"), backend.get("c")) == (1, None, 3)
+
+    backend.set("d", 4, ttl=10)
+    now = time.monotonic()
+    monkeypatch.setattr("time.monotonic", lambda: now + 11)
+    assert backend.get("d") is None
+
+
+def test_result_cache_key_is_canonical():
+    # load plan keys hold sets of column names, whose order depends on PYTHONHASHSEED
+    key = ("allPets", PetModel, frozenset(["id", "name", "pet_kind", "hair_kind"]), {"first": 2})
+    code = (
+        "from abc_graphene_sqlalchemy.caching import ResultCache\n"
+        "from abc_graphene_sqlalchemy.tests.models import Pet\n"
+        "print(ResultCache.make_key(('allPets', Pet, frozenset(['id', 'name', 'pet_kind', 'hair_kind']), "
+        "{'first': 2})))"
+    )
+    root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    keys = {
+        subprocess.check_output(
+            [sys.executable, "-c", code], cwd=root, env=dict(os.environ, PYTHONHASHSEED=str(seed))
+        ).decode().strip()
+        for seed in range(3)
+    }
+    assert keys == {ResultCache.make_key(key)}
+
+
+def test_filtered_connection_aggregates(session):
+    reporters = [ReporterModel(first_name="a"), ReporterModel(first_name="b")]
+    session.add_all(reporters)
+    session.flush()
+    for i in range(5):
+        session.add(ArticleModel(
+            headline="article{}".format(i + 1),
+            pub_date=datetime.date(2020, 1, i + 1),
+            reporter_id=reporters[i % 2].id,
+        ))
+    session.commit()
+    reporter_ids = [reporter.id for reporter in reporters]
+
+    class ArticleNode(SQLAlchemyObjectType):
+        class Meta:
+            model = ArticleModel
+            interfaces = (Node,)
+
+    class Query(graphene.ObjectType):
+        all_articles = SQLAlchemyFilteredConnectionField(ArticleNode, aggregates=True)
+
+    schema = graphene.Schema(query=Query)
+    statements = capture_statements(session)
+    result = schema.execute(
+        """{
+          allArticles(where: {headline: {notEqual: "article1"}}) {
+            aggregate(groupBy: [REPORTER_ID]) {
+              count
+              min { pubDate }
+              max { pubDate }
+              group { reporterId }
+            }
+          }
+        }""",
+        context_value={"session": session},
+    )
+    assert not result.errors
+    assert result.data["allArticles"]["aggregate"] == [
+        {"count": 2, "min": {"pubDate": "2020-01-03"}, "max": {"pubDate": "2020-01-05"},
+         "group": {"reporterId": reporter_ids[0]}},
+        {"count": 2, "min": {"pubDate": "2020-01-02"}, "max": {"pubDate": "2020-01-04"},
+         "group": {"reporterId": reporter_ids[1]}},
+    ]
+    # no page of articles was fetched
+    assert len(statements) == 1
+    assert "GROUP BY articles.reporter_id" in statements[0]
+
+    result = schema.execute(
+        "{ allArticles { edges { node { headline } } aggregate { count } } }",
+        context_value={"session": session},
+    )
+    assert not result.errors
+    assert len(result.data["allArticles"]["edges"]) == 5
+    assert result.data["allArticles"]["aggregate"] == [{"count": 5}]
+
+    # grouped values are selected along with the GROUP BY columns only
+    result = schema.execute(
+        "{ allArticles { aggregate(groupBy: [REPORTER_ID]) { count } } }",
+        context_value={"session": session},
+    )
+    assert not result.errors
+    assert [row["count"] for row in result.data["allArticles"]["aggregate"]] == [3, 2]
+    result = schema.execute(
+        "{ allArticles { aggregate { count group { headline } } } }",
+        context_value={"session": session},
+    )
+    assert "group selects headline which groupBy does not contain" in str(result.errors[0])
+
+    # without aggregates the connection type is left as it is
+    assert SQLAlchemyFilteredConnectionField(ArticleNode).type is ArticleNode._meta.connection
+    assert Query.all_articles.type.__name__ == "ArticleNodeAggregateConnection"
+
+
+def test_filtered_connection_sort(session):
+    add_editors(session)
+    session.add(EditorModel(editor_id=6, name="editor4"))
+    session.commit()
+
+    class EditorNode(SQLAlchemyObjectType):
+        class Meta:
+            model = EditorModel
+            interfaces = (Node,)
+
+    class Query(graphene.ObjectType):
+        all_editors = SQLAlchemyFilteredConnectionField(EditorNode)
+
+    schema = graphene.Schema(query=Query)
+    statements = capture_statements(session)
+    result = schema.execute(
+        '{ allEditors(sort: NAME_DESC, first: 3, where: {name: {notEqual: "editor5"}}) '
+        "{ edges { node { id name } } } }",
+        context_value={"session": session},
+    )
+    assert not result.errors
+    assert [edge["node"]["id"] for edge in result.data["allEditors"]["edges"]] == [
+        "RWRpdG9yTm9kZTo2", "RWRpdG9yTm9kZTo0", "RWRpdG9yTm9kZToz",
+    ]
+    assert any("ORDER BY editors.name DESC, editors.editor_id DESC" in statement for statement in statements)
+
+    result = schema.execute("{ allEditors(first: 2) { edges { node { name } } } }", context_value={"session": session})
+    assert not result.errors
+    assert pet_names(result, "allEditors") == ["editor1", "editor2"]
+
+
+def test_filtered_connection_relationship_filters(session):
+    reporters = [ReporterModel(first_name="a"), ReporterModel(first_name="b")]
+    session.add_all(reporters)
+    session.add_all([
+        ArticleModel(headline="first", reporter=reporters[0]),
+        ArticleModel(headline="second", reporter=reporters[1]),
+        ArticleModel(headline="third", reporter=reporters[1]),
+    ])
+    session.add_all([
+        PetModel(name="dog", pet_kind="dog", hair_kind=HairKind.LONG, reporters=[reporters[0]]),
+        PetModel(name="cat", pet_kind="cat", hair_kind=HairKind.LONG, reporters=[reporters[0]]),
+        PetModel(name="other dog", pet_kind="dog", hair_kind=HairKind.LONG, reporters=[reporters[1]]),
+    ])
+    session.commit()
+
+    class ArticleNode(SQLAlchemyObjectType):
+        class Meta:
+            model = ArticleModel
+            interfaces = (Node,)
+
+    class PetNode(SQLAlchemyObjectType):
+        class Meta:
+            model = PetModel
+            interfaces = (Node,)
+
+    class Query(graphene.ObjectType):
+        all_articles = SQLAlchemyFilteredConnectionField(ArticleNode)
+        all_pets = SQLAlchemyFilteredConnectionField(PetNode)
+
+    schema = graphene.Schema(query=Query)
+    statements = capture_statements(session)
+    result = schema.execute(
+        '{ allArticles(where: {reporter: {firstName: {equal: "b"}}}) { edges { node { headline } } } }',
+        context_value={"session": session},
+    )
+    assert not result.errors
+    assert [edge["node"]["headline"] for edge in result.data["allArticles"]["edges"]] == ["second", "third"]
+    assert len(statements) == 1
+    assert "EXISTS (SELECT 1" in statements[0]
+
+    result = schema.execute(
+        """{
+          allPets(where: {reporters: {articles: {headline: {equal: "first"}}}, petKind: {equal: DOG}}) {
+            edges { node { name } }
+          }
+        }""",
+        context_value={"session": session},
+    )
+    assert not result.errors
+    assert pet_names(result) == ["dog"]
+
+
+def test_filtered_connection_string_operators(session):
+    add_editors(session)
+    session.add(EditorModel(editor_id=6, name="Editor_%"))
+    session.commit()
+
+    class EditorNode(SQLAlchemyObjectType):
+        class Meta:
+            model = EditorModel
+            interfaces = (Node,)
+
+    class Query(graphene.ObjectType):
+        all_editors = SQLAlchemyFilteredConnectionField(EditorNode)
+
+    schema = graphene.Schema(query=Query)
+    query = "query($where: EditorFilter) { allEditors(where: $where) { edges { node { name } } } }"
+
+    def names(where):
+        result = schema.execute(query, variables={"where": where}, context_value={"session": session})
+        assert not result.errors
+        return pet_names(result, "allEditors")
+
+    assert names({"name": {"startsWith": "editor2"}}) == ["editor2"]
+    # wildcards in the prefix are matched literally
+    assert names({"name": {"startsWith": "Editor_%"}}) == ["Editor_%"]
+    assert names({"name": {"iEqual": "EDITOR_%"}}) == ["Editor_%"]
+    assert names({"name": {"ilike": "%OR3"}}) == ["editor3"]
+    # a null operand does not filter
+    assert len(names({"name": {"startsWith": None}})) == 6
+    assert names({"name": {"iEqual": None}, "editorId": {"equal": 2}}) == ["editor2"]
+    assert names({"name": {"ilike": None}, "editorId": {"between": None}, "or": {"editorId": {"equal": 3}}}) == [
+        "editor3"
+    ]
+
+
+def test_case_insensitive_collation_skips_lower():
+    def compile_filter(operator, column):
+        return str(FILTER_OPERATORS[operator](column, "a").compile())
+
+    assert compile_filter("iEqual", Column("name", String(30))) == "lower(name) = lower(:lower_1)"
+    assert compile_filter("iEqual", Column("name", String(30, collation="NOCASE"))) == "name = :name_1"
+    assert compile_filter("like", Column("name", String(30), info={"case_insensitive": True})) == "name LIKE :name_1"
+
+
+def test_filtered_connection_range_and_null_operators(session):
+    for i in range(5):
+        session.add(ArticleModel(
+            id=i + 1,
+            headline="article{}".format(i + 1),
+            pub_date=datetime.date(2020, 1, i + 1) if i else None,
+        ))
+    session.commit()
+
+    class ArticleNode(SQLAlchemyObjectType):
+        class Meta:
+            model = ArticleModel
+            interfaces = (Node,)
+
+    class Query(graphene.ObjectType):
+        all_articles = SQLAlchemyFilteredConnectionField(ArticleNode)
+
+    schema = graphene.Schema(query=Query)
+    query = "query($where: ArticleFilter) { allArticles(where: $where) { edges { node { headline } } } }"
+    statements = capture_statements(session)
+
+    def headlines(where):
+        result = schema.execute(query, variables={"where": where}, context_value={"session": session})
+        assert not result.errors
+        return [edge["node"]["headline"] for edge in result.data["allArticles"]["edges"]]
+
+    assert headlines({"pubDate": {"between": ["2020-01-02", "2020-01-04"]}}) == ["article2", "article3", "article4"]
+    assert any("articles.pub_date BETWEEN ? AND ?" in statement for statement in statements)
+    assert headlines({"id": {"greaterThanOrEqual": 4}}) == ["article4", "article5"]
+    assert headlines({"id": {"lessThanOrEqual": 2}}) == ["article1", "article2"]
+    assert headlines({"pubDate": {"isNull": True}}) == ["article1"]
+    assert headlines({"pubDate": {"isNull": False}, "id": {"lessThan": 3}}) == ["article2"]
+    # a null operand does not filter
+    assert headlines({"pubDate": {"isNull": None}, "id": {"lessThan": 3}}) == ["article1", "article2"]
+    assert headlines({"pubDate": {"between": None}, "id": {"lessThan": 3}}) == ["article1", "article2"]
+    assert headlines({"id": {"lessThanOrEqual": None}, "pubDate": {"greaterThanOrEqual": "2020-01-04"}}) == [
+        "article4", "article5"
+    ]
+    assert headlines({"pubDate": {"greaterThanOrEqual": None}, "id": {"lessThanOrEqual": 2}}) == [
+        "article1", "article2"
+    ]
+    assert headlines({"pubDate": {"lessThan": None}, "id": {"greaterThan": 3}}) == ["article4", "article5"]
+
+    result = schema.execute(
+        query, variables={"where": {"id": {"between": [1]}}}, context_value={"session": session}
+    )
+    assert result.errors
+
+
+def test_filtered_connection_large_in_lists(session):
+    add_editors(session)
+
+    class EditorNode(SQLAlchemyObjectType):
+        class Meta:
+            model = EditorModel
+            interfaces = (Node,)
+
+    class Query(graphene.ObjectType):
+        all_editors = SQLAlchemyFilteredConnectionField(EditorNode)
+
+    schema = graphene.Schema(query=Query)
+    query = "query($ids: [ID]) { allEditors(where: {editorId: {in: $ids}}) { edges { node { name } } } }"
+    statements = capture_statements(session)
+    ids = [2, 4] + list(range(1000, 1000 + LARGE_IN_THRESHOLD))
+    result = schema.execute(query, variables={"ids": ids}, context_value={"session": session})
+    assert not result.errors
+    assert pet_names(result, "allEditors") == ["editor2", "editor4"]
+    assert any("IN (SELECT value FROM json_each(?))" in statement for statement in statements)
+
+    result = schema.execute(query, variables={"ids": [3]}, context_value={"session": session})
+    assert not result.errors
+    assert pet_names(result, "allEditors") == ["editor3"]
+
+
+def test_large_in_list_dialects():
+    column = Column("id", Integer)
+    clause = FILTER_OPERATORS["largeIn"](column, [1, 2, 3])
+    assert str(clause.compile(dialect=postgresql.dialect())).startswith("id = ANY (%(param_")
+    compiled = clause.compile(dialect=mysql.dialect())
+    assert str(compiled) == "id IN ([EXPANDING_param_1])"
+    assert compiled.params == {"param_1": [1, 2, 3]}
+
+    # ``ID`` filter values arrive as strings and are bound with the type of the column
+    clause = FILTER_OPERATORS["largeIn"](column, ["2", "4"])
+    for dialect, expected in ((postgresql.dialect(), [2, 4]), (sqlite.dialect(), "[2, 4]")):
+        values = clause.values
+        assert values.type.process_bind_param(values.value, dialect) == expected
+
+
+def test_large_in_list_fallback_execution():
+    # a SQLite engine posing as another dialect executes the expanding IN fallback
+    engine = create_engine("sqlite://")
+    engine.dialect.name = "other"
+    table = Table("numbers", MetaData(), Column("id", Integer), Column("name", String))
+    table.create(engine)
+    engine.execute(table.insert(), [{"id": i, "name": str(i)} for i in range(5)])
+
+    def select_ids(column, values):
+        rows = engine.execute(select([table.c.id]).where(FILTER_OPERATORS["largeIn"](column, values)))
+        return sorted(row.id for row in rows)
+
+    assert select_ids(table.c.id, ["2", 4]) == [2, 4]
+    assert select_ids(table.c.name, ["12", "3"]) == [3]
+
+
+def test_filtered_connection_full_text_search(session):
+    Base = declarative_base()
+
+    class Document(Base):
+        __tablename__ = "documents"
+        id = Column(Integer, primary_key=True)
+        body = Column(String)
+        body_vector = Column(TSVectorType("body").with_variant(String, "sqlite"))
+
+    Base.metadata.create_all(session.get_bind())
+    session.execute("CREATE VIRTUAL TABLE documents_fts USING fts5(body)")
+    bodies = ["graphql over sql", "sql sql sql and graphql", "nothing to see", "graph theory"]
+    for i, body in enumerate(bodies):
+        session.add(Document(id=i + 1, body=body))
+        session.execute("INSERT INTO documents_fts (rowid, body) VALUES (:id, :body)", {"id": i + 1, "body": body})
+    session.commit()
+
+    class DocumentNode(SQLAlchemyObjectType):
+        class Meta:
+            model = Document
+            interfaces = (Node,)
+
+    class Query(graphene.ObjectType):
+        documents = SQLAlchemyFilteredConnectionField(DocumentNode, aggregates=True)
+
+    schema = graphene.Schema(query=Query)
+    query = """
+        query($search: String, $rank: Boolean) {
+          documents(search: $search, searchRank: $rank) { edges { node { body } } }
+        }
+    """
+
+    def bodies_for(search, rank=False):
+        result = schema.execute(query, variables={"search": search, "rank": rank}, context_value={"session": session})
+        assert not result.errors
+        return [edge["node"]["body"] for edge in result.data["documents"]["edges"]]
+
+    assert bodies_for("graphql sql") == ["graphql over sql", "sql sql sql and graphql"]
+    assert bodies_for("sql", rank=True) == ["sql sql sql and graphql", "graphql over sql"]
+    # FTS5 syntax in the term is matched literally
+    assert bodies_for('graph OR "theory') == []
+
+    # aggregates count the rows matching the search, like the edges
+    result = schema.execute(
+        '{ documents(search: "sql") { aggregate { count } } }', context_value={"session": session}
+    )
+    assert not result.errors
+    assert result.data["documents"]["aggregate"] == [{"count": 2}]
+    assert "search" not in SQLAlchemyFilteredConnectionField(Editor).args
+
+
+def test_full_text_search_postgresql():
+    column = Column("body_vector", TSVectorType("body", regconfig="pg_catalog.english"))
+    Table("documents", MetaData(), Column("id", Integer, primary_key=True), column)
+    match, rank = SearchMatch(column, search_term("term")), SearchRank(column, search_term("term"))
+    assert str(match.compile(dialect=postgresql.dialect())).startswith(
+        "documents.body_vector @@ plainto_tsquery('pg_catalog.english', %(param_"
+    )
+    assert str(rank.compile(dialect=postgresql.dialect())).startswith("ts_rank(documents.body_vector, plainto_tsquery(")
@@ -0,0 +1,247 @@
+import graphene
+from graphene.relay import Connection, Node
+from sqlalchemy import event
+
+from .models import Article, Reporter
+from ..fields import SQLAlchemyConnectionField, UnsortedSQLAlchemyConnectionField
+from ..types import SQLAlchemyObjectType
+
+
+def add_test_data(session):
+    for i in range(3):
+        reporter = Reporter(first_name="Reporter_{}".format(i))
+        session.add(reporter)
+        for j in range(2):
+            article = Article(headline="Article_{}_{}".format(i, j))
+            article.reporter = reporter
+            session.add(article)
+    session.commit()
+    session.expunge_all()
+
+
+def capture_selects(session):
+    statements = []
+
+    @event.listens_for(session.get_bind(), "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("SELECT"):
+            statements.append(statement)
+
+    return statements
+
+
+def get_schema(reporter_policy="auto", article_policy="auto"):
+    class ReporterType(SQLAlchemyObjectType):
+        class Meta:
+            model = Reporter
+            interfaces = (Node,)
+            exclude_fields = ("composite_prop",)
+            eager_loading = reporter_policy
+
+    class ArticleType(SQLAlchemyObjectType):
+        class Meta:
+            model = Article
+            interfaces = (Node,)
+            eager_loading = article_policy
+
+    class ArticleConnection(Connection):
+        class Meta:
+            node = ArticleType
+
+    class Query(graphene.ObjectType):
+        node = Node.Field()
+        articles = SQLAlchemyConnectionField(ArticleConnection)
+
+    return graphene.Schema(query=Query)
+
+
+NESTED_QUERY = """
+    query {
+      articles {
+        edges {
+          node {
+            headline
+            ...ArticleReporter
+          }
+        }
+      }
+    }
+
+    fragment ArticleReporter on ArticleType {
+      reporter {
+        firstName
+        articles { edges { node { headline } } }
+      }
+    }
+"""
+
+
+def test_connection_plans_eager_loads(session):
+    add_test_data(session)
+    schema = get_schema()
+    statements = capture_selects(session)
+    result = schema.execute(NESTED_QUERY, context_value={"session": session})
+    assert not result.errors
+    edges = result.data["articles"]["edges"]
+    assert len(edges) == 6
+    assert len(edges[0]["node"]["reporter"]["articles"]["edges"]) == 2
+    # articles joined to their reporters, then the reporters' articles in one IN query
+    assert len(statements) == 2
+    assert "JOIN reporters" in statements[0]
+    assert " IN (" in statements[1]
+
+
+def test_eager_loading_per_field_policy(session):
+    add_test_data(session)
+    schema = get_schema(reporter_policy=None, article_policy={"reporter": "selectin"})
+    statements = capture_selects(session)
+    result = schema.execute(NESTED_QUERY, context_value={"session": session})
+    assert not result.errors
+    # reporters are selectin loaded, their articles lazily loaded one by one
+    assert len(statements) == 2 + 3
+    assert "JOIN" not in statements[0]
+
+
+def test_eager_loading_disabled(session):
+    add_test_data(session)
+    schema = get_schema(reporter_policy=None, article_policy=None)
+    statements = capture_selects(session)
+    result = schema.execute(NESTED_QUERY, context_value={"session": session})
+    assert not result.errors
+    assert len(statements) == 1 + 3 + 3
+
+
+def test_node_plans_eager_loads(session):
+    add_test_data(session)
+    schema = get_schema()
+    statements = capture_selects(session)
+    result = schema.execute(
+        """
+        query {
+          node(id: "QXJ0aWNsZVR5cGU6MQ==") {
+            ... on ArticleType {
+              headline
+              reporter { firstName }
+            }
+          }
+        }
+        """,
+        context_value={"session": session},
+    )
+    assert not result.errors
+    assert result.data["node"]["reporter"]["firstName"] == "Reporter_0"
+    assert len(statements) == 1
+
+
+def test_connection_loads_only_selected_columns(session):
+    add_test_data(session)
+    schema = get_schema()
+    statements = capture_selects(session)
+    result = schema.execute(
+        "{ articles(sort: PUB_DATE_DESC) { edges { node { headline reporter { firstName } } } } }",
+        context_value={"session": session},
+    )
+    assert not result.errors
+    assert len(statements) == 1
+    # the primary key, the foreign key of the relationship and the sort column are kept
+    assert "articles.id" in statements[0]
+    assert "articles.reporter_id" in statements[0]
+    assert "articles.pub_date" in statements[0]
+    assert "reporters_1.first_name" in statements[0]
+    assert "reporters_1.email" not in statements[0]
+
+    statements[:] = []
+    result = schema.execute("{ articles { edges { node { headline } } } }", context_value={"session": session})
+    assert not result.errors
+    assert "articles.pub_date" not in statements[0]
+
+
+def test_unknown_fields_keep_all_columns(session):
+    add_test_data(session)
+
+    class ReporterType(SQLAlchemyObjectType):
+        class Meta:
+            model = Reporter
+            interfaces = (Node,)
+            exclude_fields = ("composite_prop",)
+
+        full_name = graphene.String()
+
+        def resolve_full_name(self, info):
+            return "{} {}".format(self.first_name, self.last_name)
+
+    class ReporterConnection(Connection):
+        class Meta:
+            node = ReporterType
+
+    class Query(graphene.ObjectType):
+        reporters = UnsortedSQLAlchemyConnectionField(ReporterConnection)
+
+    schema = graphene.Schema(query=Query)
+    statements = capture_selects(session)
+    result = schema.execute("{ reporters { edges { node { fullName } } } }", context_value={"session": session})
+    assert not result.errors
+    assert len(statements) == 1
+    assert "reporters.last_name" in statements[0]
+
+
+def test_custom_relationship_resolver_keeps_all_columns(session):
+    add_test_data(session)
+
+    class ReporterType(SQLAlchemyObjectType):
+        class Meta:
+            model = Reporter
+            interfaces = (Node,)
+            exclude_fields = ("composite_prop",)
+
+        def resolve_articles(self, info, **args):
+            return [article for article in self.articles if self.email is None]
+
+    class ArticleType(SQLAlchemyObjectType):
+        class Meta:
+            model = Article
+            interfaces = (Node,)
+
+    class ReporterConnection(Connection):
+        class Meta:
+            node = ReporterType
+
+    class Query(graphene.ObjectType):
+        reporters = UnsortedSQLAlchemyConnectionField(ReporterConnection)
+
+    schema = graphene.Schema(query=Query)
+    statements = capture_selects(session)
+    result = schema.execute(
+        "{ reporters { edges { node { firstName articles { edges { node { headline } } } } } } }",
+        context_value={"session": session},
+    )
+    assert not result.errors
+    assert len(result.data["reporters"]["edges"][0]["node"]["articles"]["edges"]) == 2
+    # the reporters and their articles; reading ``email`` does not load each row again
+    assert "reporters.email" in statements[0]
+    assert len(statements) == 2
+
+
+def test_get_node_from_other_type_loads_all_columns(session):
+    add_test_data(session)
+
+    class ReporterType(SQLAlchemyObjectType):
+        class Meta:
+            model = Reporter
+            interfaces = (Node,)
+            exclude_fields = ("composite_prop",)
+
+    class Query(graphene.ObjectType):
+        reporter_name = graphene.String()
+
+        def resolve_reporter_name(self, info):
+            # the selection of this field says nothing about the reporter
+            reporter = ReporterType.get_node(info, 1)
+            return "{} {} {}".format(reporter.first_name, reporter.last_name, reporter.email)
+
+    schema = graphene.Schema(query=Query)
+    statements = capture_selects(session)
+    result = schema.execute("{ reporterName }", context_value={"session": session})
+    assert not result.errors
+    assert result.data["reporterName"] == "Reporter_0 None None"
+    assert len(statements) == 1
@@ -355,3 +355,561 @@ def test_mutation(session):
     assert not result.errors
     result = to_std_dicts(result.data)
     assert result == expected
+
+
+def test_bulk_mutations(session):
+    from sqlalchemy import event
+
+    from ..types import SQLAlchemyMutation
+
+    class ArticleType(SQLAlchemyObjectType):
+        class Meta:
+            model = Article
+
+    class CreateArticles(SQLAlchemyMutation):
+        class Meta:
+            model = Article
+            create = True
+            bulk = True
+            only_fields = ("headline",)
+
+    class UpdateArticles(SQLAlchemyMutation):
+        class Meta:
+            model = Article
+            bulk = True
+            only_fields = ("headline", "pub_date")
+
+    class DeleteArticles(SQLAlchemyMutation):
+        class Meta:
+            model = Article
+            delete = True
+            bulk = True
+
+    class Query(graphene.ObjectType):
+        articles = graphene.List(ArticleType)
+
+    class Mutation(graphene.ObjectType):
+        create_articles = CreateArticles.Field()
+        update_articles = UpdateArticles.Field()
+        delete_articles = DeleteArticles.Field()
+
+    schema = graphene.Schema(query=Query, mutation=Mutation)
+    statements = []
+
+    @event.listens_for(session.get_bind(), "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement.split()[0])
+
+    result = schema.execute(
+        'mutation { createArticles(inputs: [{headline: "c"}, {headline: "a"}, {headline: "b"}]) { id headline } }',
+        context_value={"session": session},
+    )
+    assert not result.errors
+    articles = result.data["createArticles"]
+    assert [article["headline"] for article in articles] == ["c", "a", "b"]
+    ids = [article["id"] for article in articles]
+    # the rows are read back with a single query
+    assert statements.count("SELECT") == 1
+
+    del statements[:]
+    result = schema.execute(
+        """mutation($ids: [ID!]!) {
+          same: updateArticles(inputs: [{id: 1, headline: "x"}, {id: 2, headline: "x"}]) { headline }
+          different: updateArticles(inputs: [{id: 2, headline: "y"}, {id: 3, headline: "z"}, {id: 99, headline: "w"}]) {
+            headline
+          }
+          deleteArticles(ids: $ids) { headline }
+        }""",
+        variables={"ids": [ids[2], 99]},
+        context_value={"session": session},
+    )
+    assert not result.errors
+    assert to_std_dicts(result.data) == {
+        "same": [{"headline": "x"}, {"headline": "x"}],
+        "different": [{"headline": "y"}, {"headline": "z"}, None],
+        "deleteArticles": [{"headline": "z"}, None],
+    }
+    # one UPDATE ... WHERE id IN, one executemany UPDATE and one executemany DELETE
+    assert [statement for statement in statements if statement != "SELECT"] == ["UPDATE", "UPDATE", "DELETE"]
+    assert [article.headline for article in session.query(Article).order_by(Article.id)] == ["x", "y"]
+
+
+def test_upsert_mutations(session):
+    from ..types import SQLAlchemyMutation
+
+    add_test_data(session)
+
+    class EditorType(SQLAlchemyObjectType):
+        class Meta:
+            model = Editor
+
+    class UpsertEditor(SQLAlchemyMutation):
+        class Meta:
+            model = Editor
+            upsert = True
+
+    class UpsertEditors(SQLAlchemyMutation):
+        class Meta:
+            model = Editor
+            upsert = True
+            bulk = True
+
+    class Query(graphene.ObjectType):
+        editors = graphene.List(EditorType)
+
+    class Mutation(graphene.ObjectType):
+        upsert_editor = UpsertEditor.Field()
+        upsert_editors = UpsertEditors.Field()
+
+    schema = graphene.Schema(query=Query, mutation=Mutation)
+    editor_id = session.query(Editor).one().editor_id
+    result = schema.execute(
+        """mutation($id: ID!) {
+          upsertEditor(input: {editorId: $id, name: "Jill"}) { name }
+          upsertEditors(inputs: [{editorId: 10, name: "Joe"}, {editorId: $id, name: "Jen"}]) { editorId name }
+        }""",
+        variables={"id": editor_id},
+        context_value={"session": session},
+    )
+    assert not result.errors
+    assert to_std_dicts(result.data) == {
+        "upsertEditor": {"name": "Jill"},
+        "upsertEditors": [{"editorId": "10", "name": "Joe"}, {"editorId": str(editor_id), "name": "Jen"}],
+    }
+    assert [editor.name for editor in session.query(Editor).order_by(Editor.editor_id)] == ["Jen", "Joe"]
+
+
+def test_upsert_dialects():
+    from sqlalchemy import Column, Integer, MetaData, String, Table
+    from sqlalchemy.dialects import mysql, postgresql, sqlite
+
+    from ..expressions import Upsert
+
+    table = Table("users", MetaData(), Column("id", Integer, primary_key=True), Column("name", String))
+    statement = Upsert(table, [{"id": 1, "name": "a"}], index_elements=["id"], update_columns=["name"])
+    assert str(statement.compile(dialect=sqlite.dialect())).endswith(
+        "ON CONFLICT (id) DO UPDATE SET name = excluded.name"
+    )
+    assert str(statement.compile(dialect=postgresql.dialect())).endswith(
+        "ON CONFLICT (id) DO UPDATE SET name = excluded.name"
+    )
+    assert str(statement.compile(dialect=mysql.dialect())).endswith("ON DUPLICATE KEY UPDATE name = VALUES(name)")
+
+
+def test_direct_update_and_delete_mutations(session):
+    from sqlalchemy import event
+
+    from ..types import SQLAlchemyMutation
+
+    add_test_data(session)
+
+    class ArticleType(SQLAlchemyObjectType):
+        class Meta:
+            model = Article
+
+    class UpdateArticle(SQLAlchemyMutation):
+        class Meta:
+            model = Article
+            only_fields = ("headline",)
+
+    class DeleteArticle(SQLAlchemyMutation):
+        class Meta:
+            model = Article
+            delete = True
+
+    class Query(graphene.ObjectType):
+        articles = graphene.List(ArticleType)
+
+    class Mutation(graphene.ObjectType):
+        update_article = UpdateArticle.Field()
+        delete_article = DeleteArticle.Field()
+
+    schema = graphene.Schema(query=Query, mutation=Mutation)
+    article_id = session.query(Article).one().id
+    session.expunge_all()
+    statements = []
+
+    @event.listens_for(session.get_bind(), "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement.split()[0])
+
+    def execute(query):
+        del statements[:]
+        result = schema.execute(query % article_id, context_value={"session": session})
+        assert not result.errors
+        return to_std_dicts(result.data)
+
+    # the output only needs columns set by the input, so the row is never loaded
+    assert execute('mutation { updateArticle(id: %s, input: {headline: "New"}) { id headline } }') == {
+        "updateArticle": {"id": str(article_id), "headline": "New"},
+    }
+    assert statements == ["UPDATE"]
+    assert execute('mutation { updateArticle(id: %s, input: {headline: "Newer"}) { reporterId } }') == {
+        "updateArticle": {"reporterId": 1},
+    }
+    assert statements == ["UPDATE", "SELECT"]
+    assert execute('mutation { deleteArticle(id: %s) { headline } }') == {"deleteArticle": {"headline": "Newer"}}
+    assert statements == ["SELECT", "DELETE"]
+    assert execute('mutation { deleteArticle(id: %s) { id } }') == {"deleteArticle": None}
+    assert statements == ["DELETE"]
+    assert session.query(Article).count() == 0
+
+
+def test_direct_writes_skip_models_with_orm_hooks(session):
+    from sqlalchemy import Column, Integer, String, event
+    from sqlalchemy.ext.declarative import declarative_base
+    from sqlalchemy.orm import validates
+
+    from ..types import SQLAlchemyMutation
+
+    Base = declarative_base()
+
+    class Tag(Base):
+        __tablename__ = "tags"
+        id = Column(Integer, primary_key=True)
+        name = Column(String)
+
+        @validates("name")
+        def validate_name(self, key, value):
+            return value.strip().lower()
+
+    deleted = []
+    event.listen(Tag, "before_delete", lambda mapper, connection, target: deleted.append(target.id))
+    Base.metadata.create_all(session.get_bind())
+    session.add(Tag(id=1, name="graphql"))
+    session.commit()
+
+    class TagType(SQLAlchemyObjectType):
+        class Meta:
+            model = Tag
+
+    class UpdateTag(SQLAlchemyMutation):
+        class Meta:
+            model = Tag
+
+    class DeleteTag(SQLAlchemyMutation):
+        class Meta:
+            model = Tag
+            delete = True
+
+    class Query(graphene.ObjectType):
+        tags = graphene.List(TagType)
+
+    class Mutation(graphene.ObjectType):
+        update_tag = UpdateTag.Field()
+        delete_tag = DeleteTag.Field()
+
+    schema = graphene.Schema(query=Query, mutation=Mutation)
+    result = schema.execute(
+        'mutation { updateTag(id: 1, input: {name: "  SQLAlchemy "}) { name } }', context_value={"session": session}
+    )
+    assert not result.errors
+    # the update goes through the ORM, which runs the validator
+    assert result.data["updateTag"] == {"name": "sqlalchemy"}
+    session.expire_all()
+    assert session.query(Tag.name).scalar() == "sqlalchemy"
+
+    result = schema.execute("mutation { deleteTag(id: 1) { id } }", context_value={"session": session})
+    assert not result.errors
+    assert deleted == [1]
+    assert session.query(Tag).count() == 0
+
+
+def test_bulk_writes_skip_models_with_orm_hooks(session):
+    from sqlalchemy import Column, Integer, String, event
+    from sqlalchemy.ext.declarative import declarative_base
+    from sqlalchemy.orm import validates
+
+    from ..types import SQLAlchemyMutation
+
+    Base = declarative_base()
+
+    class Label(Base):
+        __tablename__ = "labels"
+        id = Column(Integer, primary_key=True)
+        name = Column(String)
+
+        @validates("name")
+        def validate_name(self, key, value):
+            return value.strip().lower()
+
+    inserted = []
+    event.listen(Label, "after_insert", lambda mapper, connection, target: inserted.append(target.name))
+    Base.metadata.create_all(session.get_bind())
+
+    class LabelType(SQLAlchemyObjectType):
+        class Meta:
+            model = Label
+
+    class CreateLabels(SQLAlchemyMutation):
+        class Meta:
+            model = Label
+            create = True
+            bulk = True
+
+    class UpdateLabels(SQLAlchemyMutation):
+        class Meta:
+            model = Label
+            bulk = True
+
+    class Query(graphene.ObjectType):
+        labels = graphene.List(LabelType)
+
+    class Mutation(graphene.ObjectType):
+        create_labels = CreateLabels.Field()
+        update_labels = UpdateLabels.Field()
+
+    schema = graphene.Schema(query=Query, mutation=Mutation)
+    result = schema.execute(
+        'mutation { createLabels(inputs: [{name: " A "}, {name: "B"}]) { name } }',
+        context_value={"session": session},
+    )
+    assert not result.errors
+    # the rows go through the ORM, which runs the validator and the insert events
+    assert result.data["createLabels"] == [{"name": "a"}, {"name": "b"}]
+    assert inserted == ["a", "b"]
+
+    result = schema.execute(
+        'mutation { updateLabels(inputs: [{id: 1, name: " X "}, {id: 2, name: "Y"}]) { name } }',
+        context_value={"session": session},
+    )
+    assert not result.errors
+    assert result.data["updateLabels"] == [{"name": "x"}, {"name": "y"}]
+    session.expire_all()
+    assert [name for name, in session.query(Label.name).order_by(Label.id)] == ["x", "y"]
+
+
+def test_where_mutations(session):
+    from sqlalchemy import event
+
+    from ..types import SQLAlchemyAutoMutationFactory
+
+    add_test_data(session)
+    reporter = session.query(Reporter).filter_by(first_name="Jane").one()
+    session.add_all([Article(headline="a", reporter=reporter), Article(headline="b", reporter=reporter)])
+    session.commit()
+
+    class ArticleType(SQLAlchemyObjectType):
+        class Meta:
+            model = Article
+
+    class Query(graphene.ObjectType):
+        articles = graphene.List(ArticleType)
+
+    class Mutation(SQLAlchemyAutoMutationFactory):
+        class Meta:
+            models = (Article,)
+
+    schema = graphene.Schema(query=Query, mutation=Mutation)
+    statements = []
+
+    @event.listens_for(session.get_bind(), "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement.split()[0])
+
+    result = schema.execute(
+        """mutation {
+          updateArticlesWhere(where: {reporter: {firstName: {equal: "Jane"}}}, input: {headline: "Jane's"})
+        }""",
+        context_value={"session": session},
+    )
+    assert not result.errors
+    assert result.data == {"updateArticlesWhere": 2}
+    assert statements == ["UPDATE"]
+
+    result = schema.execute(
+        'mutation { deleteArticlesWhere(where: {headline: {notEqual: "Jane\'s"}}) }',
+        context_value={"session": session},
+    )
+    assert not result.errors
+    assert result.data == {"deleteArticlesWhere": 1}
+    assert statements == ["UPDATE", "DELETE"]
+    assert [article.headline for article in session.query(Article)] == ["Jane's", "Jane's"]
+
+
+def test_where_update_of_one_column(session):
+    from ..types import SQLAlchemyAutoMutationFactory
+
+    add_test_data(session)
+
+    class PetType(SQLAlchemyObjectType):
+        class Meta:
+            model = Pet
+
+    class Query(graphene.ObjectType):
+        pets = graphene.List(PetType)
+
+    class Mutation(SQLAlchemyAutoMutationFactory):
+        class Meta:
+            models = (Pet,)
+
+    schema = graphene.Schema(query=Query, mutation=Mutation)
+    assert "!" not in str(schema.get_type("UpdatePetWhereInput").fields["petKind"].type)
+    result = schema.execute(
+        'mutation { updatePetsWhere(where: {name: {equal: "Lassie"}}, input: {name: "Rex"}) }',
+        context_value={"session": session},
+    )
+    assert not result.errors
+    assert result.data == {"updatePetsWhere": 1}
+    session.expire_all()
+    pets = [(pet.name, pet.pet_kind, pet.hair_kind) for pet in session.query(Pet).order_by(Pet.id)]
+    assert pets == [("Garfield", "cat", HairKind.SHORT), ("Rex", "dog", HairKind.LONG)]
+
+
+def test_nested_relationship_references(session):
+    from sqlalchemy import event
+
+    from ..types import SQLAlchemyMutation
+
+    add_test_data(session)
+    john, jane = [reporter.id for reporter in session.query(Reporter).order_by(Reporter.id)]
+    session.expunge_all()
+
+    class ArticleType(SQLAlchemyObjectType):
+        class Meta:
+            model = Article
+
+    class CreateArticles(SQLAlchemyMutation):
+        class Meta:
+            model = Article
+            create = True
+            bulk = True
+            relationship_references = True
+
+    class UpdateArticle(SQLAlchemyMutation):
+        class Meta:
+            model = Article
+            relationship_references = True
+
+    class Query(graphene.ObjectType):
+        articles = graphene.List(ArticleType)
+
+    class Mutation(graphene.ObjectType):
+        create_articles = CreateArticles.Field()
+        update_article = UpdateArticle.Field()
+
+    schema = graphene.Schema(query=Query, mutation=Mutation)
+    statements = []
+
+    @event.listens_for(session.get_bind(), "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("SELECT") and "FROM reporters" in statement:
+            statements.append(statement)
+
+    result = schema.execute(
+        """mutation($john: ID!, $jane: ID!) {
+          createArticles(inputs: [
+            {headline: "a", reporter: {id: $john}},
+            {headline: "b", reporter: {id: $jane}},
+            {headline: "c", reporter: {id: $john}}
+          ]) { headline reporterId }
+        }""",
+        variables={"john": john, "jane": jane},
+        context_value={"session": session},
+    )
+    assert not result.errors
+    assert to_std_dicts(result.data["createArticles"]) == [
+        {"headline": "a", "reporterId": john},
+        {"headline": "b", "reporterId": jane},
+        {"headline": "c", "reporterId": john},
+    ]
+    # both reporters were loaded with one IN query
+    assert len(statements) == 1
+
+    article_id = session.query(Article).filter_by(headline="Hi!").one().id
+    result = schema.execute(
+        'mutation { updateArticle(id: %s, input: {reporter: {id: 999}}) { headline } }' % article_id,
+        context_value={"session": session},
+    )
+    assert result.errors and "Reporter 999 does not exist" in str(result.errors[0])
+
+
+def test_query_stats_and_budget(session):
+    from ..instrumentation import QueryStatsMiddleware, add_query_stats, track_query_stats
+
+    add_test_data(session)
+
+    class EditorType(SQLAlchemyObjectType):
+        class Meta:
+            model = Editor
+
+    class Query(graphene.ObjectType):
+        editors = graphene.List(EditorType)
+        first = graphene.Field(EditorType)
+
+        def resolve_editors(self, info):
+            return info.context["session"].query(Editor).all()
+
+        def resolve_first(self, info):
+            return info.context["session"].query(Editor).first()
+
+    schema = graphene.Schema(query=Query)
+    context = {"session": session}
+    result = schema.execute(
+        "{ editors { name } first { name } }", context_value=context, middleware=[QueryStatsMiddleware()]
+    )
+    add_query_stats(result, context)
+    assert not result.errors
+    stats = result.extensions["sqlalchemy"]
+    assert stats["statements"] == 2
+    assert stats["duration"] > 0
+
+    # statements outside of the request are not counted
+    session.query(Editor).all()
+    assert context["sqlalchemy_query_stats"].statements == 2
+
+    context = {"session": session}
+    result = schema.execute(
+        "{ editors { name } first { name } }", context_value=context, middleware=[QueryStatsMiddleware(budget=1)]
+    )
+    add_query_stats(result, context)
+    assert result.data == {"editors": [{"name": "Jack"}], "first": None}
+    assert "query budget of 1 SQL statements was exceeded" in str(result.errors[0])
+    assert result.extensions["sqlalchemy"]["statements"] == 1
+
+    # track_query_stats stops tracking when the request ends, even without add_query_stats
+    context = {"session": session}
+    with track_query_stats(context):
+        result = schema.execute(
+            "{ editors { name } }", context_value=context, middleware=[QueryStatsMiddleware(budget=1)]
+        )
+    assert not result.errors
+    assert session.query(Editor).all()
+    assert context["sqlalchemy_query_stats"].statements == 1
+
+    class LazyQuery(graphene.ObjectType):
+        editors = graphene.List(EditorType)
+        first = graphene.List(EditorType)
+
+        def resolve_editors(self, info):
+            return info.context["session"].query(Editor)
+
+        def resolve_first(self, info):
+            return info.context["session"].query(Editor).limit(1)
+
+    # unevaluated queries returned by resolvers run after the resolver returned
+    lazy_schema = graphene.Schema(query=LazyQuery)
+    context = {"session": session}
+    result = lazy_schema.execute(
+        "{ editors { name } first { name } }", context_value=context, middleware=[QueryStatsMiddleware(budget=1)]
+    )
+    add_query_stats(result, context)
+    assert result.data == {"editors": [{"name": "Jack"}], "first": None}
+    assert "query budget of 1 SQL statements was exceeded" in str(result.errors[0])
+    assert result.extensions["sqlalchemy"]["statements"] == 1
+
+    # rows counts the rows affected by writes, not the rows returned by SELECTs
+    assert context["sqlalchemy_query_stats"].rows == 0
+
+    class Mutation(graphene.ObjectType):
+        rename = graphene.Int()
+
+        def resolve_rename(self, info):
+            return info.context["session"].query(Editor).update({Editor.name: "Jill"}, synchronize_session=False)
+
+    schema = graphene.Schema(query=Query, mutation=Mutation)
+    context = {"session": session}
+    result = schema.execute("mutation { rename }", context_value=context, middleware=[QueryStatsMiddleware()])
+    add_query_stats(result, context)
+    assert result.data == {"rename": 1}
+    assert result.extensions["sqlalchemy"]["rows"] == 1
@@ -215,6 +215,39 @@ def test_sort_argument_only_indexed():
     assert sort_arg.default_value == ["ID_ASC"]
 
 
+def test_sort_argument_skips_anonymous_column_properties():
+    from sqlalchemy.orm import column_property
+
+    from ..fields import SQLAlchemyFilteredConnectionField
+
+    class ExpressionTestModel(Base):
+        __tablename__ = "expression_test_table"
+        id = sa.Column(sa.Integer, primary_key=True)
+        name = sa.Column(sa.String(30))
+        double_id = column_property(id * 2)
+        lower_name = column_property(sa.func.lower(name, type_=sa.String).label("lower_name"))
+
+    class ExpressionTestType(SQLAlchemyObjectType):
+        class Meta:
+            model = ExpressionTestModel
+            interfaces = (Node,)
+
+    sort_enum = ExpressionTestType.sort_argument().type._of_type
+    assert sorted(sort_enum._meta.enum.__members__) == [
+        "ID_ASC",
+        "ID_DESC",
+        "LOWER_NAME_ASC",
+        "LOWER_NAME_DESC",
+        "NAME_ASC",
+        "NAME_DESC",
+    ]
+
+    class Query(ObjectType):
+        expressions = SQLAlchemyFilteredConnectionField(ExpressionTestType)
+
+    assert Schema(query=Query)
+
+
 def test_sort_argument_with_custom_symbol_names():
     class PetType(SQLAlchemyObjectType):
         class Meta:
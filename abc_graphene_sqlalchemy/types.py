@@ -1,9 +1,10 @@
 from collections import OrderedDict
+from functools import partial
 from typing import Type, Tuple, Mapping, Callable
 
 import sqlalchemy
 from graphene import Field
-from graphene import InputObjectType, Dynamic, Argument, Mutation, ID
+from graphene import InputObjectType, InputField, Dynamic, Argument, Mutation, ID, Int, List, NonNull
 from graphene.relay import Connection, Node
 from graphene.types.objecttype import ObjectType, ObjectTypeOptions
 from graphene.types.structures import Structure
@@ -18,6 +19,22 @@ from sqlalchemy.orm import (ColumnProperty, CompositeProperty,
                             RelationshipProperty)
 from sqlalchemy.orm.exc import NoResultFound
 
+from .baking import BakedConnectionQuery
+from .batching import load_instance, memoize
+from .bulk import (
+    bulk_create,
+    bulk_delete,
+    bulk_update,
+    bulk_upsert,
+    can_write_directly,
+    delete_row,
+    delete_where,
+    get_primary_key,
+    load_references,
+    set_model_attributes,
+    update_row,
+    update_where,
+)
 from .converter import (
     convert_sqlalchemy_column,
     convert_sqlalchemy_composite,
@@ -30,8 +47,9 @@ from .enums import (
     sort_enum_for_object_type,
 )
 from .fields import SQLAlchemyFilteredConnectionField
-from .fields import default_connection_field_factory
+from .fields import compile_where_clause, default_connection_field_factory, get_filter_argument_type
 from .interfaces import SQLAlchemyInterface
+from .planner import get_load_options, get_node_selection_sets, is_selected_type, plan_loads
 from .registry import Registry, get_global_registry
 from .utils import (
     get_query,
@@ -50,6 +68,7 @@ class ORMField(OrderedType):
             required=None,
             description=None,
             deprecation_reason=None,
+            batching=None,
             _creation_counter=None,
             **field_kwargs
     ):
@@ -86,6 +105,9 @@ class ORMField(OrderedType):
             Same behavior as in graphene.Field. Defaults to None.
         :param str deprecation_reason:
             Same behavior as in graphene.Field. Defaults to None.
+        :param bool batching:
+            Toggle batching of relationship loads for this field.
+            Default to the `batching` option of the SQLAlchemyObjectType.
         :param int _creation_counter:
             Same behavior as in graphene.Field.
         """
@@ -97,6 +119,7 @@ class ORMField(OrderedType):
             'required': required,
             'description': description,
             'deprecation_reason': deprecation_reason,
+            'batching': batching,
         }
         common_kwargs = {kwarg: value for kwarg, value in common_kwargs.items() if value is not None}
         self.kwargs = field_kwargs
@@ -111,6 +134,8 @@ def construct_fields(
         exclude_fields,
         connection_field_factory,
         register_orm_field: bool = True,
+        batching: bool = False,
+        optional_fields: bool = False,
 ):
     """
     Construct all the fields for a SQLAlchemyObjectType.
@@ -125,6 +150,9 @@ def construct_fields(
     :param tuple[string] only_fields:
     :param tuple[string] exclude_fields:
     :param function connection_field_factory:
+    :param bool register_orm_field:
+    :param bool batching: batch the loads of scalar relationships
+    :param bool optional_fields: make every field optional, even for NOT NULL columns
     :rtype: OrderedDict[str, graphene.Field]
     """
     inspected_model = sqlalchemyinspect(model)
@@ -170,7 +198,7 @@ def construct_fields(
             continue
         required = False
         try:
-            required = not all_model_attrs[orm_field_name].columns[0].nullable
+            required = not optional_fields and not all_model_attrs[orm_field_name].columns[0].nullable
         except:
             pass
         orm_fields[orm_field_name] = ORMField(model_attr=orm_field_name, required=required)
@@ -180,11 +208,14 @@ def construct_fields(
     for orm_field_name, orm_field in orm_fields.items():
         attr_name = orm_field.kwargs.pop('model_attr')
         attr = all_model_attrs[attr_name]
+        batching_ = orm_field.kwargs.pop('batching', batching)
 
         if isinstance(attr, ColumnProperty):
             field = convert_sqlalchemy_column(attr, registry, **orm_field.kwargs)
         elif isinstance(attr, RelationshipProperty):
-            field = convert_sqlalchemy_relationship(attr, registry, connection_field_factory, **orm_field.kwargs)
+            field = convert_sqlalchemy_relationship(
+                attr, registry, connection_field_factory, batching_, **orm_field.kwargs
+            )
         elif isinstance(attr, CompositeProperty):
             if attr_name != orm_field_name or orm_field.kwargs:
                 # TODO Add a way to override composite property fields
@@ -208,6 +239,10 @@ class SQLAlchemyObjectTypeOptions(ObjectTypeOptions):
     registry = None  # type: sqlalchemy.Registry
     connection = None  # type: sqlalchemy.Type[sqlalchemy.Connection]
     id = None  # type: str
+    batching = False  # type: bool
+    eager_loading = "auto"  # type: Union[str, Mapping[str, str], None]
+    baked_queries = False  # type: bool
+    cache_ttl = None  # type: Optional[float]
 
 
 class SQLAlchemyObjectType(ObjectType):
@@ -225,6 +260,10 @@ class SQLAlchemyObjectType(ObjectType):
             interfaces=(),
             id=None,
             connection_field_factory=default_connection_field_factory,
+            batching=False,
+            eager_loading="auto",
+            baked_queries=False,
+            cache_ttl=None,
             _meta=None,
             **options
     ):
@@ -251,6 +290,7 @@ class SQLAlchemyObjectType(ObjectType):
                 only_fields=only_fields,
                 exclude_fields=exclude_fields,
                 connection_field_factory=connection_field_factory,
+                batching=batching,
             ),
             _as=Field,
             sort=False,
@@ -288,6 +328,10 @@ class SQLAlchemyObjectType(ObjectType):
 
         _meta.connection = connection
         _meta.id = id or "id"
+        _meta.batching = batching
+        _meta.eager_loading = eager_loading
+        _meta.baked_queries = baked_queries
+        _meta.cache_ttl = cache_ttl
 
         super(SQLAlchemyObjectType, cls).__init_subclass_with_meta__(
             _meta=_meta, interfaces=interfaces, **options
@@ -311,11 +355,38 @@ class SQLAlchemyObjectType(ObjectType):
 
     @classmethod
     def get_node(cls, info, id):
+        if cls._meta.batching:
+            return cls.get_node_batched(info, id)
+        key = ("node", cls, tuple(id) if isinstance(id, list) else id)
+        return memoize(info.context, key, lambda: cls.get_node_uncached(info, id))
+
+    @classmethod
+    def get_node_uncached(cls, info, id):
+        # the selection only describes the node when the field returns it
+        selection_sets = [field_ast.selection_set for field_ast in info.field_asts]
+        if cls._meta.baked_queries:
+            query = BakedConnectionQuery(cls._meta.model, cls.get_query(info).session)
+            if is_selected_type(cls, info):
+                query.add_load_plan(plan_loads(cls, info, selection_sets))
+        else:
+            query = cls.get_query(info)
+            if is_selected_type(cls, info):
+                query = query.options(*get_load_options(cls, info, selection_sets))
         try:
-            return cls.get_query(info).get(id)
+            return query.get(id)
         except NoResultFound:
             return None
 
+    @classmethod
+    def get_node_batched(cls, info, id):
+        """Return a Promise of the node, loading all ids of a tick in one query."""
+        primary_key = sqlalchemyinspect(cls._meta.model).primary_key
+        key = tuple(id) if isinstance(id, (tuple, list)) else (id,)
+        if len(key) != len(primary_key):
+            return None
+        session = cls.get_query(info).session
+        return load_instance(info.context, session, cls._meta.model, primary_key, key)
+
     def resolve_id(self, info):
         # graphene_type = info.parent_type.graphene_type
         keys = self.__mapper__.primary_key_from_instance(self)
@@ -330,6 +401,22 @@ class SQLAlchemyObjectType(ObjectType):
     sort_argument = classmethod(sort_argument_for_object_type)
 
 
+# reference input types, by model
+reference_input_cache = {}
+
+
+def get_reference_input_type(model):
+    """Return the ``{Model}Reference`` input type identifying a row of ``model`` by primary key."""
+    if model not in reference_input_cache:
+        mapper = sqlalchemy.inspect(model)
+        reference_input_cache[model] = type(
+            "{}Reference".format(model.__name__),
+            (InputObjectType,),
+            {mapper.get_property_by_column(column).key: ID(required=True) for column in mapper.primary_key},
+        )
+    return reference_input_cache[model]
+
+
 class SQLAlchemyInputObjectType(InputObjectType):
     @classmethod
     def __init_subclass_with_meta__(
@@ -345,6 +432,8 @@ class SQLAlchemyInputObjectType(InputObjectType):
             interfaces=(),
             id=None,
             connection_field_factory=default_connection_field_factory,
+            relationship_references=False,
+            optional_fields=False,
             _meta=None,
             **options,
     ):
@@ -368,6 +457,7 @@ class SQLAlchemyInputObjectType(InputObjectType):
                 only_fields,
                 exclude_fields + tuple(autoexclude),
                 connection_field_factory,
+                optional_fields=optional_fields,
             ),
             _as=Field,
         )
@@ -396,6 +486,15 @@ class SQLAlchemyInputObjectType(InputObjectType):
             if not (isinstance(value, Dynamic) or hasattr(cls, key)):
                 setattr(cls, key, value)
 
+        if relationship_references:
+            for relationship in sqlalchemy.inspect(model).relationships:
+                key = relationship.key
+                if (only_fields and key not in only_fields) or key in exclude_fields or hasattr(cls, key):
+                    continue
+                # resolved lazily, relationships may form cycles between models
+                reference = partial(get_reference_input_type, relationship.mapper.class_)
+                setattr(cls, key, InputField(List(NonNull(reference)) if relationship.uselist else reference))
+
         super(SQLAlchemyInputObjectType, cls).__init_subclass_with_meta__(**options)
 
 
@@ -521,6 +620,10 @@ class SQLAlchemyMutationOptions(ObjectTypeOptions):
     model: DeclarativeMeta = None
     create: bool = False
     delete: bool = False
+    bulk: bool = False
+    upsert: bool = False
+    upsert_key: Tuple[str, ...] = None
+    where: bool = False
     arguments: Mapping[str, Argument] = None
     output: Type[ObjectType] = None
     resolver: Callable = None
@@ -533,6 +636,11 @@ class SQLAlchemyMutation(Mutation):
             model=None,
             create=False,
             delete=False,
+            bulk=False,
+            upsert=False,
+            upsert_key=None,
+            where=False,
+            relationship_references=False,
             registry=None,
             arguments=None,
             only_fields=(),
@@ -544,35 +652,62 @@ class SQLAlchemyMutation(Mutation):
         meta.create = create
         meta.model = model
         meta.delete = delete
+        meta.bulk = bulk
+        meta.upsert = upsert
+        meta.upsert_key = tuple(upsert_key) if upsert_key else None
+        meta.where = where
 
         if arguments is None and not hasattr(cls, "Arguments"):
             arguments = {}
+            inputFields = {}
+            if meta.upsert and not meta.upsert_key:
+                # upserts keyed on the primary key take it in their input
+                inputFields[get_primary_key(model)[1]] = ID(required=True)
+            if meta.where:
+                arguments["where"] = Argument(NonNull(get_filter_argument_type(model)))
             # don't include id argument on create
-            if not meta.create:
-                arguments["id"] = ID(required=True)
+            elif not (meta.create or meta.upsert):
+                if not meta.bulk:
+                    arguments["id"] = ID(required=True)
+                elif meta.delete:
+                    arguments["ids"] = List(NonNull(ID), required=True)
+                else:
+                    # bulk updates carry the id of every row in its input
+                    inputFields["id"] = ID(required=True)
 
             # don't include input argument on delete
             if not meta.delete:
-                inputMeta = type(
+                inputFields["Meta"] = type(
                     "Meta",
                     (object,),
                     {
                         "model": model,
                         "exclude_fields": exclude_fields,
                         "only_fields": only_fields,
+                        "relationship_references": relationship_references,
+                        # set-based updates only change the columns they set
+                        "optional_fields": meta.where,
                     },
                 )
                 inputType = type(
                     cls.__name__ + "Input",
                     (SQLAlchemyInputObjectType,),
-                    {"Meta": inputMeta},
+                    inputFields,
                 )
-                arguments = {"input": inputType(required=True)}
+                if meta.bulk:
+                    arguments["inputs"] = List(NonNull(inputType), required=True)
+                else:
+                    arguments["input"] = inputType(required=True)
         if not registry:
             registry = get_global_registry()
         output_type: ObjectType = registry.get_type_for_model(model)
-        if structure:
+        if meta.where:
+            # set-based mutations return the number of affected rows
+            output_type = Int
+        elif structure:
             output_type = structure(output_type)
+        elif meta.bulk:
+            output_type = List(output_type)
         super(SQLAlchemyMutation, cls).__init_subclass_with_meta__(
             _meta=meta, output=output_type, arguments=arguments, **options
         )
@@ -580,11 +715,27 @@ class SQLAlchemyMutation(Mutation):
     @classmethod
     def mutate(cls, root, info, **kwargs):
         session = get_session(info.context)
+        if cls._meta.where:
+            return cls.mutate_where(session, **kwargs)
+        if cls._meta.upsert:
+            return cls.mutate_upsert(session, **kwargs)
+        if cls._meta.bulk:
+            return cls.mutate_bulk(session, **kwargs)
+        if not cls._meta.create:
+            plan = cls.get_output_plan(info)
+            values = None if cls._meta.delete else kwargs["input"]
+            if can_write_directly(cls._meta.model, values):
+                columns = plan.columns if plan is not None else None
+                if values is not None:
+                    return update_row(session, cls._meta.model, kwargs["id"], values, columns)
+                # the deleted row is detached, so its relationships cannot be loaded
+                if plan is not None and not plan.relationships:
+                    return delete_row(session, cls._meta.model, kwargs["id"], columns)
         with session.no_autoflush:
             meta = cls._meta
 
             if meta.create:
-                model = meta.model(**kwargs["input"])
+                model = meta.model()
                 session.add(model)
             else:
                 model = (
@@ -595,26 +746,111 @@ class SQLAlchemyMutation(Mutation):
             if meta.delete:
                 session.delete(model)
             else:
-
-                def setModelAttributes(model, attrs):
-                    relationships = model.__mapper__.relationships
-                    for key, value in attrs.items():
-                        if key in relationships:
-                            if getattr(model, key) is None:
-                                # instantiate class of the same type as
-                                # the relationship target
-                                setattr(model, key, relationships[key].mapper.entity())
-                            setModelAttributes(getattr(model, key), value)
-                        else:
-                            setattr(model, key, value)
-
-                setModelAttributes(model, kwargs["input"])
+                references = load_references(session, meta.model, [kwargs["input"]])
+                set_model_attributes(model, kwargs["input"], references)
             session.flush()  # session.commit() now throws session state exception: 'already committed'
 
             return model
 
+    @classmethod
+    def get_output_plan(cls, info):
+        """Return the ``LoadPlan`` of the fields selected on the output, if it is a model type."""
+        output = cls._meta.output
+        if isinstance(output, type) and issubclass(output, SQLAlchemyObjectType):
+            return plan_loads(output, info, get_node_selection_sets(info, info.field_asts))
+        return None
+
+    @classmethod
+    def mutate_where(cls, session, where, input=None):
+        """Delete or update every row matching ``where`` with a single statement.
+
+        Returns the number of affected rows.
+        """
+        model = cls._meta.model
+        clause, params = compile_where_clause(model, where)
+        if cls._meta.delete:
+            return delete_where(session, model, clause, params)
+        # only the keys the client sent, so unset columns keep their values
+        return update_where(session, model, clause, dict(input or {}), params)
+
+    @classmethod
+    def mutate_upsert(cls, session, input=None, inputs=None):
+        """Insert the rows of ``input`` (or ``inputs``), updating those that conflict.
+
+        See ``bulk_upsert``; conflicts are detected on ``upsert_key``.
+        """
+        instances = bulk_upsert(session, cls._meta.model, inputs if cls._meta.bulk else [input], cls._meta.upsert_key)
+        return instances if cls._meta.bulk else instances[0]
+
+    @classmethod
+    def mutate_bulk(cls, session, inputs=None, ids=None):
+        """Apply the mutation to every row of ``inputs`` (or ``ids``) at once.
+
+        See ``bulk_create``, ``bulk_update`` and ``bulk_delete``; the rows are
+        returned in input order.
+        """
+        model = cls._meta.model
+        if cls._meta.create:
+            return bulk_create(session, model, inputs)
+        if cls._meta.delete:
+            return bulk_delete(session, model, ids)
+        return bulk_update(session, model, [
+            (row["id"], {key: value for key, value in row.items() if key != "id"}) for row in inputs
+        ])
+
     @classmethod
     def Field(cls, *args, **kwargs):
         return Field(
             cls._meta.output, args=cls._meta.arguments, resolver=cls._meta.resolver
         )
+
+
+class SQLAlchemyAutoMutationFactory(ObjectType):
+    """Mutation root type with set-based mutations for every model of ``models``.
+
+    ``delete_{models}_where`` and ``update_{models}_where`` take the ``where``
+    filter of ``SQLAlchemyFilteredConnectionField`` and return the number of
+    rows they affected.
+    """
+
+    @classmethod
+    def __init_subclass_with_meta__(
+            cls,
+            models: Tuple[Type[DeclarativeMeta]] = (),
+            excluded_models: Tuple[Type[DeclarativeMeta]] = (),
+            exclude_model_fields: Tuple[str] = (),
+            _meta=None,
+            **options,
+    ):
+        if not _meta:
+            _meta = ObjectTypeOptions(cls)
+
+        fields = OrderedDict()
+        for model in models:
+            if model in excluded_models:
+                continue
+            _model_name = pluralize_name(to_snake_case(model.__name__))
+            for action in ("delete", "update"):
+                field_name = "{}_{}_where".format(action, _model_name)
+                if hasattr(cls, field_name):
+                    continue
+                mutation = type(
+                    "{}{}Where".format(action.capitalize(), model.__name__),
+                    (SQLAlchemyMutation,),
+                    {
+                        "Meta": {
+                            "model": model,
+                            "delete": action == "delete",
+                            "where": True,
+                            "exclude_fields": exclude_model_fields,
+                        }
+                    },
+                )
+                fields[field_name] = mutation.Field()
+                setattr(cls, field_name, fields[field_name])
+        if _meta.fields:
+            _meta.fields.update(fields)
+        else:
+            _meta.fields = fields
+
+        super(SQLAlchemyAutoMutationFactory, cls).__init_subclass_with_meta__(_meta=_meta, **options)
@@ -3,6 +3,7 @@ import warnings
 from collections import OrderedDict
 
 import inflection
+from graphql.language import ast
 from sqlalchemy.exc import ArgumentError
 from sqlalchemy.orm import class_mapper, object_mapper
 from sqlalchemy.orm.exc import UnmappedClassError, UnmappedInstanceError
@@ -25,6 +26,49 @@ def get_query(model, context):
     return query
 
 
+def iter_selected_fields(info, selection_set, type_names=None):
+    """Yield the field nodes of ``selection_set``, expanding fragments.
+
+    If ``type_names`` is given, fragments with a type condition on any other
+    type are skipped.
+    """
+    if selection_set is None:
+        return
+    for selection in selection_set.selections:
+        if isinstance(selection, ast.Field):
+            yield selection
+            continue
+        if isinstance(selection, ast.InlineFragment):
+            fragment = selection
+        elif isinstance(selection, ast.FragmentSpread):
+            fragment = info.fragments[selection.name.value]
+        else:
+            continue
+        type_condition = fragment.type_condition
+        if type_names is not None and type_condition and type_condition.name.value not in type_names:
+            continue
+        for field in iter_selected_fields(info, fragment.selection_set, type_names):
+            yield field
+
+
+def to_hashable(value):
+    """Convert argument values (input objects, lists) to a hashable equivalent."""
+    if isinstance(value, dict):
+        return tuple(sorted((key, to_hashable(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple, set)):
+        return tuple(to_hashable(item) for item in value)
+    return value
+
+
+def get_selected_field_names(info):
+    """Return the names of the sub-fields requested on the resolved field."""
+    return {
+        field.name.value
+        for field_ast in info.field_asts
+        for field in iter_selected_fields(info, field_ast.selection_set)
+    }
+
+
 def is_mapped_class(cls):
     try:
         class_mapper(cls)
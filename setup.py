@@ -13,8 +13,8 @@ with open("abc_graphene_sqlalchemy/__init__.py", "rb") as f:
 requirements = [
     # To keep things simple, we only support newer versions of Graphene
     "graphene>=2.1.3,<3",
-    # Tests fail with 1.0.19
-    "SQLAlchemy>=1.1,<2",
+    # selectinload and expanding bind parameters need 1.2
+    "SQLAlchemy>=1.2,<2",
     "six>=1.10.0,<2",
     "singledispatch>=3.4.0.3,<4",
     "inflection>=0.3.1",